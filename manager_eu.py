@@ -131,7 +131,44 @@ import time
 import shutil
 import subprocess
 import json
+import gzip
+import mmap
+import queue
+import sqlite3
+import contextlib
+import functools
+import io
+import hashlib
+import hmac
+import secrets
+import fnmatch
+import glob
 import re
+import struct
+import select
+import signal
+import socket
+import ssl
+import asyncio
+import argparse
+import http.client
+import http.server
+import unicodedata
+import threading
+import ctypes
+import ctypes.util
+from array import array
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+try:
+    import termios
+    import tty
+except ImportError:  # not available on Windows
+    termios = tty = None
 from datetime import datetime, timezone, timedelta
 
 try:
@@ -156,6 +193,114 @@ NODEJS_SCRIPTS = ['index.js', 'app.js', 'bot.js', 'main.js']
 # <- ---- @factorcode ---- -> #
 
 STATE_FILE = os.path.expanduser('~/.manager_state.json')
+# 'json' (STATE_FILE) or 'sqlite' (same name with .sqlite3, keeps a history of starts/stops)
+STATE_BACKEND = 'json'
+# persisted discovery index (directory mtimes -> scan results), lives next to STATE_FILE
+DISCOVERY_INDEX_FILE = os.path.join(os.path.dirname(STATE_FILE), '.manager_discovery.json')
+# folders that never contain bots of their own and are skipped during discovery
+# (virtual environments - folders with a pyvenv.cfg - are skipped as well)
+DISCOVERY_SKIP_DIRS = {'node_modules', '__pycache__', '.git'}
+VENV_NAMES = ['venv', '.venv', 'env']
+# keep bots/sites in a live registry updated by inotify instead of rescanning on every redraw
+# (same as running with --watch); without inotify the watcher polls every WATCH_POLL_INTERVAL seconds
+WATCH_MODE = False
+WATCH_POLL_INTERVAL = 2.0
+# bots started by the panel are tracked by PID + create time recorded in STATE_FILE;
+# set to False to skip the full process scan for bots that were started outside the panel
+# (only bots without a live tracked process are looked up this way)
+DISCOVER_UNTRACKED_PROCESSES = True
+# a full process-table scan is reused for this many seconds (one scan per refresh cycle)
+PROCESS_SCAN_INTERVAL = 2.0
+# put every started bot into its own cgroup v2 subtree (needs root and a cgroup2 mount)
+USE_CGROUPS = False
+CGROUP_ROOT = '/sys/fs/cgroup/workmanager'
+# how many bots "restart all" stops/starts at the same time
+RESTART_CONCURRENCY = 8
+# Dependency preflight: requirements.txt / package.json are checked against the venv /
+# node_modules (installed package metadata, no pip / npm) before start and in the menu
+PREFLIGHT_ENABLED = True
+PREFLIGHT_BLOCK_START = False  # refuse to start bots with missing / mismatched dependencies
+PREFLIGHT_CONCURRENCY = 8
+PREFLIGHT_CACHE_FILE = os.path.join(os.path.dirname(STATE_FILE), '.manager_preflight.json')
+# seconds to wait after SIGTERM before stragglers get SIGKILL
+STOP_TIMEOUT = 3.0
+# send bot output through a manager-owned log shipper that rotates logs by size/age,
+# gzips rotated segments and keeps at most LOG_RETENTION of them (LOG_RETENTION_BYTES total)
+LOG_SHIPPER = False
+LOG_MAX_BYTES = 50 * 1024 * 1024
+LOG_ROTATE_INTERVAL = 24 * 3600
+LOG_RETENTION = 10
+LOG_RETENTION_BYTES = 500 * 1024 * 1024
+# how many lines the log viewer in the bot menu shows
+LOG_TAIL_LINES = 50
+# Last rendered menu, drawn at start-up while fresh status is being probed
+PANEL_CACHE_FILE = os.path.join(os.path.dirname(STATE_FILE), '.manager_panel_cache.json')
+# Live dashboard (--live): the menu redraws every LIVE_REFRESH_INTERVAL seconds and
+# commands are single keystrokes
+LIVE_MODE = False
+LIVE_REFRESH_INTERVAL = 2.0
+# how long action output stays on screen before the menu returns (any key returns earlier)
+ACTION_PAUSE = 2.0
+# Per-bot resource metrics (CPU, RSS, FDs, threads, I/O) sampled in the background
+METRICS_ENABLED = True
+METRICS_INTERVAL = 1.0
+METRICS_HISTORY = 300  # samples kept per metric: 5 minutes at 1 s
+METRICS_SLOW_EVERY = 5  # open FDs, I/O counters and child pids are re-read every N ticks
+METRICS_SPARK_WIDTH = 20
+# Optional site health checks (--health): HTTP probes against the local web server
+HEALTH_CHECKS = False
+HEALTH_ADDRESS = '127.0.0.1'
+HEALTH_PATH = '/'
+HEALTH_METHOD = 'HEAD'
+HEALTH_TIMEOUT = 3.0
+HEALTH_INTERVAL = 15.0
+HEALTH_HISTORY = 60  # probes kept per site for p50/p95
+HEALTH_CONCURRENCY = 20
+# Access-log analytics: tracking state (offsets + aggregates) and limits
+ACCESS_LOG_STATE_FILE = os.path.join(os.path.dirname(STATE_FILE), '.manager_access_logs.json')
+ACCESS_LOG_BOOTSTRAP_BYTES = 8 * 1024 * 1024  # a log seen for the first time is read from this far before its end
+ACCESS_LOG_CHUNK = 4 * 1024 * 1024
+ACCESS_LOG_RATE_WINDOW = 60  # seconds used for requests/sec
+ACCESS_LOG_TOP_PATHS = 500  # distinct paths kept per site
+# Prometheus exporter (--metrics-port): scrapes are served from a snapshot refreshed on this interval
+METRICS_PORT = None
+METRICS_BIND = '127.0.0.1'
+EXPORTER_REFRESH_INTERVAL = 10.0
+# Fleet mode: `serve` exposes this panel as authenticated JSON-RPC (POST /rpc) and
+# `fleet` shows the bots / sites of all FLEET_HOSTS in one table
+FLEET_PORT = 9478
+# plain HTTP: keep localhost and reach other hosts through `ssh -L` tunnels or a TLS proxy;
+# bind a private LAN address only on a trusted network
+FLEET_BIND = '127.0.0.1'
+FLEET_HOSTS = []  # e.g. ['127.0.0.1:9501', '127.0.0.1:9502'] (ssh -N -L 9501:127.0.0.1:9478 host1)
+FLEET_TOKEN = None  # shared secret; None = read FLEET_TOKEN_FILE (`serve` creates it)
+FLEET_TOKEN_FILE = os.path.join(os.path.dirname(STATE_FILE), '.manager_fleet_token')
+FLEET_TIMEOUT = 5.0
+FLEET_REFRESH_INTERVAL = 5.0
+# inverted index used by "search logs" and the max number of matches shown
+LOG_INDEX_FILE = os.path.join(os.path.dirname(STATE_FILE), '.manager_logindex.sqlite3')
+LOG_SEARCH_LIMIT = 200
+# supervisor daemon (`manager.py daemon`): control socket and restart backoff (seconds)
+SUPERVISOR_SOCKET = os.path.join(os.path.dirname(STATE_FILE), '.manager_supervisor.sock')
+SUPERVISOR_BACKOFF_MIN = 0.5
+SUPERVISOR_BACKOFF_MAX = 60.0
+SUPERVISOR_STABLE_AFTER = 30.0  # a run at least this long resets the backoff
+SUPERVISOR_STOP_TIMEOUT = 5.0
+# Web server config roots for relative include paths, and the parsed-config cache
+NGINX_PREFIX = '/etc/nginx'
+APACHE_PREFIX = '/etc/apache2'
+NGINX_DEFAULT_ACCESS_LOG = '/var/log/nginx/access.log'
+APACHE_LOG_DIR = '/var/log/apache2'
+APACHE_DEFAULT_ACCESS_LOG = os.path.join(APACHE_LOG_DIR, 'other_vhosts_access.log')
+SITE_PARSE_CACHE_FILE = os.path.join(os.path.dirname(STATE_FILE), '.manager_sites_cache.json')
+# Web server status is cached this long; liveness comes from the master PID file
+WEB_SERVER_STATUS_TTL = 5.0
+WEB_SERVER_PID_FILES = {
+    'nginx': ['/run/nginx.pid', '/var/run/nginx.pid'],
+    'apache2': ['/run/apache2/apache2.pid', '/var/run/apache2/apache2.pid', '/run/httpd/httpd.pid'],
+}
+WEB_SERVER_CONFIG_TEST = {'nginx': ['nginx', '-t', '-q'], 'apache2': ['apachectl', 'configtest']}
+WEB_SERVER_PROCESS_NAMES = {'nginx': ('nginx',), 'apache2': ('apache2', 'httpd')}
 MSK_TIMEZONE = timezone(timedelta(hours=3))
 
 class C:
@@ -196,8 +341,14 @@ def _supports_truecolor():
 
 _TRUECOLOR = _supports_truecolor()
 
+@functools.lru_cache(maxsize=256)
 def gradient_text(text, start_rgb, end_rgb):
-    """Return string with gradient color from start_rgb to end_rgb."""
+    """Return string with gradient color from start_rgb to end_rgb.
+
+    Results are cached per (text, colors) - the title and separators are redrawn
+    on every frame. Blanks get no color code and a color is only re-sent when it
+    actually changes.
+    """
     if not _TRUECOLOR or not text:
         return text
 
@@ -208,12 +359,15 @@ def gradient_text(text, start_rgb, end_rgb):
         return f"\033[38;2;{r1};{g1};{b1}m{text}{C.RESET}"
 
     parts = []
+    last = None
     for i, ch in enumerate(text):
-        t = i / (length - 1)
-        r = int(r1 + (r2 - r1) * t)
-        g = int(g1 + (g2 - g1) * t)
-        b = int(b1 + (b2 - b1) * t)
-        parts.append(f"\033[38;2;{r};{g};{b}m{ch}")
+        if not ch.isspace():
+            t = i / (length - 1)
+            color = (int(r1 + (r2 - r1) * t), int(g1 + (g2 - g1) * t), int(b1 + (b2 - b1) * t))
+            if color != last:
+                parts.append("\033[38;2;%d;%d;%dm" % color)
+                last = color
+        parts.append(ch)
     parts.append(C.RESET)
     return ''.join(parts)
 
@@ -222,27 +376,354 @@ def soft_separator(width=40):
     line = "─" * width
     return gradient_text(line, (190, 160, 255), (245, 215, 160))
 
-def load_state():
-    """Load timestamp state from file."""
-    if not os.path.exists(STATE_FILE):
-        return {}
-    try:
-        with open(STATE_FILE, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return {}
+def atomic_write(path, data, fsync=False, mode=None):
+    """Replace path with data (str or bytes) through a temp file and os.replace.
 
-def save_state(state):
-    """Save timestamp state to file."""
+    Readers see the old or the new content, never a partial file; fsync makes the
+    content durable before the rename. The temp file is removed on failure and the
+    error is re-raised.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
     try:
-        with open(STATE_FILE, 'w') as f:
-            json.dump(state, f, indent=4)
-    except IOError as e:
-        print(f"{C.RED}❌ Failed to save state: {e}{C.RESET}")
+        with open(tmp_path, 'wb') as f:
+            if mode is not None:
+                os.fchmod(f.fileno(), mode)
+            f.write(data if isinstance(data, bytes) else data.encode('utf-8'))
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class JsonStateStore:
+    """State file access with an in-memory cache, coalesced atomic writes and locking.
+
+    transaction() is a read-modify-write under a thread lock plus an fcntl lock on
+    STATE_FILE.lock (so several panels don't lose each other's updates) and ends
+    with an atomic temp file + os.replace write. Inside batch() all transactions
+    share one lock acquisition and the file is written once at the end.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._data = {}
+        self._signature = None
+        self._dirty = False
+        self._batch_depth = 0
+        self._lock_fd = None
+
+    def read(self):
+        """Return a copy of the current state (the file is re-read only if it changed)."""
+        with self._lock:
+            if not self._batch_depth:
+                self._reload()
+            return dict(self._data)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Yield the state dict for modification; it is saved when the block ends."""
+        with self._lock:
+            if self._batch_depth:
+                yield self._data
+                self._dirty = True
+                return
+            self._acquire_file_lock()
+            try:
+                self._reload()
+                yield self._data
+                self._dirty = True
+                self._flush()
+            finally:
+                self._release_file_lock()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Coalesce all transactions inside the block (from any thread) into one write."""
+        with self._lock:
+            if not self._batch_depth:
+                self._acquire_file_lock()
+                self._reload()
+            self._batch_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    try:
+                        self._flush()
+                    finally:
+                        self._release_file_lock()
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _reload(self):
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        data = {}
+        if signature is not None:
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            except (ValueError, OSError):
+                data = {}
+        self._data = data if isinstance(data, dict) else {}
+        self._signature = signature
+
+    def _flush(self):
+        if not self._dirty:
+            return
+        try:
+            atomic_write(self.path, json.dumps(self._data, separators=(',', ':')), fsync=True)
+            self._signature = self._file_signature()
+            self._dirty = False
+        except OSError as e:
+            print(f"{C.RED}❌ Failed to save state: {e}{C.RESET}")
+
+    def _acquire_file_lock(self):
+        if fcntl is None:
+            return
+        try:
+            self._lock_fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        except OSError:
+            self._release_file_lock()
+
+    def _release_file_lock(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # closing the descriptor drops the flock
+            self._lock_fd = None
+
+class SqliteStateStore(JsonStateStore):
+    """SQLite variant of the state store: one row per bot plus an event history table.
+
+    SQLite does the cross-process locking (BEGIN IMMEDIATE); PRAGMA data_version
+    tells whether another panel changed the database since the cache was filled.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS state (bot_dir TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "ts REAL NOT NULL, bot_dir TEXT NOT NULL, event TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS history_bot ON history (bot_dir, ts)")
+        self._saved = {}
+
+    def history(self, bot_dir, limit=50):
+        """Most recent state changes of a bot as (timestamp, event, data) tuples."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ts, event, data FROM history WHERE bot_dir = ? ORDER BY ts DESC LIMIT ?",
+                (bot_dir, limit)
+            ).fetchall()
+        return [(ts, event, json.loads(data)) for ts, event, data in rows]
+
+    def _file_signature(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _reload(self):
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        rows = self._conn.execute("SELECT bot_dir, data FROM state").fetchall()
+        self._data = {bot_dir: json.loads(data) for bot_dir, data in rows}
+        self._saved = {k: dict(v) for k, v in self._data.items()}
+        self._signature = signature
+
+    def _flush(self):
+        if not self._dirty:
+            return
+        now = time.time()
+        try:
+            for bot_dir, entry in self._data.items():
+                if self._saved.get(bot_dir) == entry:
+                    continue
+                data = json.dumps(entry)
+                self._conn.execute("INSERT OR REPLACE INTO state (bot_dir, data) VALUES (?, ?)", (bot_dir, data))
+                event = 'started' if entry.get('pid') else 'stopped' if 'last_stopped' in entry else 'updated'
+                self._conn.execute("INSERT INTO history (ts, bot_dir, event, data) VALUES (?, ?, ?, ?)",
+                                   (now, bot_dir, event, data))
+            for bot_dir in self._saved.keys() - self._data.keys():
+                self._conn.execute("DELETE FROM state WHERE bot_dir = ?", (bot_dir,))
+            self._conn.execute("COMMIT")
+            self._saved = {k: dict(v) for k, v in self._data.items()}
+            self._dirty = False
+        except sqlite3.Error as e:
+            self._conn.execute("ROLLBACK")
+            print(f"{C.RED}❌ Failed to save state: {e}{C.RESET}")
+
+    def _acquire_file_lock(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    def _release_file_lock(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+
+def open_state_store():
+    """Create the state store selected by STATE_BACKEND."""
+    if STATE_BACKEND == 'sqlite':
+        return SqliteStateStore(os.path.splitext(STATE_FILE)[0] + '.sqlite3')
+    return JsonStateStore(STATE_FILE)
+
+STATE = open_state_store()
+
+def load_state():
+    """Load timestamp state (cached; re-read only when the state file changed)."""
+    return STATE.read()
 
 def clear_screen():
-    """Clear console screen."""
-    os.system('cls' if os.name == 'nt' else 'clear')
+    """Clear console screen (escape sequence on POSIX terminals - no `clear` subprocess)."""
+    if os.name == 'nt':
+        os.system('cls')
+    elif sys.stdout.isatty():
+        sys.stdout.write(CLEAR_SCREEN)
+        sys.stdout.flush()
+    SCREEN.invalidate()
+
+CLEAR_SCREEN = '\033[H\033[2J'
+_SGR_RE = re.compile(r'\033\[[0-9;]*m')
+
+def _char_width(ch):
+    """Terminal columns taken by a character (None when terminals disagree on it)."""
+    if ch in '\u200d\ufe0e\ufe0f' or unicodedata.combining(ch):
+        return None
+    return 2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1
+
+def _screen_cells(line):
+    """Visible characters of a line as (offset in line, active SGR codes, char) tuples."""
+    cells, active, pos = [], '', 0
+    for match in [*_SGR_RE.finditer(line), None]:
+        end = match.start() if match else len(line)
+        cells.extend((i, active, line[i]) for i in range(pos, end))
+        if match:
+            code = match.group()
+            active = '' if code in ('\033[0m', '\033[m') else active + code
+            pos = match.end()
+    return cells
+
+class ScreenRenderer:
+    """Draw full-screen frames by rewriting only what changed since the previous one.
+
+    draw() takes the whole frame as text (lines with SGR color codes). The first
+    frame - and any frame after invalidate(), a terminal resize or when a line
+    would wrap - is painted in full; later frames move the cursor to the first
+    changed cell of each changed line and rewrite from there. Every frame goes
+    out in a single write, so the terminal never shows a half-cleared screen.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self._previous = None
+        self._size = None
+        self._text = None
+
+    def invalidate(self):
+        """Forget the previous frame (the screen was changed by someone else)."""
+        self._previous = None
+
+    def draw(self, text):
+        """Show text as the whole screen, leaving the cursor after its last character."""
+        stream = self.stream or sys.stdout
+        if not stream.isatty():
+            stream.write(text)
+            stream.flush()
+            return
+        size = shutil.get_terminal_size()
+        if self._previous is not None and size == self._size and text == self._text:
+            return
+        self._text = text
+        lines = [self._cells_of(line) for line in text.split('\n')]
+        if self._previous is None or size != self._size or len(lines) > size.lines or \
+                any(self._width(cells, bound=True) > size.columns for _, cells in lines[:-1]):
+            out = CLEAR_SCREEN + text
+        else:
+            out = self._diff(self._previous, lines)
+            column = self._width(lines[-1][1])
+            if column is not None:
+                out += f"\033[{len(lines)};{column + 1}H"
+            else:
+                out += f"\033[{len(lines)};1H{lines[-1][0]}"
+        self._previous, self._size = lines, size
+        stream.write(out)
+        stream.flush()
+
+    @staticmethod
+    def _cells_of(line):
+        return line, _screen_cells(line)
+
+    @staticmethod
+    def _width(cells, end=None, bound=False):
+        # exact width of cells[:end], None if unsure; bound=True gives an upper bound instead
+        total = 0
+        for _, _, ch in cells[:end]:
+            width = _char_width(ch)
+            if width is None:
+                if not bound:
+                    return None
+                width = 1
+            total += width
+        return total
+
+    def _diff(self, previous, lines):
+        out = []
+        for row, (line, cells) in enumerate(lines, 1):
+            old_cells = previous[row - 1][1] if row <= len(previous) else []
+            if row <= len(previous) and previous[row - 1][0] == line:
+                continue
+            first = 0
+            limit = min(len(cells), len(old_cells))
+            while first < limit and cells[first][1:] == old_cells[first][1:]:
+                first += 1
+            column = self._width(cells, first)
+            if column is None:
+                first, column = 0, 0
+            rest = line[cells[first][0]:] if first < len(cells) else ''
+            active = cells[first][1] if first < len(cells) else ''
+            out.append(f"\033[{row};{column + 1}H{C.RESET}{active}{rest}{C.RESET}\033[K")
+        if len(previous) > len(lines):
+            out.append(f"\033[{len(lines) + 1};1H\033[J")
+        return ''.join(out)
+
+SCREEN = ScreenRenderer()
+
+@contextlib.contextmanager
+def raw_input_mode():
+    """Put the terminal in cbreak mode for the block: keys arrive one at a time, without echo."""
+    if termios is None or not sys.stdin.isatty():
+        yield
+        return
+    fd = sys.stdin.fileno()
+    saved = termios.tcgetattr(fd)
+    try:
+        tty.setcbreak(fd)
+        yield
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+
+def pause_after_action(seconds=ACTION_PAUSE):
+    """Leave action output on screen for a moment; any key returns at once."""
+    if termios is None or not sys.stdin.isatty():
+        time.sleep(seconds)
+        return
+    with raw_input_mode():
+        if select.select([sys.stdin], [], [], seconds)[0]:
+            os.read(sys.stdin.fileno(), 64)
 
 def run_sudo_command(command, error_message):
     """Run command with sudo and handle errors."""
@@ -257,6 +738,288 @@ def run_sudo_command(command, error_message):
         print(f"   {C.WHITE}Error details: {e.stderr.strip()}{C.RESET}")
     return None
 
+_NGINX_TOKEN_RE = re.compile(r"""
+      (?P<space>\s+)
+    | (?P<comment>\#[^\n]*)
+    | "(?P<dq>(?:[^"\\]|\\.)*)"
+    | '(?P<sq>(?:[^'\\]|\\.)*)'
+    | (?P<open>\{) | (?P<close>\}) | (?P<semi>;)
+    | (?P<word>(?:[^\s{};"'\\\#]|\\.)(?:[^\s{};"'\\]|\\.)*)
+    | (?P<error>.)
+""", re.VERBOSE | re.DOTALL)
+_ESCAPE_RE = re.compile(r'\\(.)', re.DOTALL)
+
+def parse_nginx_config(text):
+    """Tokenize Nginx config text into [name, args, children] directives.
+
+    children is None for simple directives and a list for blocks; comments and
+    quoting are handled like nginx does. Raises ValueError on unbalanced braces.
+    """
+    root = []
+    stack, words = [root], []
+    for m in _NGINX_TOKEN_RE.finditer(text):
+        kind = m.lastgroup
+        if kind in ('space', 'comment'):
+            continue
+        if kind == 'open':
+            if not words:
+                raise ValueError("block without a name")
+            block = [words[0], words[1:], []]
+            stack[-1].append(block)
+            stack.append(block[2])
+            words = []
+        elif kind == 'close':
+            if words or len(stack) == 1:
+                raise ValueError("unexpected '}'")
+            stack.pop()
+        elif kind == 'semi':
+            if words:
+                stack[-1].append([words[0], words[1:], None])
+                words = []
+        elif kind == 'error':
+            raise ValueError(f"unexpected character {m.group()!r}")
+        else:
+            words.append(_ESCAPE_RE.sub(r'\1', m.group(kind)))
+    if words or len(stack) != 1:
+        raise ValueError("unexpected end of file")
+    return root
+
+_APACHE_ARG_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|\'((?:[^\'\\]|\\.)*)\'|(\S+)')
+
+def _apache_args(text):
+    args = []
+    for dq, sq, bare in _APACHE_ARG_RE.findall(text):
+        if bare.startswith('#'):
+            break  # trailing comment
+        args.append(_ESCAPE_RE.sub(r'\1', dq or sq) if (dq or sq) else bare)
+    return args
+
+def parse_apache_config(text):
+    """Parse Apache config text into [name, args, children] directives.
+
+    Sections (<VirtualHost ...> ... </VirtualHost>) have a children list; line
+    continuations and comment lines are handled. Raises ValueError on unbalanced sections.
+    """
+    root = []
+    stack = [('', root)]
+    for line in text.replace('\\\r\n', ' ').replace('\\\n', ' ').splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('</'):
+            name = line[2:].rstrip('>').strip().lower()
+            if len(stack) == 1 or stack[-1][0] != name:
+                raise ValueError(f"unexpected </{name}>")
+            stack.pop()
+        elif line.startswith('<'):
+            inner = line[1:].rstrip()
+            if inner.endswith('>'):
+                inner = inner[:-1]
+            parts = inner.split(None, 1)
+            if not parts:
+                raise ValueError("empty section tag")
+            section = [parts[0], _apache_args(parts[1]) if len(parts) > 1 else [], []]
+            stack[-1][1].append(section)
+            stack.append((parts[0].lower(), section[2]))
+        else:
+            parts = line.split(None, 1)
+            stack[-1][1].append([parts[0], _apache_args(parts[1]) if len(parts) > 1 else [], None])
+    if len(stack) != 1:
+        raise ValueError(f"unclosed <{stack[-1][0]}>")
+    return root
+
+class ConfigParseCache:
+    """Parsed web server config files keyed by path, valid while (mtime, size) match.
+
+    Persisted in SITE_PARSE_CACHE_FILE so hundreds of vhost files are only
+    re-tokenized when they change, even across CLI invocations.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or SITE_PARSE_CACHE_FILE
+        self._entries = None
+        self._used = set()
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, 'r') as f:
+                    entries = json.load(f)
+                self._entries = entries if isinstance(entries, dict) else {}
+            except (OSError, ValueError):
+                self._entries = {}
+
+    def get(self, file_path, parser):
+        """Directives of file_path parsed with parser (parse_nginx_config / parse_apache_config)."""
+        st = os.stat(file_path)
+        stamp = [parser.__name__, st.st_mtime_ns, st.st_size]
+        with self._lock:
+            self._load()
+            self._used.add(file_path)
+            entry = self._entries.get(file_path)
+            if entry and entry[0] == stamp:
+                return entry[1]
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            directives = parser(f.read())
+        with self._lock:
+            self._entries[file_path] = [stamp, directives]
+            self._dirty = True
+        return directives
+
+    def save(self):
+        """Persist the cache (dropping entries of files that no longer exist)."""
+        with self._lock:
+            if self._entries is None:
+                return
+            for file_path in [p for p in self._entries if p not in self._used and not os.path.exists(p)]:
+                del self._entries[file_path]
+                self._dirty = True
+            if not self._dirty:
+                return
+            try:
+                atomic_write(self.path, json.dumps(self._entries, separators=(',', ':')))
+                self._dirty = False
+            except OSError:
+                pass
+
+CONFIG_CACHE = ConfigParseCache()
+
+def _resolve_includes(directives, parser, prefix, include_names, depth=0):
+    """Yield directives with include directives replaced by the included files' content."""
+    for directive in directives:
+        name, args, children = directive
+        if children is None and name.lower() in include_names and args:
+            if depth >= 16:
+                continue  # include loop
+            pattern = args[0] if os.path.isabs(args[0]) else os.path.join(prefix, args[0])
+            paths = sorted(glob.glob(pattern))
+            if len(paths) == 1 and os.path.isdir(paths[0]):
+                paths = sorted(glob.glob(os.path.join(paths[0], '*')))
+            for path in paths:
+                if not os.path.isfile(path):
+                    continue
+                try:
+                    included = CONFIG_CACHE.get(path, parser)
+                except (OSError, ValueError):
+                    continue
+                yield from _resolve_includes(included, parser, prefix, include_names, depth + 1)
+        else:
+            yield directive
+
+def _valid_domain(name):
+    return '.' in name and name != '_' and name.lower() != 'localhost' and not name.replace('.', '').isdigit()
+
+def _site_entry(name, config_file, root_path, server, ports, ssl_ports, names):
+    site_type = "PHP" if os.path.isfile(os.path.join(root_path, 'index.php')) else "HTML"
+    return {
+        'name': name,
+        'config': config_file,
+        'dir': root_path,
+        'type': site_type,
+        'server': server,
+        'names': names,
+        'ports': ports,
+        'ssl': bool(ssl_ports),
+        'ssl_ports': ssl_ports,
+    }
+
+def _merge_sites(sites):
+    """Merge blocks of the same site (e.g. separate :80 and :443 server blocks)."""
+    merged = {}
+    for site in sites:
+        known = merged.get((site['name'], site['dir']))
+        if known:
+            known['ports'] = sorted(set(known['ports']) | set(site['ports']))
+            known['ssl_ports'] = sorted(set(known['ssl_ports']) | set(site['ssl_ports']))
+            known['ssl'] = bool(known['ssl_ports'])
+        else:
+            merged[(site['name'], site['dir'])] = site
+    return list(merged.values())
+
+def _listen_port(args):
+    """Port of an nginx listen directive (80 if only an address is given, None for unix sockets)."""
+    address = args[0] if args else '80'
+    if address.isdigit():
+        return int(address)
+    if address.startswith('unix:'):
+        return None
+    host_port = address.rsplit(']', 1)[-1]  # strip an IPv6 address
+    if ':' in host_port:
+        port = host_port.rsplit(':', 1)[1]
+        return int(port) if port.isdigit() else None
+    return 80
+
+def _nginx_access_log(items, inherited):
+    """(path, format) of the last access_log in a context, or inherited; path None if logging is off."""
+    logs = [args for name, args, children in items if name == 'access_log' and children is None and args]
+    if not logs:
+        return inherited
+    args = logs[-1]
+    if args[0] == 'off' or args[0].startswith('syslog:'):
+        return None, None
+    path = args[0] if os.path.isabs(args[0]) else os.path.join(NGINX_PREFIX, args[0])
+    return path, args[1] if len(args) > 1 else 'combined'
+
+def parse_nginx_sites(config_path):
+    """Parse one Nginx config (with includes) and return a site per server block."""
+    config_file = os.path.basename(config_path)
+    directives = CONFIG_CACHE.get(config_path, parse_nginx_config)
+    sites = []
+
+    def resolved(items):
+        return list(_resolve_includes(items, parse_nginx_config, NGINX_PREFIX, ('include',)))
+
+    def walk(items, inherited_root, inherited_log):
+        items = resolved(items)
+        roots = [args[0] for name, args, children in items if name == 'root' and children is None and args]
+        context_root = roots[-1] if roots else inherited_root
+        context_log = _nginx_access_log(items, inherited_log)
+        for name, args, children in items:
+            if children is None:
+                continue
+            if name == 'http':
+                walk(children, context_root, context_log)
+            elif name == 'server':
+                server_site(resolved(children), context_root, context_log)
+
+    def server_site(items, inherited_root, inherited_log):
+        names, roots, ports, ssl_ports, ssl_on = [], [], [], [], False
+        for name, args, children in items:
+            if children is not None:
+                continue
+            if name == 'server_name':
+                names.extend(args)
+            elif name == 'root' and args:
+                roots.append(args[0])
+            elif name == 'listen':
+                port = _listen_port(args)
+                if port:
+                    ports.append(port)
+                    if 'ssl' in args or 'quic' in args:
+                        ssl_ports.append(port)
+            elif name == 'ssl' and args == ['on']:
+                ssl_on = True  # legacy "ssl on;" applies to every listen
+        root_path = roots[-1] if roots else inherited_root
+        if not root_path:
+            # no server-level root: use the one of 'location /'
+            for name, args, children in items:
+                if name == 'location' and children is not None and args[-1:] == ['/']:
+                    location_roots = [a[0] for n, a, c in resolved(children) if n == 'root' and c is None and a]
+                    root_path = location_roots[-1] if location_roots else None
+        domains = [n for n in names if _valid_domain(n)]
+        if not (root_path and domains and os.path.isdir(root_path)):
+            return
+        ports = sorted(set(ports or [80]))
+        ssl_ports = ports if ssl_on else sorted(set(ssl_ports))
+        site = _site_entry(domains[0], config_file, root_path, 'nginx', ports, ssl_ports, domains)
+        site['access_log'], site['log_format'] = _nginx_access_log(items, inherited_log)
+        sites.append(site)
+
+    walk(directives, None, (NGINX_DEFAULT_ACCESS_LOG, 'combined'))
+    return _merge_sites(sites)
+
 def discover_sites_from_nginx():
     """Read Nginx configs to discover sites, domains and root directories."""
     sites = []
@@ -271,40 +1034,76 @@ def discover_sites_from_nginx():
             continue
 
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            sites.extend(parse_nginx_sites(config_path))
+        except Exception as e:
+            print(f"{C.YELLOW}⚠️ Failed to read or parse config {config_file}: {e}{C.RESET}")
+    CONFIG_CACHE.save()
+    return sites
 
-            root_match = re.search(r'^\s*root\s+([^\s;]+);', content, re.MULTILINE)
-            server_name_match = re.search(r'^\s*server_name\s+([^;]+);', content, re.MULTILINE)
+def _apache_access_log(items, inherited):
+    """(path, format) of the last CustomLog in a context, or inherited; path None for piped logs."""
+    logs = [args for name, args, children in items
+            if name.lower() in ('customlog', 'transferlog') and children is None and args]
+    if not logs:
+        return inherited
+    args = logs[-1]
+    if args[0].startswith('|'):
+        return None, None
+    path = args[0].replace('${APACHE_LOG_DIR}', APACHE_LOG_DIR)
+    path = path if os.path.isabs(path) else os.path.join(APACHE_PREFIX, path)
+    return path, args[1] if len(args) > 1 else 'common'
 
-            if root_match and server_name_match:
-                root_path = root_match.group(1).strip('\'"')
-                if not os.path.isdir(root_path):
-                    continue
+def parse_apache_sites(config_path):
+    """Parse one Apache config (with includes) and return a site per <VirtualHost>."""
+    config_file = os.path.basename(config_path)
+    directives = CONFIG_CACHE.get(config_path, parse_apache_config)
+    sites = []
 
-                server_names = server_name_match.group(1).split()
-                
-                valid_domain = None
-                for name in server_names:
-                    if '.' in name and name != '_' and name.lower() != 'localhost' and not name.replace('.', '').isdigit():
-                        valid_domain = name
-                        break
-                
-                if valid_domain:
-                    site_type = "PHP" if os.path.isfile(os.path.join(root_path, 'index.php')) else "HTML"
-                    sites.append({
-                        'name': valid_domain,
-                        'config': config_file,
-                        'dir': root_path,
-                        'type': site_type,
-                        'server': 'nginx'
-                    })
+    def resolved(items):
+        return list(_resolve_includes(items, parse_apache_config, APACHE_PREFIX, ('include', 'includeoptional')))
+
+    def walk(items, inherited_root, inherited_log):
+        items = resolved(items)
+        roots = [args[0] for name, args, children in items
+                 if name.lower() == 'documentroot' and children is None and args]
+        context_root = roots[-1] if roots else inherited_root
+        context_log = _apache_access_log(items, inherited_log)
+        for name, args, children in items:
+            if children is None:
+                continue
+            if name.lower() == 'virtualhost':
+                vhost_site(args, resolved(children), context_root, context_log)
+            else:
+                walk(children, context_root, context_log)  # <IfModule>, <IfDefine> ...
+
+    def vhost_site(vhost_args, items, inherited_root, inherited_log):
+        server_name, aliases, roots, ssl = None, [], [], False
+        for name, args, children in items:
+            if children is not None or not args:
+                continue
+            key = name.lower()
+            if key == 'servername':
+                server_name = args[0].split('://', 1)[-1].rsplit(':', 1)[0]
+            elif key == 'serveralias':
+                aliases.extend(args)
+            elif key == 'documentroot':
+                roots.append(args[0])
+            elif key == 'sslengine':
+                ssl = args[0].lower() == 'on'
+        root_path = roots[-1] if roots else inherited_root
+        if not root_path or not os.path.isdir(root_path):
+            return
+        ports = sorted({int(a.rsplit(':', 1)[1]) for a in vhost_args if ':' in a and a.rsplit(':', 1)[1].isdigit()} or {80})
+        names = ([server_name] if server_name and server_name != 'localhost' else []) + \
+            [a for a in aliases if _valid_domain(a)]
+        site = _site_entry(names[0] if names else config_file, config_file, root_path,
+                           'apache2', ports, ports if ssl else [], names)
+        site['access_log'], site['log_format'] = _apache_access_log(items, inherited_log)
+        sites.append(site)
+
+    walk(directives, None, (APACHE_DEFAULT_ACCESS_LOG, 'vhost_combined'))
+    return _merge_sites(sites)
 
-        except Exception as e:
-            print(f"{C.YELLOW}⚠️ Failed to read or parse config {config_file}: {e}{C.RESET}")
-            
-    return sites
-    
 def discover_sites_from_apache():
     """Read Apache configs to discover sites, their domains and root directories."""
     sites = []
@@ -318,334 +1117,3185 @@ def discover_sites_from_apache():
         if not os.path.isfile(config_path):
             continue
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            sites.extend(parse_apache_sites(config_path))
+        except Exception as e:
+            print(f"{C.YELLOW}⚠️ Failed to read or parse Apache config {config_file}: {e}{C.RESET}")            
+    CONFIG_CACHE.save()
+    return sites
+
+def _discovery_signature():
+    """Settings that affect discovery results; a change invalidates the index."""
+    return [PYTHON_SCRIPTS, NODEJS_SCRIPTS, sorted(DISCOVERY_SKIP_DIRS)]
+
+def load_discovery_index(start_dir):
+    """Load persisted discovery index for start_dir (empty index if missing or stale)."""
+    empty = {'root': start_dir, 'signature': _discovery_signature(), 'dirs': {}}
+    try:
+        with open(DISCOVERY_INDEX_FILE, 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return empty
+    if (not isinstance(index, dict) or index.get('root') != start_dir
+            or index.get('signature') != _discovery_signature()
+            or not isinstance(index.get('dirs'), dict)):
+        return empty
+    return index
+
+def save_discovery_index(index):
+    """Atomically save discovery index next to the state file."""
+    try:
+        atomic_write(DISCOVERY_INDEX_FILE, json.dumps(index, separators=(',', ':')))
+    except OSError:
+        pass  # the index is only a cache, discovery still works without it
+
+def _detect_bot(dirpath, filenames):
+    """Return bot description if dirpath contains a Python/NodeJS bot, otherwise None."""
+    bot_type = None
+    script_name = None
+
+    # search for Python bot
+    for script in PYTHON_SCRIPTS:
+        if script in filenames:
+            bot_type = 'python'
+            script_name = script
+            break
+
+    # if not Python, search for NodeJS bot
+    if not bot_type and 'package.json' in filenames:
+        for script in NODEJS_SCRIPTS:
+            if script in filenames:
+                bot_type = 'nodejs'
+                script_name = script
+                break
 
-            docroot_match = re.search(r'^\s*DocumentRoot\s+([^\s#]+)', content, re.MULTILINE)
-            server_name_match = re.search(r'^\s*ServerName\s+([^\s#]+)', content, re.MULTILINE)
-            server_aliases = re.findall(r'^\s*ServerAlias\s+(.+)$', content, re.MULTILINE)
+    if not (bot_type and script_name):
+        return None
+
+    return {
+        'name': os.path.basename(dirpath),
+        'dir': dirpath,
+        'type': bot_type,
+        'script': script_name,
+        'python_executable': _venv_python(dirpath) if bot_type == 'python' else None
+    }
+
+def _venv_python(dirpath):
+    """Python of a venv in the bot folder, or None."""
+    for venv_name in VENV_NAMES:
+        venv_python_path = os.path.join(dirpath, venv_name, 'bin', 'python')
+        if os.path.isfile(venv_python_path):
+            return venv_python_path
+    return None
+
+def _with_current_venv(bot):
+    """Copy of an indexed bot with its venv re-checked.
+
+    The index is keyed on the bot folder's mtime, which does not change when
+    venv/bin/python appears inside an existing venv folder.
+    """
+    bot = dict(bot)
+    if bot['type'] == 'python':
+        bot['python_executable'] = _venv_python(bot['dir'])
+    return bot
 
-            if not docroot_match:
+def _scan_directory(dirpath, mtime):
+    """List one directory and build its discovery index entry."""
+    filenames, subdirs = set(), []
+    with os.scandir(dirpath) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    # like os.walk: symlinked folders are listed but not descended into
+                    if entry.is_symlink() or entry.name in DISCOVERY_SKIP_DIRS:
+                        continue
+                    if not os.path.isfile(os.path.join(entry.path, 'pyvenv.cfg')):
+                        subdirs.append(entry.name)
+                else:
+                    filenames.add(entry.name)
+            except OSError:
                 continue
-            root_path = docroot_match.group(1).strip('\'"')
-            if not os.path.isdir(root_path):
+    bot = _detect_bot(dirpath, filenames)
+    # do not descend into a bot folder further (avoid nested bots)
+    return {'mtime': mtime, 'bot': bot, 'subdirs': [] if bot else sorted(subdirs)}
+
+def _walk_discovery(start_dir, old_dirs, new_dirs):
+    """Walk start_dir reusing unchanged entries of old_dirs; fill new_dirs and return bots."""
+    bots = []
+    stack = [start_dir]
+    while stack:
+        dirpath = stack.pop()
+        try:
+            mtime = os.stat(dirpath).st_mtime_ns
+        except OSError:
+            continue
+        entry = old_dirs.get(dirpath)
+        if not entry or entry.get('mtime') != mtime:
+            try:
+                entry = _scan_directory(dirpath, mtime)
+            except OSError:
                 continue
-            valid_domain = None
-            if server_name_match:
-                candidate = server_name_match.group(1).strip()
-                if candidate and candidate != 'localhost':
-                    valid_domain = candidate
-            if not valid_domain and server_aliases:
-                alias_line = server_aliases[0]
-                for name in alias_line.split():
-                    if '.' in name and name != '_' and name.lower() != 'localhost':
-                        valid_domain = name
-                        break
-            if not valid_domain:
-                valid_domain = config_file
-
-            site_type = "PHP" if os.path.isfile(os.path.join(root_path, 'index.php')) else "HTML"
-            sites.append({
-                'name': valid_domain,
-                'config': config_file,
-                'dir': root_path,
-                'type': site_type,
-                'server': 'apache2'
-            })
+        new_dirs[dirpath] = entry
 
-        except Exception as e:
-            print(f"{C.YELLOW}⚠️ Failed to read or parse Apache config {config_file}: {e}{C.RESET}")            
-    return sites
+        if entry['bot']:
+            bots.append(_with_current_venv(entry['bot']))
+            continue
+        stack.extend(os.path.join(dirpath, d) for d in reversed(entry['subdirs']))
+    return bots
 
 def discover_bots_recursive(start_dir):
-    """Recursively search for bot folders starting from start_dir."""
-    all_bots = []
+    """Recursively search for bot folders starting from start_dir.
 
+    Uses the persisted discovery index: a directory is listed again only when its
+    mtime changed, so an unchanged tree costs one stat() per indexed directory.
+    """
     if not os.path.isdir(start_dir):
         print(f"{C.YELLOW}⚠️  Warning: bots directory {start_dir} not found.{C.RESET}")
-        return all_bots
-    for dirpath, dirnames, filenames in os.walk(start_dir):
-        bot_type = None
-        script_name = None
+        return []
 
-        # search for Python bot
-        for script in PYTHON_SCRIPTS:
-            if script in filenames:
-                bot_type = 'python'
-                script_name = script
-                break
+    index = load_discovery_index(start_dir)
+    old_dirs, new_dirs = index['dirs'], {}
+    all_bots = _walk_discovery(start_dir, old_dirs, new_dirs)
 
-        # if not Python, search for NodeJS bot
-        if not bot_type and 'package.json' in filenames:
-            for script in NODEJS_SCRIPTS:
-                if script in filenames:
-                    bot_type = 'nodejs'
-                    script_name = script
-                    break
-                    
-        if bot_type and script_name:
-            python_executable = None
-            if bot_type == 'python':
-                # check for venv in the same folder
-                venv_names = ['venv', '.venv', 'env']
-                for venv_name in venv_names:
-                    venv_python_path = os.path.join(dirpath, venv_name, 'bin', 'python')
-                    if os.path.isfile(venv_python_path):
-                        python_executable = venv_python_path
-                        break
+    if new_dirs != old_dirs:
+        index['dirs'] = new_dirs
+        save_discovery_index(index)
+    return all_bots
 
-            all_bots.append({
-                'name': os.path.basename(dirpath),
-                'dir': dirpath,
-                'type': bot_type,
-                'script': script_name,
-                'python_executable': python_executable
-            })
-            # do not descend into this folder further (avoid nested bots)
-            dirnames[:] = []
-    return all_bots    
+def discover_sites(web_server):
+    """Sites of the active web server (empty if none is detected)."""
+    if web_server and web_server.get('service') == 'nginx':
+        return discover_sites_from_nginx()
+    if web_server and web_server.get('service') == 'apache2':
+        return discover_sites_from_apache()
+    return []
 
 def discover_all_bots_and_sites(web_server):
     """Discover all bots (recursively from BASE_DIR) and sites depending on active web server."""
-    all_bots = discover_bots_recursive(BASE_DIR)
-    all_sites = []
-    if web_server and web_server.get('service') == 'nginx':
-        all_sites = discover_sites_from_nginx()
-    elif web_server and web_server.get('service') == 'apache2':
-        all_sites = discover_sites_from_apache()
-    return all_bots, all_sites
-
-def update_bots_status(all_bots, state):
-    """Update bots statuses and timestamps."""
-    running_procs = {
-        proc.info['cwd']: proc
-        for proc in psutil.process_iter(['pid', 'cmdline', 'cwd', 'create_time'])
-        if proc.info['cwd']
-    }
+    return discover_bots_recursive(BASE_DIR), discover_sites(web_server)
 
-    for bot in all_bots:
-        bot_dir = bot['dir']
-        if bot_dir in running_procs:
-            proc = running_procs[bot_dir]
-            bot['pid'] = proc.info['pid']
-            start_time = datetime.fromtimestamp(proc.info['create_time'], tz=MSK_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
-            bot['status'] = f"🟢 Running (PID: {bot['pid']})"
-            bot['time_info'] = f" | Started: {start_time}"
-        else:
-            bot['pid'] = None
-            bot['status'] = '🔴 Stopped'
-            if bot_dir in state and 'last_stopped' in state[bot_dir]:
-                stop_time = datetime.fromtimestamp(state[bot_dir]['last_stopped'], tz=MSK_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
-                bot['time_info'] = f" | Stopped: {stop_time}"
-            else:
-                bot['time_info'] = ""
-    return all_bots
+class Inotify:
+    """Minimal ctypes wrapper around Linux inotify (non-recursive watches)."""
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    # folder entries added / removed: exactly what changes a directory mtime
+    DIR_EVENTS = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+    _EVENT = struct.Struct('iIII')
 
-def update_sites_status(all_sites, web_server):
-    """Update site statuses (enabled/disabled in Nginx/Apache)."""
-    if not web_server or web_server['service'] not in ('nginx', 'apache2'):
-        for site in all_sites:
-            site['status'] = '⚪️ Unknown (web server not supported)'
-        return all_sites
-    
-    enabled_path = f'/etc/{web_server["service"]}/sites-enabled/'
-    if not os.path.isdir(enabled_path):
-        return all_sites
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
 
-    for site in all_sites:
-        config_file = site.get('config')
-        if not config_file:
-            site['status'] = '⚠️ Config error'
-            continue
-        
-        site['status'] = '🟢 Enabled' if os.path.lexists(os.path.join(enabled_path, config_file)) else '🔴 Disabled'
-    return all_sites
+    def add_watch(self, path, mask):
+        """Watch path for mask events and return the watch descriptor."""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
 
-def kill_bot(pid, name, bot_dir):
-    """Terminate bot process and record stop time."""
-    if not pid:
-        print(f"{C.YELLOW}⚠️  Bot '{name}' has no active process.{C.RESET}")
-        return False
-    try:
-        process = psutil.Process(pid)
-        process.terminate()
-        process.wait(timeout=3)
-    except psutil.TimeoutExpired:
-        process.kill()
-    except psutil.NoSuchProcess:
-        pass
-    except Exception as e:
-        print(f"{C.RED}❌ Failed to terminate process {pid} for '{name}': {e}{C.RESET}")
-        return False
-    
-    state = load_state()
-    state[bot_dir] = {'last_stopped': time.time()}
-    save_state(state)
-    print(f"{C.GREEN}✅ Session for '{name}' (PID: {pid}) successfully terminated.{C.RESET}")
-    return True
+    def rm_watch(self, wd):
+        """Stop watching a descriptor (errors for already removed watches are ignored)."""
+        self._libc.inotify_rm_watch(self.fd, ctypes.c_int(wd))
 
-def start_bot(bot, logging_enabled=True):
-    """Start bot and clear stop timestamp."""
-    name, bot_dir = bot['name'], bot['dir']
-    print(f"{C.CYAN}🚀 Starting '{name}' ({bot['type']})...{C.RESET}")
-    command = None
-    if bot['type'] == 'python':
-        # use python from venv if available, otherwise system python3
-        python_path = bot.get('python_executable') or 'python3'
-        command = ['nohup', python_path, bot['script']]
-        if bot.get('python_executable'):
-            print(f"{C.BLUE}   Using virtual environment (venv).{C.RESET}")
-    elif bot['type'] == 'nodejs':
-        command = ['nohup', 'node', bot['script']]
-    if not command:
-        print(f"{C.RED}❌ Unknown bot type: {bot['type']}{C.RESET}")
-        return
-    try:
-        if logging_enabled:
-            logs_dir = os.path.join(bot_dir, 'logs')
-            os.makedirs(logs_dir, exist_ok=True)
-            log_file_path = os.path.join(logs_dir, f"{name}.log")
+    def read_events(self, timeout=None):
+        """Wait up to timeout seconds and return a list of (wd, mask, name) events."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset + self._EVENT.size <= len(data):
+            wd, mask, _cookie, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
 
-            if os.path.exists(log_file_path):
-                ts = datetime.now(MSK_TIMEZONE).strftime('%Y-%m-%d_%H-%M-%S')
-                rotated_path = os.path.join(logs_dir, f"{name}_{ts}.log")
-                try:
-                    os.rename(log_file_path, rotated_path)
-                    print(f"{C.YELLOW}ℹ️ Old log renamed to: {rotated_path}{C.RESET}")
-                except OSError as e:
-                    print(f"{C.RED}⚠️ Failed to rename old log file: {e}{C.RESET}")
-            with open(log_file_path, 'a') as log_file:
-                subprocess.Popen(
-                    command,
-                    cwd=bot_dir,
-                    stdout=log_file,
-                    stderr=log_file,
-                    start_new_session=True
-                )
-            print(f"{C.GREEN}✅ '{name}' started. Logs are written to: {log_file_path}{C.RESET}")
-        else:
-            subprocess.Popen(
-                command,
-                cwd=bot_dir,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                start_new_session=True
-            )
-            print(f"{C.GREEN}✅ '{name}' started in background (no logging).{C.RESET}")
-            
-        state = load_state()
-        if bot_dir in state:
-            state.pop(bot_dir)
-            save_state(state)
-    except Exception as e:
-        print(f"{C.RED}❌ Failed to start '{name}': {e}{C.RESET}")
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
 
-def get_web_server_status():
-    """Check status of Nginx and Apache2."""
-    servers = {'nginx': 'Nginx', 'apache2': 'Apache2'}
-    for service, name in servers.items():
-        if shutil.which(service) and subprocess.run(['systemctl', 'is-active', '--quiet', service]).returncode == 0:
-            return {'name': name, 'service': service, 'status': '🟢 Active'}
-    return {'name': 'Nginx/Apache', 'service': None, 'status': '🔴 Not found'}
+class DiscoveryRegistry:
+    """In-memory bot/site registry kept up to date by a background watcher.
 
-def reload_web_server(server):
-    """Soft reload of web server."""
-    if not server or not server['service']:
-        print(f"{C.YELLOW}⚠️ No active web server detected.{C.RESET}")
-        return False
-        
-    print(f"{C.CYAN}🔄 Applying configuration for {server['name']}...{C.RESET}")
-    command = ['sudo', 'systemctl', 'reload', server['service']]
-    if run_sudo_command(command, f"Error reloading {server['name']}"):
-        print(f"{C.GREEN}✅ {server['name']} reloaded successfully.{C.RESET}")
-        return True
-    return False
+    Uses inotify when available and falls back to polling directory mtimes.
+    Readers get the prepared lists without touching the filesystem.
+    """
+    SITE_SERVERS = {'nginx': parse_nginx_sites, 'apache2': parse_apache_sites}
 
-def toggle_site_status(site, server, enable):
-    """Enable or disable a site."""
-    service, site_name, config_file = server['service'], site['name'], site.get('config')
-    available_path = f"/etc/{service}/sites-available/"
-    enabled_path = f"/etc/{service}/sites-enabled/"
-    
-    if not config_file or not os.path.exists(os.path.join(available_path, config_file)):
-        print(f"{C.RED}❌ Config file '{config_file}' for '{site_name}' not found in {available_path}{C.RESET}")
-        return
+    def __init__(self, start_dir=BASE_DIR, poll_interval=None):
+        self.start_dir = start_dir
+        self.poll_interval = poll_interval or WATCH_POLL_INTERVAL
+        self.service = None
+        self.mode = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._inotify = None
+        self._watches = {}  # wd -> path
+        self._watched_paths = {}  # path -> wd
+        self._index = load_discovery_index(start_dir)
+        self._dirs = {}
+        self._bots = {}  # bot dir -> bot
+        self._sites = {}  # config file -> sites of its server blocks / vhosts
+        self._enabled = set()
+        self._bots_list, self._sites_list = [], []
 
-    source, link = os.path.join(available_path, config_file), os.path.join(enabled_path, config_file)
-    action_text = "Enabling" if enable else "Disabling"
-    command = ['sudo', 'ln', '-s', source, link] if enable else ['sudo', 'rm', link]
-    error_msg = f"Error while {'enabling' if enable else 'disabling'} site"
-    
-    print(f"{C.CYAN}{action_text} site '{site_name}'...{C.RESET}")
-    if run_sudo_command(command, error_msg):
-        print(f"{C.GREEN}✅ Site '{site_name}' successfully {'enabled' if enable else 'disabled'}.{C.RESET}")
-        reload_web_server(server)
+    # ---- public API ----
 
-def display_menu(bots, sites, web_server):
-    """Render main menu."""
-    clear_screen()
-    term_width = shutil.get_terminal_size().columns
+    def start(self):
+        """Run initial discovery and start the background watcher thread."""
+        with self._lock:
+            new_dirs = {}
+            for bot in _walk_discovery(self.start_dir, self._index['dirs'], new_dirs):
+                self._bots[bot['dir']] = bot
+            self._dirs = new_dirs
+            self._save_index()
+            self._publish()
+        try:
+            self._inotify = Inotify()
+            for dirpath in list(self._dirs):
+                self._watch(dirpath, Inotify.DIR_EVENTS | Inotify.IN_ONLYDIR)
+            self.mode = 'inotify'
+        except (OSError, AttributeError):
+            # no inotify (non-Linux, missing libc symbol or watch limit reached)
+            self._close_inotify()
+            self.mode = 'polling'
+        self._thread = threading.Thread(target=self._run, name='discovery-watcher', daemon=True)
+        self._thread.start()
+        return self
 
-    title = "⚙️ CONTROL PANEL ⚙️".center(term_width)
-    title_colored = gradient_text(title, (190, 160, 255), (245, 215, 190))
-    print(C.BOLD + title_colored + C.RESET)
-    
-    if not bots and not sites:
-        print(f"\nNo bots found in {C.CYAN}{BASE_DIR}{C.RESET} and no sites for the detected web server.")
-        return None
+    def stop(self):
+        """Stop the watcher thread and persist the discovery index."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._close_inotify()
+        with self._lock:
+            self._save_index()
 
-    print(f"\n{C.BOLD}{C.CYAN}💎 Bot list:{C.RESET}")
-    if bots:
-        for i, bot in enumerate(bots):
-            status_color = C.GREEN if '🟢' in bot['status'] else C.RED
-            time_color = C.WHITE if '🟢' in bot['status'] else C.YELLOW
-            # append (venv) label if bot uses virtual environment
-            venv_tag = f" {C.BLUE}(venv){C.RESET}" if bot.get('python_executable') else ""
-            print(
-                f"  {C.YELLOW}[{i+1}]{C.RESET} {bot['name']:<20}{venv_tag} - "
-                f"{status_color}{bot['status']}{C.RESET}"
-                f"{time_color}{bot['time_info']}{C.RESET}"
-            )
-    else:
-        print("  No bots found.")
-    
+    def set_web_server(self, service):
+        """Switch site tracking to the given web server service (nginx/apache2/None)."""
+        with self._lock:
+            if service == self.service:
+                return
+            old_service, self.service = self.service, service
+            self._sites, self._enabled = {}, set()
+            if old_service and self._inotify:
+                for kind in ('sites-available', 'sites-enabled'):
+                    self._unwatch(f'/etc/{old_service}/{kind}')
+            if service in self.SITE_SERVERS:
+                self._load_sites()
+                if self._inotify:
+                    mask = (Inotify.DIR_EVENTS | Inotify.IN_CLOSE_WRITE
+                            | Inotify.IN_ATTRIB | Inotify.IN_ONLYDIR)
+                    for kind in ('sites-available', 'sites-enabled'):
+                        path = f'/etc/{service}/{kind}'
+                        if os.path.isdir(path):
+                            try:
+                                self._watch(path, mask)
+                            except OSError:
+                                pass
+            self._publish()
+
+    def snapshot(self):
+        """Return current (bots, sites) lists; sites already carry their status."""
+        with self._lock:
+            bots, sites = self._bots_list, self._sites_list
+        return [_with_current_venv(b) for b in bots], [dict(s) for s in sites]
+
+    # ---- internals ----
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self._inotify:
+                    self._handle_events(self._inotify.read_events(timeout=0.5))
+                else:
+                    self._stop.wait(self.poll_interval)
+                    self._poll()
+            except Exception:
+                # the watcher must never take the panel down; retry on the next tick
+                self._stop.wait(self.poll_interval)
+
+    def _watch(self, path, mask):
+        wd = self._inotify.add_watch(path, mask)
+        self._watches[wd] = path
+        self._watched_paths[path] = wd
+
+    def _unwatch(self, path):
+        wd = self._watched_paths.pop(path, None)
+        if wd is not None:
+            self._watches.pop(wd, None)
+            self._inotify.rm_watch(wd)
+
+    def _close_inotify(self):
+        if self._inotify:
+            self._inotify.close()
+        self._inotify = None
+        self._watches, self._watched_paths = {}, {}
+
+    def _handle_events(self, events):
+        if not events:
+            return
+        # collect a short burst of events (e.g. unpacking a bot) into one update
+        time.sleep(0.05)
+        events += self._inotify.read_events(timeout=0)
+        dirty_dirs, dirty_sites, full_rescan = set(), False, False
+        for wd, mask, _name in events:
+            if mask & Inotify.IN_Q_OVERFLOW:
+                full_rescan = True
+                continue
+            path = self._watches.get(wd)
+            if path is None or mask & Inotify.IN_IGNORED:
+                continue
+            if path.startswith('/etc/'):
+                dirty_sites = True
+            else:
+                dirty_dirs.add(os.path.dirname(path) if mask & (Inotify.IN_DELETE_SELF | Inotify.IN_MOVE_SELF) else path)
+        with self._lock:
+            if full_rescan:
+                dirty_dirs = {self.start_dir}
+                dirty_sites = True
+            for dirpath in self._outermost(dirty_dirs):
+                self._rescan(dirpath)
+            if dirty_sites:
+                self._load_sites()
+            if dirty_dirs:
+                self._save_index()
+            self._publish()
+
+    def _poll(self):
+        """Polling fallback: stat indexed folders and site configs, rescan what changed."""
+        with self._lock:
+            dirty = set()
+            for dirpath, entry in list(self._dirs.items()):
+                try:
+                    if os.stat(dirpath).st_mtime_ns != entry['mtime']:
+                        dirty.add(dirpath)
+                except OSError:
+                    dirty.add(os.path.dirname(dirpath))
+            for dirpath in self._outermost(dirty):
+                self._rescan(dirpath)
+            sites_changed = self.service in self.SITE_SERVERS and self._load_sites()
+            if dirty:
+                self._save_index()
+            if dirty or sites_changed:
+                self._publish()
+
+    @staticmethod
+    def _outermost(paths):
+        """Drop paths that are inside another path of the set."""
+        result = []
+        for path in sorted(paths):
+            if not any(path.startswith(parent + os.sep) for parent in result):
+                result.append(path)
+        return result
+
+    def _rescan(self, dirpath):
+        """Re-walk one subtree and merge the result into the registry."""
+        if dirpath != self.start_dir and not dirpath.startswith(self.start_dir + os.sep):
+            return
+        prefix = dirpath + os.sep
+        inside = lambda d: d == dirpath or d.startswith(prefix)
+        old_dirs = {d: e for d, e in self._dirs.items() if inside(d)}
+        new_dirs = {}
+        bots = _walk_discovery(dirpath, old_dirs, new_dirs)
+
+        for d in old_dirs.keys() - new_dirs.keys():
+            self._dirs.pop(d, None)
+            if self._inotify:
+                self._unwatch(d)
+        for d, entry in new_dirs.items():
+            if d not in self._dirs and self._inotify:
+                try:
+                    self._watch(d, Inotify.DIR_EVENTS | Inotify.IN_ONLYDIR)
+                except OSError:
+                    pass
+            self._dirs[d] = entry
+        for bot_dir in [d for d in self._bots if inside(d)]:
+            del self._bots[bot_dir]
+        for bot in bots:
+            self._bots[bot['dir']] = bot
+
+    def _load_sites(self):
+        """Re-read site configs and enabled flags; return True if anything changed.
+
+        Unchanged config files (and their includes) come from CONFIG_CACHE, so this
+        costs a stat() per file unless something was edited.
+        """
+        parse = self.SITE_SERVERS.get(self.service)
+        if not parse:
+            return False
+        available_path = f'/etc/{self.service}/sites-available'
+        enabled_path = f'/etc/{self.service}/sites-enabled'
+        sites = {}
+        try:
+            names = os.listdir(available_path)
+        except OSError:
+            names = []
+        for config_file in names:
+            config_path = os.path.join(available_path, config_file)
+            if not os.path.isfile(config_path):
+                continue
+            try:
+                parsed = parse(config_path)
+            except Exception:
+                continue
+            if parsed:
+                sites[config_file] = parsed
+        CONFIG_CACHE.save()
+        changed = sites != self._sites
+        self._sites = sites
+        try:
+            enabled = set(os.listdir(enabled_path))
+        except OSError:
+            enabled = set()
+        if enabled != self._enabled:
+            self._enabled = enabled
+            changed = True
+        return changed
+
+    def _publish(self):
+        """Rebuild the ordered lists handed out by snapshot()."""
+        self._bots_list = sorted(self._bots.values(), key=lambda b: b['dir'])
+        sites = []
+        for config_file in sorted(self._sites):
+            for site in self._sites[config_file]:
+                site = dict(site)
+                site['status'] = '🟢 Enabled' if config_file in self._enabled else '🔴 Disabled'
+                sites.append(site)
+        self._sites_list = sites
+
+    def _save_index(self):
+        if self._dirs != self._index['dirs']:
+            self._index['dirs'] = dict(self._dirs)
+            save_discovery_index(self._index)
+
+class ProcessSnapshot:
+    """Incremental process table grouped by working directory.
+
+    On Linux /proc is read directly: every refresh reads only /proc/<pid>/stat to
+    tell new processes from known ones (pid + start time), and cwd/cmdline are
+    read once per new process. Elsewhere it falls back to psutil.process_iter.
+    """
+
+    def __init__(self):
+        self._cache = {}  # pid -> info dict (pid, ppid, start_ticks, create_time, cwd, cmdline)
+        self.by_cwd = {}
+        self._use_proc = os.path.isdir('/proc/self') and os.path.exists('/proc/self/stat')
+        self._clk_tck = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+        self._boot_time = None
+        self._refreshed = None
+
+    @staticmethod
+    def read_stat(pid):
+        """Return fields of /proc/<pid>/stat after the command name (state is index 0)."""
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            data = f.read()
+        return data[data.rfind(b')') + 2:].split()
+
+    def refresh(self, max_age=None):
+        """Re-read the process table and rebuild the cwd -> processes map.
+
+        With max_age the previous scan is reused if it is younger than that many seconds.
+        """
+        if max_age and self._refreshed is not None and time.monotonic() - self._refreshed < max_age:
+            return self.by_cwd
+        if self._use_proc:
+            try:
+                self._refresh_proc()
+            except OSError:
+                self._use_proc = False
+                self._refresh_psutil()
+        else:
+            self._refresh_psutil()
+
+        by_cwd = {}
+        for info in self._cache.values():
+            if info['cwd']:
+                by_cwd.setdefault(info['cwd'], []).append(info)
+        for procs in by_cwd.values():
+            procs.sort(key=lambda p: (p['create_time'], p['pid']))
+        self.by_cwd = by_cwd
+        self._refreshed = time.monotonic()
+        return by_cwd
+
+    def _refresh_proc(self):
+        if self._boot_time is None:
+            self._boot_time = psutil.boot_time()
+        cache, fresh = self._cache, {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            pid = int(entry)
+            try:
+                fields = self.read_stat(pid)
+                ppid, start_ticks = int(fields[1]), int(fields[19])
+            except (OSError, IndexError, ValueError):
+                continue
+            info = cache.get(pid)
+            if info is None or info['start_ticks'] != start_ticks:
+                info = {
+                    'pid': pid,
+                    'ppid': ppid,
+                    'start_ticks': start_ticks,
+                    'create_time': self._boot_time + start_ticks / self._clk_tck,
+                    'cwd': self._read_cwd(pid),
+                    'cmdline': self._read_cmdline(pid),
+                }
+            else:
+                info['ppid'] = ppid  # re-parented after its parent exited
+            fresh[pid] = info
+        self._cache = fresh
+
+    def _refresh_psutil(self):
+        cache, fresh = self._cache, {}
+        for proc in psutil.process_iter(['pid', 'ppid', 'create_time']):
+            pid, create_time = proc.info['pid'], proc.info['create_time']
+            info = cache.get(pid)
+            if info is None or info['create_time'] != create_time:
+                try:
+                    cwd, cmdline = proc.cwd(), proc.cmdline()
+                except (psutil.Error, OSError):
+                    cwd, cmdline = None, []
+                info = {'pid': pid, 'ppid': proc.info['ppid'], 'start_ticks': None,
+                        'create_time': create_time, 'cwd': cwd, 'cmdline': cmdline}
+            fresh[pid] = info
+        self._cache = fresh
+
+    @staticmethod
+    def _read_cwd(pid):
+        try:
+            return os.readlink(f'/proc/{pid}/cwd')
+        except OSError:
+            return None
+
+    @staticmethod
+    def _read_cmdline(pid):
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                return [os.fsdecode(arg) for arg in f.read().split(b'\0') if arg]
+        except OSError:
+            return []
+
+    def children_map(self):
+        """Map parent pid -> child pids from the last refresh."""
+        children = {}
+        for info in self._cache.values():
+            children.setdefault(info['ppid'], []).append(info['pid'])
+        return children
+
+    def bot_processes(self, bot_dir):
+        """Processes running in bot_dir, root (oldest) process first."""
+        procs = self.by_cwd.get(bot_dir, [])
+        if len(procs) > 1:
+            pids = {p['pid'] for p in procs}
+            roots = [p for p in procs if p['ppid'] not in pids]
+            procs = roots + [p for p in procs if p['ppid'] in pids]
+        return procs
+
+PROCESS_SNAPSHOT = ProcessSnapshot()
+
+def bot_cgroup_path(bot_dir):
+    """cgroup v2 directory used for a bot (unique per bot folder)."""
+    digest = hashlib.sha1(bot_dir.encode('utf-8', 'surrogateescape')).hexdigest()[:8]
+    slug = re.sub(r'[^A-Za-z0-9_.-]', '_', os.path.basename(bot_dir)) or 'bot'
+    return os.path.join(CGROUP_ROOT, f"{slug}-{digest}")
+
+def prepare_bot_cgroup(bot_dir):
+    """Create the bot cgroup if cgroups are enabled and usable; return its path or None."""
+    if not USE_CGROUPS or not os.path.isfile('/sys/fs/cgroup/cgroup.controllers'):
+        return None
+    path = bot_cgroup_path(bot_dir)
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError as e:
+        print(f"{C.YELLOW}⚠️ Failed to create cgroup {path}: {e}{C.RESET}")
+        return None
+    return path
+
+def read_cgroup_procs(cgroup):
+    """Return pids listed in cgroup.procs, or None if the cgroup is gone."""
+    try:
+        with open(os.path.join(cgroup, 'cgroup.procs'), 'r') as f:
+            return [int(line) for line in f if line.strip()]
+    except (OSError, ValueError):
+        return None
+
+def remove_bot_cgroup(cgroup):
+    """Remove an empty bot cgroup (the kernel refuses while processes are inside)."""
+    if cgroup and read_cgroup_procs(cgroup) == []:
+        try:
+            os.rmdir(cgroup)
+        except OSError:
+            pass
+
+def record_bot_stopped(state, bot_dir, stopped_at=None):
+    """Mark a bot stopped inside a state transaction, keeping its other fields (starts)."""
+    entry = state.setdefault(bot_dir, {})
+    remove_bot_cgroup(entry.pop('cgroup', None))
+    entry.pop('create_time', None)
+    entry.update(last_stopped=stopped_at or time.time(), pid=None)
+
+def tracked_bot_processes(entry):
+    """Live processes of a bot started by the panel, looked up from its state entry.
+
+    Cost is one cgroup.procs read or one /proc/<pid> lookup per bot, independent
+    of how many processes run on the host. Returns [] if the bot is not running.
+    """
+    pid, create_time = entry.get('pid'), entry.get('create_time')
+    procs = []
+    if pid:
+        try:
+            proc = psutil.Process(pid)
+            if abs(proc.create_time() - (create_time or 0)) < 1 and proc.status() != psutil.STATUS_ZOMBIE:
+                procs.append({'pid': pid, 'create_time': proc.create_time()})
+        except psutil.Error:
+            pass
+    cgroup_pids = read_cgroup_procs(entry['cgroup']) if entry.get('cgroup') else None
+    for cgroup_pid in cgroup_pids or []:
+        if cgroup_pid == pid:
+            continue
+        try:
+            procs.append({'pid': cgroup_pid, 'create_time': psutil.Process(cgroup_pid).create_time()})
+        except psutil.Error:
+            continue
+    return procs
+
+def _set_bot_status(bot, procs, state):
+    """Fill status fields of a bot from its processes (root process first)."""
+    bot_dir = bot['dir']
+    bot['pids'] = [p['pid'] for p in procs]
+    if procs:
+        proc = procs[0]
+        bot['pid'] = proc['pid']
+        bot['create_time'] = proc['create_time']
+        start_time = datetime.fromtimestamp(proc['create_time'], tz=MSK_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+        extra = f", +{len(procs) - 1} more" if len(procs) > 1 else ""
+        bot['status'] = f"🟢 Running (PID: {bot['pid']}{extra})"
+        bot['time_info'] = f" | Started: {start_time}"
+    else:
+        bot['pid'] = None
+        bot['create_time'] = None
+        bot['status'] = '🔴 Stopped'
+        if bot_dir in state and 'last_stopped' in state[bot_dir]:
+            stop_time = datetime.fromtimestamp(state[bot_dir]['last_stopped'], tz=MSK_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+            bot['time_info'] = f" | Stopped: {stop_time}"
+        else:
+            bot['time_info'] = ""
+
+def update_bots_status(all_bots, state, supervised=None):
+    """Update bots statuses and timestamps.
+
+    Bots owned by the supervisor daemon take their status from its reply (supervised);
+    bots started by the panel are checked directly via their recorded PID/cgroup;
+    the process table is scanned, at most once per PROCESS_SCAN_INTERVAL, only for
+    bots without a live tracked process (see DISCOVER_UNTRACKED_PROCESSES).
+    """
+    untracked = []
+    supervised = supervised or {}
+    for bot in all_bots:
+        info = supervised.get(bot['dir'])
+        if info and info['state'] != 'stopped':
+            procs = [{'pid': info['pid'], 'create_time': info['create_time']}] if info['pid'] else []
+            _set_bot_status(bot, procs, state)
+            bot['supervised'] = True
+            if info['state'] == 'backoff':
+                bot['status'] = f"🟡 Restarting in {info['next_start_in'] or 0:.0f}s"
+            if info['restarts']:
+                bot['time_info'] += f" | Restarts: {info['restarts']}"
+            continue
+        entry = state.get(bot['dir'], {})
+        procs = tracked_bot_processes(entry) if entry.get('pid') or entry.get('cgroup') else []
+        # scan only when no tracked process is alive: the bot may have been started by
+        # hand, cron or systemd after the panel stopped it (or after a reboot)
+        if procs or not DISCOVER_UNTRACKED_PROCESSES:
+            _set_bot_status(bot, procs, state)
+        else:
+            untracked.append(bot)
+
+    if untracked:
+        PROCESS_SNAPSHOT.refresh(max_age=PROCESS_SCAN_INTERVAL)
+        for bot in untracked:
+            _set_bot_status(bot, PROCESS_SNAPSHOT.bot_processes(bot['dir']), state)
+    return all_bots
+
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+
+def sparkline(values, top=None):
+    """Render a sequence of numbers as a unicode sparkline."""
+    if not values:
+        return ''
+    top = top or max(values) or 1.0
+    last = len(SPARK_CHARS) - 1
+    return ''.join(SPARK_CHARS[max(0, min(last, int(v / top * last + 0.5)))] for v in values)
+
+def format_bytes(num):
+    """Human-readable byte count."""
+    for unit in ('B', 'K', 'M', 'G'):
+        if abs(num) < 1024:
+            return f"{num:.0f}{unit}" if unit == 'B' else f"{num:.1f}{unit}"
+        num /= 1024
+    return f"{num:.1f}T"
+
+class MetricRing:
+    """Fixed-size metric history of one bot: one preallocated array('f') per metric."""
+    FIELDS = ('cpu', 'rss', 'fds', 'threads', 'io')
+
+    def __init__(self, size):
+        self.size = size
+        self.pos = 0
+        self.count = 0
+        self.buffers = {name: array('f', bytes(4 * size)) for name in self.FIELDS}
+
+    def push(self, cpu, rss, fds, threads, io):
+        i, b = self.pos, self.buffers
+        b['cpu'][i], b['rss'][i], b['fds'][i], b['threads'][i], b['io'][i] = cpu, rss, fds, threads, io
+        self.pos = (i + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def latest(self, name):
+        return self.buffers[name][self.pos - 1] if self.count else 0.0
+
+    def values(self, name, n=None):
+        """Last n samples of a metric, oldest first."""
+        n = min(n or self.count, self.count)
+        buf, start = self.buffers[name], (self.pos - n) % self.size
+        if start + n <= self.size:
+            return buf[start:start + n]
+        return buf[start:] + buf[:start + n - self.size]
+
+class MetricsSampler:
+    """Background sampler of resource usage per bot process tree.
+
+    Every tick costs one /proc/<pid>/stat read per tracked pid (CPU, RSS, threads);
+    open FDs, /proc/<pid>/io and the child pid list are refreshed every
+    METRICS_SLOW_EVERY ticks. Samples go straight into the bot's MetricRing.
+    """
+
+    def __init__(self, interval=None, history=None):
+        self.interval = interval or METRICS_INTERVAL
+        self.history = history or METRICS_HISTORY
+        self.rings = {}  # bot dir -> MetricRing
+        self._roots = {}  # bot dir -> root pids reported by update_bots_status()
+        self._trees = {}  # bot dir -> pids of the whole process tree
+        self._prev = {}  # pid -> [start, cpu_sec, fds, io_bytes, io_rate, io_time]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._use_proc = os.path.exists('/proc/self/stat')
+        self._clk_tck = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+        self._page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='metrics-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval * 2)
+
+    def track(self, bots):
+        """Sample the given bots (running ones, by their pids) from the next tick on."""
+        roots = {b['dir']: tuple(b['pids']) for b in bots if b.get('pids')}
+        with self._lock:
+            for bot_dir in list(self.rings):
+                if bot_dir not in roots:
+                    del self.rings[bot_dir]
+            for bot_dir, pids in roots.items():
+                if self._roots.get(bot_dir) != pids:
+                    self._trees.pop(bot_dir, None)
+            self._roots = roots
+
+    def ring(self, bot_dir):
+        return self.rings.get(bot_dir)
+
+    def _run(self):
+        tick, last = 0, time.monotonic()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            try:
+                self.sample(now - last, slow=tick % METRICS_SLOW_EVERY == 0)
+            except Exception:
+                pass  # never let a sampling error kill the thread
+            last, tick = now, tick + 1
+
+    def sample(self, elapsed, slow=False):
+        """Take one sample of every tracked bot."""
+        with self._lock:
+            roots, trees = dict(self._roots), self._trees
+        now, alive = time.monotonic(), set()
+        for bot_dir, root_pids in roots.items():
+            tree = trees.get(bot_dir)
+            if tree is None or slow:
+                tree = trees[bot_dir] = self._process_tree(root_pids)
+            cpu = rss = fds = threads = io = 0.0
+            for pid in tree:
+                counters = self._read_counters(pid)
+                if counters is None:
+                    continue
+                start, cpu_sec, pid_threads, pid_rss = counters
+                alive.add(pid)
+                prev = self._prev.get(pid)
+                if prev is None or prev[0] != start:
+                    prev = self._prev[pid] = [start, cpu_sec, 0, None, 0.0, now]
+                    slow_pid = True
+                else:
+                    cpu += max(0.0, cpu_sec - prev[1]) / elapsed * 100 if elapsed > 0 else 0.0
+                    prev[1] = cpu_sec
+                    slow_pid = slow
+                if slow_pid:
+                    self._read_slow(pid, prev, now)
+                rss += pid_rss
+                threads += pid_threads
+                fds += prev[2]
+                io += prev[4]
+            with self._lock:
+                ring = self.rings.get(bot_dir)
+                if ring is None and bot_dir in self._roots:
+                    ring = self.rings[bot_dir] = MetricRing(self.history)
+            if ring is not None:
+                ring.push(cpu, rss, fds, threads, io)
+        for pid in [pid for pid in self._prev if pid not in alive]:
+            del self._prev[pid]
+
+    def _read_counters(self, pid):
+        """(start id, cpu seconds, threads, rss bytes) of a pid, or None if it is gone."""
+        if self._use_proc:
+            try:
+                fields = ProcessSnapshot.read_stat(pid)
+                if fields[0] == b'Z':
+                    return None
+                return (int(fields[19]), (int(fields[11]) + int(fields[12])) / self._clk_tck,
+                        int(fields[17]), int(fields[21]) * self._page_size)
+            except (OSError, IndexError, ValueError):
+                return None
+        try:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                times = proc.cpu_times()
+                return (proc.create_time(), times.user + times.system,
+                        proc.num_threads(), proc.memory_info().rss)
+        except psutil.Error:
+            return None
+
+    def _read_slow(self, pid, prev, now):
+        """Refresh open FDs and the I/O rate (bytes/s read + written) of a pid."""
+        fds = io_bytes = None
+        if self._use_proc:
+            try:
+                fds = len(os.listdir(f'/proc/{pid}/fd'))
+            except OSError:
+                pass
+            try:
+                with open(f'/proc/{pid}/io', 'rb') as f:
+                    io_bytes = sum(int(line.split()[1]) for line in f if line.startswith((b'rchar', b'wchar')))
+            except (OSError, ValueError, IndexError):
+                pass
+        else:
+            try:
+                proc = psutil.Process(pid)
+                fds = proc.num_fds() if hasattr(proc, 'num_fds') else None
+                if hasattr(proc, 'io_counters'):
+                    counters = proc.io_counters()
+                    io_bytes = counters.read_chars + counters.write_chars
+            except (psutil.Error, AttributeError):
+                pass
+        if fds is not None:
+            prev[2] = fds
+        if io_bytes is not None:
+            if prev[3] is not None and now > prev[5]:
+                prev[4] = max(0, io_bytes - prev[3]) / (now - prev[5])
+            prev[3], prev[5] = io_bytes, now
+
+    def _process_tree(self, root_pids):
+        """Root pids plus all their descendants."""
+        tree, pending = [], list(root_pids)
+        seen = set()
+        while pending:
+            pid = pending.pop()
+            if pid in seen:
+                continue
+            seen.add(pid)
+            tree.append(pid)
+            try:
+                if self._use_proc:
+                    with open(f'/proc/{pid}/task/{pid}/children', 'rb') as f:
+                        pending.extend(int(child) for child in f.read().split())
+                else:
+                    pending.extend(child.pid for child in psutil.Process(pid).children())
+            except (OSError, ValueError, psutil.Error):
+                continue
+        return tree
+
+def bot_metrics_line(ring, width=None):
+    """One line of sparklines for a bot's metric history."""
+    width = width or METRICS_SPARK_WIDTH
+    cpu = ring.values('cpu', width)
+    rss = ring.values('rss', width)
+    return (
+        f"cpu {sparkline(cpu, max(100.0, max(cpu)))} {ring.latest('cpu'):5.1f}%  "
+        f"mem {sparkline(rss)} {format_bytes(ring.latest('rss')):>6}  "
+        f"fds {ring.latest('fds'):.0f}  thr {ring.latest('threads'):.0f}  "
+        f"io {format_bytes(ring.latest('io'))}/s"
+    )
+
+class HealthRing:
+    """Last N probe results of one site: latency (ms) and HTTP status (0 = failed)."""
+
+    def __init__(self, size):
+        self.size = size
+        self.pos = 0
+        self.count = 0
+        self.latency = array('f', bytes(4 * size))
+        self.codes = array('H', bytes(2 * size))
+        self.last_error = None
+
+    def push(self, latency_ms, code, error=None):
+        self.latency[self.pos], self.codes[self.pos] = latency_ms, code
+        self.pos = (self.pos + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+        self.last_error = error
+
+    def summary(self):
+        """Latest code, p50/p95 latency of successful probes and success ratio."""
+        if not self.count:
+            return None
+        window = range(self.count) if self.count < self.size else range(self.size)
+        latencies = sorted(self.latency[i] for i in window if self.codes[i])
+        ok = sum(1 for i in window if 0 < self.codes[i] < 500)
+
+        def percentile(q):
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+        return {
+            'code': self.codes[self.pos - 1],
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'ok_ratio': ok / self.count,
+            'probes': self.count,
+            'error': self.last_error,
+        }
+
+def site_probe_target(site, address=None, port=None):
+    """(scheme, address, port, host) to probe a site on the local web server."""
+    ports, ssl_ports = site.get('ports') or [80], site.get('ssl_ports') or []
+    if not port:
+        # the HTTPS listener is what visitors use when a site has one
+        port = (443 if 443 in ssl_ports else ssl_ports[0]) if ssl_ports else ports[0]
+    scheme = 'https' if port in ssl_ports or (port == 443 and not ssl_ports) else 'http'
+    return scheme, address or HEALTH_ADDRESS, port, site['name']
+
+class HealthProber:
+    """Concurrent HTTP(S) health checks of sites against a local address.
+
+    Runs an asyncio loop on a background thread. Each probe sends HEALTH_METHOD
+    with the site's Host header (and SNI for https) and keeps the connection open
+    for the next round; results go to a HealthRing per site.
+    """
+
+    def __init__(self, address=None, port=None, path=None, method=None, timeout=None,
+                 interval=None, history=None, concurrency=None):
+        self.address = address or HEALTH_ADDRESS
+        self.port = port
+        self.path = path or HEALTH_PATH
+        self.method = (method or HEALTH_METHOD).upper()
+        self.timeout = timeout or HEALTH_TIMEOUT
+        self.interval = interval or HEALTH_INTERVAL
+        self.history = history or HEALTH_HISTORY
+        self.concurrency = concurrency or HEALTH_CONCURRENCY
+        self.rings = {}  # site name -> HealthRing
+        self._sites = []
+        self._pool = {}  # (scheme, address, port, host) -> (reader, writer)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._ssl = ssl.create_default_context()
+        # local address: the certificate is for the domain, often self-signed in staging
+        self._ssl.check_hostname = False
+        self._ssl.verify_mode = ssl.CERT_NONE
+
+    def set_sites(self, sites):
+        with self._lock:
+            self._sites = [dict(site) for site in sites]
+
+    def summary(self, site_name):
+        ring = self.rings.get(site_name)
+        return ring.summary() if ring else None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run_thread, name='health-prober', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _run_thread(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.create_task(self._run())
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            await self.probe_round()
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def probe_round(self, sites=None):
+        """Probe every site once (bounded by concurrency); returns {site name: (latency ms, code, error)}."""
+        with self._lock:
+            sites = list(sites if sites is not None else self._sites)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(site):
+            async with semaphore:
+                return site['name'], await self.probe(site)
+        results = dict(await asyncio.gather(*(one(site) for site in sites)))
+        for name, (latency_ms, code, error) in results.items():
+            ring = self.rings.get(name)
+            if ring is None:
+                ring = self.rings[name] = HealthRing(self.history)
+            ring.push(latency_ms, code, error)
+        return results
+
+    async def probe(self, site):
+        """One request; returns (latency ms, status code or 0, error or None)."""
+        target = site_probe_target(site, self.address, self.port)
+        started = time.perf_counter()
+        for attempt in (0, 1):
+            reused = target in self._pool
+            try:
+                code = await asyncio.wait_for(self._request(target), timeout=self.timeout)
+                return (time.perf_counter() - started) * 1000, code, None
+            except asyncio.TimeoutError:
+                # checked first: since Python 3.11 this is the builtin TimeoutError, an OSError
+                self._discard(target)
+                return (time.perf_counter() - started) * 1000, 0, 'timeout'
+            except (OSError, asyncio.IncompleteReadError, ValueError, ssl.SSLError) as e:
+                self._discard(target)
+                if reused and attempt == 0:
+                    started = time.perf_counter()
+                    continue  # the kept-alive connection was closed by the server
+                return (time.perf_counter() - started) * 1000, 0, str(e) or type(e).__name__
+
+    async def _request(self, target):
+        scheme, address, port, host = target
+        connection = self._pool.pop(target, None)
+        if connection is None:
+            connection = await asyncio.open_connection(
+                address, port, ssl=self._ssl if scheme == 'https' else None,
+                server_hostname=host if scheme == 'https' else None)
+        reader, writer = connection
+        default_port = 443 if scheme == 'https' else 80
+        host_header = host if port == default_port else f"{host}:{port}"
+        writer.write(
+            f"{self.method} {self.path} HTTP/1.1\r\nHost: {host_header}\r\n"
+            f"User-Agent: workmanager-health\r\nAccept: */*\r\n\r\n".encode()
+        )
+        await writer.drain()
+        status_line = await reader.readuntil(b'\r\n')
+        parts = status_line.split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith(b'HTTP/'):
+            raise ValueError('not an HTTP response')
+        code = int(parts[1])
+        headers = {}
+        while True:
+            line = await reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip().lower()
+        keep_alive = await self._skip_body(reader, headers, code)
+        if keep_alive and headers.get('connection') != 'close':
+            self._pool[target] = connection
+        else:
+            writer.close()
+        return code
+
+    async def _skip_body(self, reader, headers, code):
+        """Consume the response body; returns False if the connection can't be reused."""
+        if self.method == 'HEAD' or code in (204, 304) or 100 <= code < 200:
+            return True
+        if 'chunked' in headers.get('transfer-encoding', ''):
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    return True
+        if 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+            return True
+        await reader.read()  # body delimited by connection close
+        return False
+
+    def _discard(self, target):
+        connection = self._pool.pop(target, None)
+        if connection:
+            connection[1].close()
+
+def format_health(summary):
+    """Short health column text for a site."""
+    if not summary:
+        return f"{C.DIM}health: pending{C.RESET}"
+    if not summary['code']:
+        return f"{C.RED}✗ {summary['error']}{C.RESET}"
+    color = C.GREEN if summary['code'] < 400 else C.YELLOW if summary['code'] < 500 else C.RED
+    latency = f" p50 {summary['p50_ms']:.0f}ms p95 {summary['p95_ms']:.0f}ms" if summary['p50_ms'] is not None else ""
+    return f"{color}{summary['code']}{C.RESET}{C.DIM}{latency} ok {summary['ok_ratio'] * 100:.0f}%{C.RESET}"
+
+class AccessLogAnalyzer:
+    """Incremental analytics over web server access logs (combined / vhost_combined formats).
+
+    Every update() reads only the bytes appended since the last one (following a
+    rotation into the renamed '.1' file), parses a whole chunk with one regex pass
+    and folds it into per-(log, vhost) aggregates with Counter updates. Offsets
+    and aggregates are kept in ACCESS_LOG_STATE_FILE between runs.
+    """
+    LINE_RE = re.compile(
+        rb'^(?:(\S+):\d+ )?\S+ \S+ \S+ \[([^\]]+)\] "(?:[A-Z]+) (\S+)[^"]*" (\d{3}) (\d+|-)',
+        re.MULTILINE
+    )
+
+    def __init__(self, path=None):
+        self.path = path or ACCESS_LOG_STATE_FILE
+        try:
+            with open(self.path, 'r') as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+        self.logs = self.state.setdefault('logs', {})  # log path -> {inode, offset}
+        self.stats = self.state.setdefault('stats', {})  # "log\0vhost" -> aggregates
+
+    def save(self):
+        try:
+            atomic_write(self.path, json.dumps(self.state, separators=(',', ':')))
+        except OSError:
+            pass
+
+    def update(self, log_paths):
+        """Read what was appended to the given logs; returns bytes read."""
+        total = 0
+        for log_path in sorted(set(log_paths)):
+            try:
+                st = os.stat(log_path)
+            except OSError:
+                continue
+            tracked = self.logs.get(log_path)
+            if tracked is None:
+                # first sight: only look at the recent tail, never the whole history
+                start = max(0, st.st_size - ACCESS_LOG_BOOTSTRAP_BYTES)
+                total += self._read(log_path, start, st.st_size, skip_partial=start > 0)
+            elif tracked['inode'] != st.st_ino or st.st_size < tracked['offset']:
+                rotated = f"{log_path}.1"
+                try:
+                    old = os.stat(rotated)
+                    if old.st_ino == tracked['inode'] and old.st_size > tracked['offset']:
+                        total += self._read(rotated, tracked['offset'], old.st_size, stats_path=log_path)
+                except OSError:
+                    pass
+                total += self._read(log_path, 0, st.st_size)
+            else:
+                total += self._read(log_path, tracked['offset'], st.st_size)
+            offset = self.logs.get(log_path, {}).get('offset', st.st_size)
+            self.logs[log_path] = {'inode': st.st_ino, 'offset': offset}
+        return total
+
+    def _read(self, file_path, start, end, skip_partial=False, stats_path=None):
+        """Aggregate complete lines between start and end; records the new offset."""
+        stats_path = stats_path or file_path
+        offset = start
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            if skip_partial:
+                offset += len(f.readline())
+            while offset < end:
+                data = f.read(min(ACCESS_LOG_CHUNK, end - offset))
+                if not data:
+                    break
+                cut = data.rfind(b'\n') + 1
+                if not cut:
+                    break  # unfinished line, wait for the rest
+                self._aggregate(stats_path, data[:cut])
+                offset += cut
+                f.seek(offset)
+        if stats_path == file_path:
+            self.logs[file_path] = {'inode': os.stat(file_path).st_ino, 'offset': offset}
+        return offset - start
+
+    def _aggregate(self, log_path, data):
+        by_vhost = {}
+        for vhost, when, path, status, size in self.LINE_RE.findall(data):
+            by_vhost.setdefault(vhost, []).append((when, path, status, size))
+        for vhost, rows in by_vhost.items():
+            key = f"{log_path}\0{vhost.decode('latin-1').lower()}"
+            agg = self.stats.setdefault(key, {'requests': 0, 'bytes': 0, 'status': {}, 'paths': {}, 'seconds': {}})
+            whens, paths, statuses, sizes = zip(*rows)
+            agg['requests'] += len(rows)
+            agg['bytes'] += sum(int(s) for s in sizes if s != b'-')
+            status = Counter(agg['status'])
+            status.update(s.decode() for s in statuses)
+            agg['status'] = dict(status)
+            top = Counter(agg['paths'])
+            top.update(p.split(b'?', 1)[0].decode('utf-8', 'replace') for p in paths)
+            agg['paths'] = dict(top.most_common(ACCESS_LOG_TOP_PATHS))
+            # parse each distinct timestamp once
+            seconds = Counter(agg['seconds'])
+            for when, count in Counter(whens).items():
+                try:
+                    ts = int(datetime.strptime(when.decode(), '%d/%b/%Y:%H:%M:%S %z').timestamp())
+                except ValueError:
+                    continue
+                seconds[str(ts)] += count
+            newest = max((int(t) for t in seconds), default=0)
+            agg['seconds'] = {t: c for t, c in seconds.items() if int(t) > newest - ACCESS_LOG_RATE_WINDOW * 5}
+
+    def site_stats(self, site):
+        """Aggregates of a site: its own vhost entry if the log has a vhost field, else the whole log."""
+        log_path = site.get('access_log')
+        if not log_path:
+            return None
+        names = [n.lower() for n in [site['name']] + list(site.get('names') or [])]
+        for name in names:
+            agg = self.stats.get(f"{log_path}\0{name}")
+            if agg:
+                return dict(agg, shared=False)
+        agg = self.stats.get(f"{log_path}\0")
+        return dict(agg, shared=True) if agg else None
+
+    @staticmethod
+    def rate(agg, now=None):
+        """Requests per second over the last ACCESS_LOG_RATE_WINDOW seconds of log time."""
+        if not agg or not agg['seconds']:
+            return 0.0
+        now = now or time.time()
+        return sum(c for t, c in agg['seconds'].items() if int(t) > now - ACCESS_LOG_RATE_WINDOW) / ACCESS_LOG_RATE_WINDOW
+
+def traffic_report(sites, top=5):
+    """Update access-log analytics for sites and return one summary per site."""
+    analyzer = AccessLogAnalyzer()
+    started = time.monotonic()
+    read = analyzer.update([s['access_log'] for s in sites if s.get('access_log')])
+    analyzer.save()
+    report = []
+    for site in sites:
+        agg = analyzer.site_stats(site)
+        entry = {'name': site['name'], 'access_log': site.get('access_log'), 'requests': 0, 'bytes': 0,
+                 'rps': 0.0, 'status': {}, 'top_paths': [], 'shared_log': False}
+        if agg:
+            classes = Counter()
+            for code, count in agg['status'].items():
+                classes[f"{code[0]}xx"] += count
+            entry.update(requests=agg['requests'], bytes=agg['bytes'], rps=analyzer.rate(agg),
+                         status=dict(sorted(classes.items())), shared_log=agg['shared'],
+                         top_paths=Counter(agg['paths']).most_common(top))
+        report.append(entry)
+    return report, read, time.monotonic() - started
+
+def print_traffic_report(report, read, elapsed):
+    for entry in report:
+        shared = f" {C.DIM}(shared log){C.RESET}" if entry['shared_log'] else ""
+        print(f"\n{C.BOLD}{C.CYAN}{entry['name']}{C.RESET}{shared} {C.DIM}{entry['access_log'] or 'logging off'}{C.RESET}")
+        if not entry['requests']:
+            print("  No requests recorded yet.")
+            continue
+        mix = '  '.join(f"{cls} {count}" for cls, count in entry['status'].items())
+        print(f"  {entry['requests']} requests, {format_bytes(entry['bytes'])} served, "
+              f"{entry['rps']:.2f} req/s (last {ACCESS_LOG_RATE_WINDOW}s) | {mix}")
+        for path, count in entry['top_paths']:
+            print(f"    {count:>8}  {path}")
+    print(f"\n{C.DIM}Read {format_bytes(read)} of new log data in {elapsed * 1000:.0f} ms.{C.RESET}")
+
+def update_sites_status(all_sites, web_server):
+    """Update site statuses (enabled/disabled in Nginx/Apache)."""
+    if not web_server or web_server['service'] not in ('nginx', 'apache2'):
+        for site in all_sites:
+            site['status'] = '⚪️ Unknown (web server not supported)'
+        return all_sites
+    
+    enabled_path = f'/etc/{web_server["service"]}/sites-enabled/'
+    if not os.path.isdir(enabled_path):
+        return all_sites
+
+    for site in all_sites:
+        config_file = site.get('config')
+        if not config_file:
+            site['status'] = '⚠️ Config error'
+            continue
+        
+        site['status'] = '🟢 Enabled' if os.path.lexists(os.path.join(enabled_path, config_file)) else '🔴 Disabled'
+    return all_sites
+
+def _collect_bot_processes(bots, state=None):
+    """Map bot dir -> psutil processes of the bot (root processes and all descendants).
+
+    Bots in a cgroup take their members from cgroup.procs; the process table is
+    scanned only for the others, reusing a scan younger than PROCESS_SCAN_INTERVAL
+    (children in the bot's process group are signalled via killpg regardless).
+    """
+    state = state or {}
+    cgroups = {bot['dir']: read_cgroup_procs(state[bot['dir']]['cgroup'])
+               for bot in bots if state.get(bot['dir'], {}).get('cgroup')}
+    children = {}
+    if any(cgroups.get(bot['dir']) is None for bot in bots):
+        PROCESS_SNAPSHOT.refresh(max_age=PROCESS_SCAN_INTERVAL)
+        children = PROCESS_SNAPSHOT.children_map()
+    result = {}
+    for bot in bots:
+        pids, stack = set(), list(bot.get('pids') or ([bot['pid']] if bot.get('pid') else []))
+        stack.extend(cgroups.get(bot['dir']) or ())
+        while stack:
+            pid = stack.pop()
+            if pid in pids:
+                continue
+            pids.add(pid)
+            stack.extend(children.get(pid, ()))
+        procs = []
+        for pid in sorted(pids):
+            try:
+                procs.append(psutil.Process(pid))
+            except psutil.Error:
+                continue
+        result[bot['dir']] = procs
+    return result
+
+def _signal_processes(procs, sig):
+    """Signal process groups led by these processes, and every process outside those groups."""
+    groups = set()
+    for proc in procs:
+        try:
+            if os.getpgid(proc.pid) == proc.pid:
+                os.killpg(proc.pid, sig)
+                groups.add(proc.pid)
+        except OSError:
+            continue
+    for proc in procs:
+        try:
+            if os.getpgid(proc.pid) not in groups:
+                proc.send_signal(sig)
+        except (OSError, psutil.Error):
+            continue
+
+def _wait_processes(procs, timeout, callback):
+    """psutil.wait_procs that treats zombies as gone (orphans may wait for init to reap them)."""
+    _, alive = psutil.wait_procs(procs, timeout=timeout, callback=callback)
+    still_alive = []
+    for proc in alive:
+        try:
+            if proc.status() == psutil.STATUS_ZOMBIE:
+                callback(proc)
+                continue
+        except psutil.Error:
+            callback(proc)
+            continue
+        still_alive.append(proc)
+    return still_alive
+
+def stop_bots(bots, timeout=None):
+    """Stop several bots at once and record their stop times in one state write.
+
+    Whole process groups get SIGTERM, all processes are awaited together with
+    psutil.wait_procs and only the ones still alive after timeout get SIGKILL.
+    Returns per-bot results: name, pid, ok, killed, stop_sec, error.
+    """
+    timeout = STOP_TIMEOUT if timeout is None else timeout
+    bots = [b for b in bots if b.get('pid')]
+    if not bots:
+        return []
+    if supervisor_available():
+        results = []
+        for bot in bots:
+            t0 = time.monotonic()
+            ok = supervisor_stop_bot(bot['name'], bot['dir'], verbose=False)
+            results.append({'name': bot['name'], 'pid': bot['pid'], 'ok': ok, 'killed': False,
+                            'stop_sec': time.monotonic() - t0, 'error': None if ok else 'supervisor'})
+        return results
+
+    started = time.monotonic()
+    by_bot = _collect_bot_processes(bots, STATE.read())
+    owner, gone_at = {}, {}
+    for bot_dir, procs in by_bot.items():
+        for proc in procs:
+            owner[proc.pid] = bot_dir
+    all_procs = [proc for procs in by_bot.values() for proc in procs]
+
+    def on_exit(proc):
+        gone_at[proc.pid] = time.monotonic()
+
+    _signal_processes(all_procs, signal.SIGTERM)
+    alive = _wait_processes(all_procs, timeout, on_exit)
+    killed = {owner[p.pid] for p in alive}
+    if alive:
+        _signal_processes(alive, signal.SIGKILL)
+        alive = _wait_processes(alive, timeout, on_exit)
+    still_alive = {owner[p.pid] for p in alive}
+
+    results, now = [], time.time()
+    with STATE.transaction() as state:
+        for bot in bots:
+            bot_dir = bot['dir']
+            ok = bot_dir not in still_alive
+            if ok:
+                record_bot_stopped(state, bot_dir, now)
+            pids = [p.pid for p in by_bot.get(bot_dir, [])]
+            finished = max((gone_at.get(pid, started) for pid in pids), default=started)
+            results.append({
+                'name': bot['name'], 'pid': bot['pid'], 'ok': ok, 'killed': bot_dir in killed,
+                'stop_sec': finished - started,
+                'error': None if ok else f"processes still alive: {[p.pid for p in alive if owner[p.pid] == bot_dir]}"
+            })
+    return results
+
+def kill_bot(pid, name, bot_dir, verbose=True):
+    """Terminate bot process (with its whole process group) and record stop time."""
+    if not pid:
+        print(f"{C.YELLOW}⚠️  Bot '{name}' has no active process.{C.RESET}")
+        return False
+    result = stop_bots([{'pid': pid, 'name': name, 'dir': bot_dir}])[0]
+    if not result['ok']:
+        print(f"{C.RED}❌ Failed to terminate process {pid} for '{name}': {result['error']}{C.RESET}")
+        return False
+    if verbose:
+        forced = " (killed after timeout)" if result['killed'] else ""
+        print(f"{C.GREEN}✅ Session for '{name}' (PID: {pid}) successfully terminated{forced}.{C.RESET}")
+    return True
+
+def bot_command(bot):
+    """Command line used to launch a bot, or None for an unknown bot type."""
+    if bot['type'] == 'python':
+        # use python from venv if available, otherwise system python3
+        python_path = bot.get('python_executable') or 'python3'
+        return ['nohup', python_path, bot['script']]
+    if bot['type'] == 'nodejs':
+        return ['nohup', 'node', bot['script']]
+    return None
+
+class RotatingLogWriter:
+    """Log file writer with size/time based rotation.
+
+    Rotated segments are named <name>_<timestamp>.log like the ones start_bot()
+    produced before, gzip-compressed in a background thread and pruned to
+    LOG_RETENTION segments / LOG_RETENTION_BYTES per bot.
+    """
+
+    def __init__(self, path, max_bytes=None, interval=None, retention=None, retention_bytes=None):
+        self.path = path
+        self.dir = os.path.dirname(path)
+        self.name = os.path.basename(path)[:-4] if path.endswith('.log') else os.path.basename(path)
+        self.max_bytes = max_bytes or LOG_MAX_BYTES
+        self.interval = interval or LOG_ROTATE_INTERVAL
+        self.retention = LOG_RETENTION if retention is None else retention
+        self.retention_bytes = LOG_RETENTION_BYTES if retention_bytes is None else retention_bytes
+        self._segment_re = re.compile(
+            rf'^{re.escape(self.name)}_\d{{4}}-\d{{2}}-\d{{2}}_\d{{2}}-\d{{2}}-\d{{2}}(-\d+)?\.log(\.gz)?$'
+        )
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._compress_loop, name='log-compressor', daemon=True)
+        self._worker.start()
+        # segments left uncompressed by older versions or an interrupted shipper
+        for segment in self._segments():
+            if not segment.endswith('.gz'):
+                self._queue.put(segment)
+        self._open()
+
+    def _open(self):
+        os.makedirs(self.dir, exist_ok=True)
+        self._file = open(self.path, 'ab', buffering=0)
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._opened_at = time.time()
+        self._at_line_start = True
+
+    def write(self, data):
+        """Append bytes, rotating at the next line start once the segment is full or too old."""
+        if self._size and (self._size + len(data) > self.max_bytes
+                           or time.time() - self._opened_at >= self.interval):
+            if not self._at_line_start:
+                # finish the current line in the old segment (unless it is absurdly long)
+                cut = data.find(b'\n') + 1
+                if not cut and self._size < 2 * self.max_bytes:
+                    self._append(data)
+                    return
+                self._append(data[:cut])
+                data = data[cut:]
+            self.rotate()
+        self._append(data)
+
+    def _append(self, data):
+        if data:
+            self._file.write(data)
+            self._size += len(data)
+            self._at_line_start = data.endswith(b'\n')
+
+    def rotate(self):
+        """Close the current file, rename it to a timestamped segment and queue it for gzip."""
+        self._file.close()
+        if os.path.getsize(self.path):
+            ts = datetime.now(MSK_TIMEZONE).strftime('%Y-%m-%d_%H-%M-%S')
+            target, n = os.path.join(self.dir, f"{self.name}_{ts}.log"), 0
+            while os.path.exists(target) or os.path.exists(target + '.gz'):
+                n += 1
+                target = os.path.join(self.dir, f"{self.name}_{ts}-{n}.log")
+            os.rename(self.path, target)
+            self._queue.put(target)
+        self._open()
+
+    def close(self):
+        """Close the file and wait until queued segments are compressed."""
+        self._file.close()
+        self._queue.put(None)
+        self._worker.join()
+
+    def _segments(self):
+        try:
+            names = os.listdir(self.dir)
+        except OSError:
+            return []
+        return [os.path.join(self.dir, n) for n in names if self._segment_re.match(n)]
+
+    def _compress_loop(self):
+        while True:
+            path = self._queue.get()
+            if path is None:
+                break
+            try:
+                self._compress(path)
+            except OSError:
+                pass
+            self._enforce_retention()
+
+    @staticmethod
+    def _compress(path):
+        st = os.stat(path)
+        tmp_path = path + '.gz.tmp'
+        with open(path, 'rb') as src, gzip.open(tmp_path, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp_path, path + '.gz')
+        os.unlink(path)
+
+    def _enforce_retention(self):
+        segments = []
+        for path in self._segments():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            segments.append((st.st_mtime, st.st_size, path))
+        segments.sort(reverse=True)
+        total = 0
+        for i, (_mtime, size, path) in enumerate(segments):
+            total += size
+            if i >= self.retention or total > self.retention_bytes:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+def spawn_log_shipper(log_file_path, rotate=True):
+    """Start a detached `ship-logs` process writing to log_file_path; return its stdin pipe.
+
+    The shipper double-forks (--detach): the process started here exits at once and
+    is reaped right away, while the worker is re-parented to init. A long-running
+    panel or daemon therefore never collects zombie shippers when bots exit.
+    """
+    command = [sys.executable, os.path.abspath(__file__), 'ship-logs', log_file_path, '--detach']
+    if not rotate:
+        command.append('--no-rotate')
+    shipper = subprocess.Popen(
+        command,
+        cwd=os.path.dirname(log_file_path),  # not the bot folder, so it isn't taken for a bot process
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    shipper.wait()
+    return shipper.stdin
+
+def run_log_shipper(log_file_path, rotate=True, detach=False):
+    """Copy stdin into a rotating log until every writer (the bot) has closed the pipe."""
+    if detach and os.fork():
+        os._exit(0)
+    for sig in (signal.SIGINT, signal.SIGHUP):
+        signal.signal(sig, signal.SIG_IGN)
+    writer = RotatingLogWriter(log_file_path)
+    try:
+        if rotate:
+            writer.rotate()
+        while True:
+            chunk = os.read(sys.stdin.fileno(), 64 * 1024)
+            if not chunk:
+                break
+            writer.write(chunk)
+    finally:
+        writer.close()
+    return 0
+
+def open_bot_log(bot, rotate=True, verbose=True):
+    """Open bot_dir/logs/<name>.log for appending (rotating the old one); return (file, path).
+
+    With LOG_SHIPPER the returned file is the pipe into a detached log shipper
+    that rotates, compresses and prunes the log itself.
+    """
+    name = bot['name']
+    logs_dir = os.path.join(bot['dir'], 'logs')
+    os.makedirs(logs_dir, exist_ok=True)
+    log_file_path = os.path.join(logs_dir, f"{name}.log")
+    if LOG_SHIPPER:
+        return spawn_log_shipper(log_file_path, rotate), log_file_path
+
+    if rotate and os.path.exists(log_file_path):
+        ts = datetime.now(MSK_TIMEZONE).strftime('%Y-%m-%d_%H-%M-%S')
+        rotated_path = os.path.join(logs_dir, f"{name}_{ts}.log")
+        try:
+            os.rename(log_file_path, rotated_path)
+            if verbose:
+                print(f"{C.YELLOW}ℹ️ Old log renamed to: {rotated_path}{C.RESET}")
+        except OSError as e:
+            print(f"{C.RED}⚠️ Failed to rename old log file: {e}{C.RESET}")
+    return open(log_file_path, 'a'), log_file_path
+
+def cgroup_preexec(cgroup):
+    """preexec_fn moving the child into cgroup before exec (None without cgroup)."""
+    if not cgroup:
+        return None
+    def preexec():
+        with open(os.path.join(cgroup, 'cgroup.procs'), 'w') as f:
+            f.write('0')
+    return preexec
+
+def record_bot_started(bot_dir, pid, cgroup=None):
+    """Remember a started process so status checks don't have to scan the process table."""
+    try:
+        create_time = psutil.Process(pid).create_time()
+    except psutil.Error:
+        create_time = time.time()
+    with STATE.transaction() as state:
+        entry = state.setdefault(bot_dir, {})
+        entry.update(pid=pid, create_time=create_time, starts=entry.get('starts', 0) + 1)
+        if cgroup:
+            entry['cgroup'] = cgroup
+        else:
+            entry.pop('cgroup', None)
+    return create_time
+
+def normalize_dist_name(name):
+    """PEP 503 normalized distribution name (Foo_Bar.baz -> foo-bar-baz)."""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+_VERSION_RE = re.compile(r'v?(\d+(?:\.\d+)*)')
+_REQUIREMENT_RE = re.compile(r'([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*(.*)')
+_SPECIFIER_RE = re.compile(r'(===|==|!=|~=|>=|<=|>|<)\s*([^\s,]+)')
+
+def _version_tuple(version):
+    match = _VERSION_RE.match(version or '')
+    return tuple(int(x) for x in match.group(1).split('.')) if match else None
+
+def _pad(version, width=3):
+    return version + (0,) * (width - len(version))
+
+def _python_version_ok(installed, op, wanted):
+    """Whether installed satisfies one PEP 440 specifier (release numbers only; True if unparsable)."""
+    prefix = wanted.endswith('.*')
+    have, want = _version_tuple(installed), _version_tuple(wanted[:-2] if prefix else wanted)
+    if have is None or want is None:
+        return True
+    if prefix and op in ('==', '!='):
+        return (have[:len(want)] == want) == (op == '==')
+    width = max(len(have), len(want), 3)
+    have, full = _pad(have, width), _pad(want, width)
+    if op == '~=':
+        return have >= full and have[:max(1, len(want) - 1)] == want[:max(1, len(want) - 1)]
+    return {'==': have == full, '===': have == full, '!=': have != full, '>=': have >= full,
+            '<=': have <= full, '>': have > full, '<': have < full}[op]
+
+def parse_requirements(path, _seen=None):
+    """Requirements of a pip requirements file as ([(name, [(op, version), ...])], files read).
+
+    -r includes are followed. Editable, URL / path requirements, options and lines
+    with environment markers are skipped: they can't be judged without pip.
+    """
+    seen = _seen if _seen is not None else set()
+    real_path = os.path.realpath(path)
+    if real_path in seen:
+        return [], []
+    seen.add(real_path)
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        text = f.read().replace('\\\n', '')
+    requirements, files = [], [path]
+    for line in text.splitlines():
+        line = re.sub(r'(^|\s)#.*', '', line).strip()
+        include = re.match(r'(?:-r|--requirement)(?:\s+|=)(\S+)', line)
+        if include:
+            included = os.path.join(os.path.dirname(path), include.group(1))
+            if os.path.isfile(included):
+                more, more_files = parse_requirements(included, seen)
+                requirements += more
+                files += more_files
+            continue
+        if not line or line.startswith('-') or ';' in line or '://' in line or line.startswith(('.', '/')):
+            continue
+        match = _REQUIREMENT_RE.match(line)
+        if match:
+            rest = '' if match.group(2).lstrip().startswith('@') else match.group(2)
+            requirements.append((normalize_dist_name(match.group(1)), _SPECIFIER_RE.findall(rest)))
+    return requirements, files
+
+@functools.lru_cache(maxsize=None)
+def interpreter_site_dirs(executable):
+    """site-packages directories on the sys.path of an interpreter (run once per process)."""
+    try:
+        result = subprocess.run([executable, '-c', 'import json, sys; print(json.dumps(sys.path))'],
+                                capture_output=True, text=True, timeout=10, stdin=subprocess.DEVNULL)
+        paths = json.loads(result.stdout) if result.returncode == 0 else []
+    except (OSError, ValueError, subprocess.SubprocessError):
+        paths = []
+    return tuple(p for p in paths if p.endswith(('site-packages', 'dist-packages')) and os.path.isdir(p))
+
+def python_site_dirs(bot):
+    """site-packages directories of the interpreter a bot is started with (see bot_command)."""
+    executable = bot.get('python_executable')
+    if not executable:
+        return list(interpreter_site_dirs('python3'))
+    venv = os.path.dirname(os.path.dirname(executable))
+    try:
+        with open(os.path.join(venv, 'pyvenv.cfg'), 'r') as f:
+            if re.search(r'include-system-site-packages\s*=\s*true', f.read(), re.I):
+                return list(interpreter_site_dirs(executable))
+    except OSError:
+        pass
+    return sorted(glob.glob(os.path.join(venv, 'lib', 'python*', 'site-packages')))
+
+def _dist_metadata(path):
+    """(Name, Version) headers of a .dist-info / .egg-info directory or file."""
+    if os.path.isdir(path):
+        path = next((os.path.join(path, n) for n in ('METADATA', 'PKG-INFO')
+                     if os.path.isfile(os.path.join(path, n))), None)
+    headers = {}
+    if path:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.strip():
+                    break
+                key, _, value = line.partition(':')
+                headers.setdefault(key.strip().lower(), value.strip())
+    return headers.get('name'), headers.get('version')
+
+def installed_distributions(site_dirs):
+    """{normalized name: version} of the packages installed in site_dirs (earlier dirs win).
+
+    Name and version come from the *.dist-info / *.egg-info entry names; the
+    metadata file is only read when the entry name has no version.
+    """
+    found = {}
+    for site_dir in site_dirs:
+        try:
+            entries = os.listdir(site_dir)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.endswith('.dist-info'):
+                name, _, version = entry[:-10].partition('-')
+            elif entry.endswith('.egg-info'):
+                name, _, version = entry[:-9].partition('-')
+                version = version.split('-py', 1)[0]
+            else:
+                continue
+            if not version:
+                try:
+                    name, version = _dist_metadata(os.path.join(site_dir, entry))
+                except OSError:
+                    continue
+                if not name:
+                    continue
+            found.setdefault(normalize_dist_name(name), version)
+    return found
+
+def _node_package_version(bot_dir, name):
+    """Version of package name as node would resolve it from bot_dir ('' if unreadable, None if missing)."""
+    directory = bot_dir
+    while True:
+        try:
+            with open(os.path.join(directory, 'node_modules', name, 'package.json'), 'r', encoding='utf-8') as f:
+                return str(json.load(f).get('version') or '')
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        except (OSError, ValueError):
+            return ''
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+_NODE_COMPARATOR_RE = re.compile(r'(\^|~|>=|<=|>|<|=)?v?(\d+|[xX*])(?:\.(\d+|[xX*]))?(?:\.(\d+|[xX*]))?')
+
+def _node_range_ok(version, spec):
+    """Best-effort npm semver range check (^, ~, comparators, x-ranges; True for anything else)."""
+    have = _version_tuple(version)
+    if have is None or '||' in spec or ':' in spec or '/' in spec or ' - ' in spec:
+        return True  # alternatives, hyphen ranges, git / file / npm: specs and dist-tags aren't judged
+    have = _pad(have)
+    for part in spec.split():
+        match = _NODE_COMPARATOR_RE.fullmatch(part.split('-', 1)[0])
+        if not match:
+            return True
+        op, want = match.group(1) or '', []
+        for number in match.groups()[1:]:
+            if number is None or not number.isdigit():
+                break
+            want.append(int(number))
+        if not want:
+            continue
+        want, full = tuple(want), _pad(tuple(want))
+        if op in ('^', '~'):
+            if op == '^':
+                bump = next((i for i, n in enumerate(want) if n), len(want) - 1)
+            else:
+                bump = 1 if len(want) > 1 else 0
+            upper = want[:bump] + (want[bump] + 1,)
+            ok = have >= full and have[:bump + 1] < upper
+        elif op in ('', '='):
+            ok = have[:len(want)] == want
+        else:
+            ok = {'>=': have >= full, '<=': have[:len(want)] <= want, '>': have[:len(want)] > want,
+                  '<': have < full}[op]
+        if not ok:
+            return False
+    return True
+
+def check_bot_dependencies(bot):
+    """Compare a bot's requirements.txt / package.json with the installed packages.
+
+    Returns (report, files the report depends on). The report is a dict with ok,
+    manifest, checked, missing, mismatched and error; a bot without a manifest is ok.
+    """
+    report = {'ok': True, 'manifest': None, 'checked': 0, 'missing': [], 'mismatched': [], 'error': None}
+    if bot['type'] == 'python':
+        manifest = os.path.join(bot['dir'], 'requirements.txt')
+        if not os.path.isfile(manifest):
+            return report, [manifest]
+        site_dirs = python_site_dirs(bot)
+        requirements, files = parse_requirements(manifest)
+        installed = installed_distributions(site_dirs)
+        for name, specs in requirements:
+            version = installed.get(name)
+            if version is None:
+                report['missing'].append(name)
+            elif not all(_python_version_ok(version, op, wanted) for op, wanted in specs):
+                report['mismatched'].append(f"{name} {version} (wants {','.join(op + v for op, v in specs)})")
+        report.update(manifest='requirements.txt', checked=len(requirements))
+        depends_on = files + site_dirs + [bot.get('python_executable') or sys.executable]
+    elif bot['type'] == 'nodejs':
+        manifest = os.path.join(bot['dir'], 'package.json')
+        node_modules = os.path.join(bot['dir'], 'node_modules')
+        depends_on = [manifest, os.path.join(bot['dir'], 'package-lock.json'), node_modules,
+                      os.path.join(node_modules, '.package-lock.json')]
+        with open(manifest, 'r', encoding='utf-8') as f:
+            dependencies = json.load(f).get('dependencies') or {}
+        for name, spec in dependencies.items():
+            version = _node_package_version(bot['dir'], name)
+            if version is None:
+                report['missing'].append(name)
+            elif not _node_range_ok(version, str(spec)):
+                report['mismatched'].append(f"{name} {version} (wants {spec})")
+        report.update(manifest='package.json', checked=len(dependencies))
+    else:
+        return report, []
+    report['ok'] = not report['missing'] and not report['mismatched']
+    return report, depends_on
+
+def _mtimes(paths):
+    stamps = []
+    for path in paths:
+        try:
+            stamps.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            stamps.append(None)
+    return stamps
+
+class PreflightCache:
+    """Dependency reports per bot folder, valid while the files they were built from keep their mtime.
+
+    Those are the manifest (with -r includes), the lockfile and the install
+    locations (site-packages, node_modules), so a pip / npm install or an edited
+    requirements file invalidates the entry. Persisted in PREFLIGHT_CACHE_FILE.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or PREFLIGHT_CACHE_FILE
+        self._entries = None  # bot dir -> {python, paths, stamps, report}
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, 'r') as f:
+                    entries = json.load(f)
+                self._entries = entries if isinstance(entries, dict) else {}
+            except (OSError, ValueError):
+                self._entries = {}
+
+    def get(self, bot):
+        """Dependency report of bot (see check_bot_dependencies), re-checked only when stale."""
+        key = bot['dir']
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+        if entry and entry['python'] == bot.get('python_executable') and entry['stamps'] == _mtimes(entry['paths']):
+            return entry['report']
+        try:
+            report, paths = check_bot_dependencies(bot)
+        except (OSError, ValueError, AttributeError) as e:
+            return {'ok': False, 'manifest': None, 'checked': 0, 'missing': [], 'mismatched': [],
+                    'error': f"can't read manifest: {e}"}
+        with self._lock:
+            self._entries[key] = {'python': bot.get('python_executable'), 'paths': paths,
+                                  'stamps': _mtimes(paths), 'report': report}
+            self._dirty = True
+        return report
+
+    def save(self):
+        """Persist the cache (dropping entries of bot folders that no longer exist)."""
+        with self._lock:
+            if self._entries is None:
+                return
+            for key in [k for k in self._entries if not os.path.isdir(k)]:
+                del self._entries[key]
+                self._dirty = True
+            if not self._dirty:
+                return
+            try:
+                atomic_write(self.path, json.dumps(self._entries, separators=(',', ':')))
+                self._dirty = False
+            except OSError:
+                pass
+
+PREFLIGHT = PreflightCache()
+
+def preflight_bots(bots, force=False):
+    """Check the dependencies of many bots in parallel; stores each report in bot['preflight']."""
+    if not bots or not (PREFLIGHT_ENABLED or force):
+        return bots
+    with ThreadPoolExecutor(max_workers=max(1, min(PREFLIGHT_CONCURRENCY, len(bots)))) as pool:
+        for bot, report in zip(bots, pool.map(PREFLIGHT.get, bots)):
+            bot['preflight'] = report
+    PREFLIGHT.save()
+    return bots
+
+def preflight_summary(report, limit=3):
+    """One-line description of a failed dependency report."""
+    if report.get('error'):
+        return report['error']
+    parts = []
+    for label, names in (('missing', report['missing']), ('outdated', report['mismatched'])):
+        if names:
+            more = f" (+{len(names) - limit})" if len(names) > limit else ""
+            parts.append(f"{label} {', '.join(names[:limit])}{more}")
+    return '; '.join(parts)
+
+def preflight_blocks_start(bot):
+    """True if start_bot would refuse bot (PREFLIGHT_BLOCK_START and a failed dependency report).
+
+    Restarts ask this before stopping the bot, so a working bot is not taken down
+    only to be refused on start.
+    """
+    if not (PREFLIGHT_ENABLED and PREFLIGHT_BLOCK_START):
+        return False
+    report = bot.get('preflight') or preflight_bots([bot])[0]['preflight']
+    return not report['ok']
+
+def start_bot(bot, logging_enabled=True, verbose=True):
+    """Start bot, record its PID/create time and clear stop timestamp.
+
+    The dependency report already in bot['preflight'] (from preflight_bots() over
+    the whole batch) is reused; only a bot without one is checked here.
+    Returns the PID of the started process, or None on failure.
+    """
+    name, bot_dir = bot['name'], bot['dir']
+    if PREFLIGHT_ENABLED:
+        report = bot.get('preflight') or preflight_bots([bot])[0]['preflight']
+        if not report['ok']:
+            if PREFLIGHT_BLOCK_START:
+                print(f"{C.RED}❌ Not starting '{name}' ({report['manifest'] or 'dependencies'}): "
+                      f"{preflight_summary(report)}{C.RESET}")
+                return None
+            if verbose:
+                print(f"{C.YELLOW}⚠️ '{name}' dependencies: {preflight_summary(report)}{C.RESET}")
+    if supervisor_available():
+        return supervisor_start_bot(bot, logging_enabled, verbose=verbose)
+    if verbose:
+        print(f"{C.CYAN}🚀 Starting '{name}' ({bot['type']})...{C.RESET}")
+    command = bot_command(bot)
+    if bot['type'] == 'python' and bot.get('python_executable') and verbose:
+        print(f"{C.BLUE}   Using virtual environment (venv).{C.RESET}")
+    if not command:
+        print(f"{C.RED}❌ Unknown bot type: {bot['type']}{C.RESET}")
+        return None
+
+    cgroup = prepare_bot_cgroup(bot_dir)
+    try:
+        if logging_enabled:
+            log_file, log_file_path = open_bot_log(bot, verbose=verbose)
+            with log_file:
+                process = subprocess.Popen(
+                    command,
+                    cwd=bot_dir,
+                    stdout=log_file,
+                    stderr=log_file,
+                    start_new_session=True,
+                    preexec_fn=cgroup_preexec(cgroup)
+                )
+            if verbose:
+                print(f"{C.GREEN}✅ '{name}' started. Logs are written to: {log_file_path}{C.RESET}")
+        else:
+            process = subprocess.Popen(
+                command,
+                cwd=bot_dir,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+                preexec_fn=cgroup_preexec(cgroup)
+            )
+            if verbose:
+                print(f"{C.GREEN}✅ '{name}' started in background (no logging).{C.RESET}")
+
+        record_bot_started(bot_dir, process.pid, cgroup)
+        return process.pid
+    except Exception as e:
+        print(f"{C.RED}❌ Failed to start '{name}': {e}{C.RESET}")
+        return None
+
+def restart_bots(bots, logging_enabled=False, max_workers=None):
+    """Restart bots concurrently (bounded by RESTART_CONCURRENCY) and return per-bot results.
+
+    Each worker stops its bot, waits for the process to actually exit and starts it
+    again right away; there are no fixed sleeps between bots.
+    """
+    def restart_one(bot):
+        result = {'name': bot['name'], 'old_pid': bot.get('pid'), 'new_pid': None,
+                  'stop_sec': 0.0, 'start_sec': 0.0, 'ok': False, 'error': None}
+        if preflight_blocks_start(bot):
+            result['error'] = 'dependencies'
+            return result
+        if bot.get('pid'):
+            stopped = stop_bots([bot])[0]
+            result['stop_sec'] = stopped['stop_sec']
+            if not stopped['ok']:
+                result['error'] = 'stop failed'
+                return result
+        t1 = time.monotonic()
+        result['new_pid'] = start_bot(bot, logging_enabled=logging_enabled, verbose=False)
+        result['start_sec'] = time.monotonic() - t1
+        result['ok'] = result['new_pid'] is not None
+        if not result['ok']:
+            result['error'] = 'start failed'
+        return result
+
+    if not bots:
+        return []
+    preflight_bots(bots)  # one parallel dependency pass instead of one check per start
+    workers = max(1, min(max_workers or RESTART_CONCURRENCY, len(bots)))
+    # all stop/start records of the batch end up in a single state write
+    with STATE.batch(), ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(restart_one, bots))
+
+def print_restart_report(results, elapsed):
+    """Print per-bot restart result table."""
+    print(f"{C.BOLD}{'Bot':<20} {'Old PID':>8} {'New PID':>8} {'Stop':>7} {'Start':>7}  Result{C.RESET}")
+    for r in results:
+        color = C.GREEN if r['ok'] else C.RED
+        verdict = '✅ restarted' if r['ok'] else f"❌ {r['error']}"
+        print(
+            f"{r['name']:<20} {r['old_pid'] or '-':>8} {r['new_pid'] or '-':>8} "
+            f"{r['stop_sec']:>6.2f}s {r['start_sec']:>6.2f}s  {color}{verdict}{C.RESET}"
+        )
+    ok = sum(1 for r in results if r['ok'])
+    print(f"\n{C.CYAN}Restarted {ok}/{len(results)} bots in {elapsed:.2f}s.{C.RESET}")
+
+def systemctl_is_active(service):
+    """Ask systemd whether a unit is active (forks systemctl)."""
+    try:
+        return subprocess.run(['systemctl', 'is-active', '--quiet', service]).returncode == 0
+    except OSError:
+        return False
+
+def _process_name(pid):
+    try:
+        with open(f'/proc/{pid}/comm', 'r') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+    except OSError:
+        try:
+            return psutil.Process(pid).name()
+        except psutil.Error:
+            return None
+
+class WebServerProbe:
+    """Web server status with a short TTL cache and no forks on the common path.
+
+    Liveness is read from the master PID file (WEB_SERVER_PID_FILES) and checked in
+    /proc; `systemctl is-active` runs only when a server has no PID file at all.
+    """
+    SERVERS = (('nginx', 'Nginx'), ('apache2', 'Apache2'))
+
+    def __init__(self, ttl=None):
+        self.ttl = WEB_SERVER_STATUS_TTL if ttl is None else ttl
+        self._cached = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def status(self, force=False):
+        """Status dict (name, service, status, pid) of the first active web server."""
+        with self._lock:
+            now = time.monotonic()
+            if force or self._cached is None or now >= self._expires:
+                self._cached = self._probe()
+                self._expires = now + self.ttl
+            return dict(self._cached)
+
+    def invalidate(self):
+        with self._lock:
+            self._cached = None
+
+    def _probe(self):
+        for service, name in self.SERVERS:
+            if not shutil.which(service):
+                continue
+            active, pid = self.is_active(service)
+            if active:
+                return {'name': name, 'service': service, 'status': '🟢 Active', 'pid': pid}
+        return {'name': 'Nginx/Apache', 'service': None, 'status': '🔴 Not found', 'pid': None}
+
+    @staticmethod
+    def master_pid(service):
+        """(pid, pid file found) of the live master process according to its PID file."""
+        found = False
+        for path in WEB_SERVER_PID_FILES.get(service, ()):
+            try:
+                with open(path, 'r') as f:
+                    pid = int(f.read().split()[0])
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError, IndexError):
+                found = True
+                continue
+            found = True
+            if _process_name(pid) in WEB_SERVER_PROCESS_NAMES.get(service, (service,)):
+                return pid, found
+        return None, found
+
+    def is_active(self, service):
+        """(active, master pid); falls back to systemctl only without a PID file."""
+        pid, found = self.master_pid(service)
+        if pid:
+            return True, pid
+        if found:
+            return False, None  # stale PID file: the master is gone
+        return systemctl_is_active(service), None
+
+WEB_SERVER_PROBE = WebServerProbe()
+
+def get_web_server_status(force=False):
+    """Check status of Nginx and Apache2 (cached for WEB_SERVER_STATUS_TTL seconds)."""
+    return WEB_SERVER_PROBE.status(force)
+
+def reload_web_server(server):
+    """Soft reload of web server via systemctl (WebServerProbe only reports status)."""
+    if not server or not server['service']:
+        print(f"{C.YELLOW}⚠️ No active web server detected.{C.RESET}")
+        return False
+        
+    print(f"{C.CYAN}🔄 Applying configuration for {server['name']}...{C.RESET}")
+    command = ['sudo', 'systemctl', 'reload', server['service']]
+    try:
+        if run_sudo_command(command, f"Error reloading {server['name']}"):
+            print(f"{C.GREEN}✅ {server['name']} reloaded successfully.{C.RESET}")
+            return True
+        return False
+    finally:
+        WEB_SERVER_PROBE.invalidate()
+
+_SITE_LINKS_SCRIPT = (
+    'set -e; while [ $# -gt 0 ]; do '
+    'if [ "$1" = + ]; then ln -s -- "$2" "$3"; shift 3; else rm -f -- "$2"; shift 2; fi; done'
+)
+
+def _apply_site_links(ops):
+    """Apply [('+', source, link) | ('-', link)] symlink operations.
+
+    In-process when we may write sites-enabled ourselves, otherwise in one sudo call.
+    Returns True on success.
+    """
+    if not ops:
+        return True
+    enabled_dirs = {os.path.dirname(op[-1]) for op in ops}
+    if all(os.access(d, os.W_OK) for d in enabled_dirs):
+        undo = []
+        try:
+            for op in ops:
+                inverse = _inverse_site_links([op])
+                if op[0] == '+':
+                    os.symlink(op[1], op[2])
+                else:
+                    os.unlink(op[1])
+                undo = inverse + undo
+            return True
+        except OSError as e:
+            print(f"{C.RED}❌ Failed to update site links: {e}{C.RESET}")
+            _apply_site_links(undo)
+            return False
+    inverses = [_inverse_site_links([op]) for op in ops]
+    args = [arg for op in ops for arg in op]
+    if run_sudo_command(['sudo', 'sh', '-c', _SITE_LINKS_SCRIPT, 'sh', *args], "Error updating site links"):
+        return True
+    # the helper stops at the first failing link (set -e): undo the ones it already switched
+    undo = [inverse[0] for op, inverse in zip(ops, inverses) if os.path.lexists(op[-1]) == (op[0] == '+')]
+    if undo:
+        print(f"{C.YELLOW}↩️ Rolling back {len(undo)} site link change(s) applied before the failure...{C.RESET}")
+        _apply_site_links(undo[::-1])
+    return False
+
+def _inverse_site_links(ops):
+    """Operations undoing ops (computed before they are applied)."""
+    return [('-', op[2]) if op[0] == '+' else ('+', os.readlink(op[1]) if os.path.islink(op[1]) else op[1], op[1])
+            for op in reversed(ops)]
+
+def test_web_server_config(service):
+    """Run the web server's config test once; returns (ok, output)."""
+    command = list(WEB_SERVER_CONFIG_TEST.get(service, ()))
+    if not command:
+        return True, ''
+    if os.geteuid() != 0:
+        command = ['sudo'] + command
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+    except OSError as e:
+        return False, str(e)
+    return result.returncode == 0, (result.stdout + result.stderr).strip()
+
+def apply_site_changes(changes, server, reload=True):
+    """Enable/disable several sites as one batch.
+
+    changes is a list of (site, enable). All symlinks are switched at once, the
+    config is tested once and the whole batch is rolled back if the test fails;
+    on success the web server is reloaded exactly once. Returns a result dict:
+    ok, changed (config files), unchanged, rolled_back, reloaded, error.
+    """
+    service = server['service']
+    available_path = f"/etc/{service}/sites-available/"
+    enabled_path = f"/etc/{service}/sites-enabled/"
+    result = {'ok': False, 'changed': [], 'unchanged': [], 'rolled_back': False, 'reloaded': False, 'error': None}
+
+    ops, wanted = [], {}
+    for site, enable in changes:
+        config_file = site.get('config')
+        if not config_file or not os.path.exists(os.path.join(available_path, config_file)):
+            result['error'] = f"Config file '{config_file}' for '{site['name']}' not found in {available_path}"
+            print(f"{C.RED}❌ {result['error']}{C.RESET}")
+            return result
+        if wanted.setdefault(config_file, enable) != enable:
+            result['error'] = f"Config file '{config_file}' is both enabled and disabled in one batch"
+            print(f"{C.RED}❌ {result['error']}{C.RESET}")
+            return result
+    for config_file, enable in wanted.items():
+        source, link = os.path.join(available_path, config_file), os.path.join(enabled_path, config_file)
+        if os.path.lexists(link) == enable:
+            result['unchanged'].append(config_file)
+            continue
+        ops.append(('+', source, link) if enable else ('-', link))
+        result['changed'].append(config_file)
+    if not ops:
+        result['ok'] = True
+        return result
+
+    enabling = sum(1 for op in ops if op[0] == '+')
+    if len(ops) == 1:
+        print(f"{C.CYAN}{'Enabling' if enabling else 'Disabling'} site config '{result['changed'][0]}'...{C.RESET}")
+    else:
+        print(f"{C.CYAN}Applying {enabling} enable / {len(ops) - enabling} disable change(s)...{C.RESET}")
+    rollback = _inverse_site_links(ops)
+    if not _apply_site_links(ops):
+        result['error'] = 'failed to update site links'
+        return result
+
+    ok, output = test_web_server_config(service)
+    if not ok:
+        print(f"{C.RED}❌ {server['name']} config test failed, rolling back the batch:{C.RESET}")
+        print(f"   {C.WHITE}{output}{C.RESET}")
+        result['rolled_back'] = _apply_site_links(rollback)
+        result['error'] = 'config test failed'
+        result['changed'] = []
+        return result
+    for config_file in result['changed']:
+        enabled = wanted[config_file]
+        print(f"{C.GREEN}✅ Site config '{config_file}' successfully {'enabled' if enabled else 'disabled'}.{C.RESET}")
+    result['ok'] = True
+    if reload:
+        result['reloaded'] = bool(reload_web_server(server))
+        result['ok'] = result['reloaded']
+    return result
+
+def toggle_site_status(site, server, enable, reload=True):
+    """Enable or disable a site (and reload the web server); returns True on success."""
+    return apply_site_changes([(site, enable)], server, reload=reload)['ok']
+
+def parse_selection(text, count):
+    """Parse '1 3-5,7' / 'all' into sorted unique numbers within 1..count (None if invalid)."""
+    if text.strip().lower() == 'all':
+        return list(range(1, count + 1))
+    numbers = set()
+    for part in re.split(r'[\s,]+', text.strip()):
+        if not part:
+            continue
+        start, _, end = part.partition('-')
+        if not start.isdigit() or (end and not end.isdigit()):
+            return None
+        first, last = int(start), int(end or start)
+        if not 1 <= first <= last <= count:
+            return None
+        numbers.update(range(first, last + 1))
+    return sorted(numbers)
+
+def bulk_sites_menu(sites, web_server):
+    """Enable or disable several sites at once with a single config test and reload."""
+    clear_screen()
+    print(C.BOLD + C.YELLOW + "--- Bulk site enable / disable ---" + C.RESET)
+    for i, site in enumerate(sites):
+        status_color = C.GREEN if '🟢' in site.get('status', '') else C.RED
+        print(f"  {C.YELLOW}[{i + 1}]{C.RESET} {site['name']:<30} {C.DIM}{site.get('config', '')}{C.RESET} - "
+              f"{status_color}{site.get('status', '')}{C.RESET}")
+    print("\n" + soft_separator(35))
+    print(f"  {C.YELLOW}[1]{C.RESET} 🟢 Enable selected   {C.YELLOW}[2]{C.RESET} 🔴 Disable selected")
+    action = input(f"{C.BOLD}Choose action: {C.RESET}").strip()
+    if action not in ('1', '2'):
+        return
+    selection = parse_selection(input(f"{C.BOLD}Site numbers (e.g. 1 3-5, or 'all'): {C.RESET}"), len(sites))
+    if not selection:
+        print(f"{C.RED}❌ Invalid selection.{C.RESET}")
+        return
+    apply_site_changes([(sites[n - 1], action == '1') for n in selection], web_server)
+
+MENU_PROMPT = "Select item number or enter a command: "
+MENU_CHROME_LINES = 22  # main menu lines that are not bot / site rows (title, headers, actions, prompt)
+
+def bot_group(bot):
+    """Folder holding a bot, relative to BASE_DIR ('' for bots directly under it)."""
+    parent = os.path.relpath(os.path.dirname(bot['dir']), BASE_DIR)
+    return '' if parent == '.' or parent.startswith('..') else parent
+
+def _letter_mask(text):
+    mask = 0
+    for ch in text:
+        mask |= 1 << (ord(ch) & 63)
+    return mask
+
+def _is_subsequence(query, text):
+    chars = iter(text)
+    return all(ch in chars for ch in query)
+
+class MenuPager:
+    """Fuzzy filter and paging of the main menu, so only one screenful of items is drawn.
+
+    Items keep their global numbers (bots first, then sites): a number means the
+    same item on every page and under any filter. Names are indexed once per item
+    list as lower-cased "group/name" strings plus a letter bitmask, which rejects
+    most non-matches before the subsequence test; a longer query only re-checks
+    the matches of its longest already computed prefix.
+    """
+
+    def __init__(self):
+        self.query = ''
+        self.groups = []
+        self.grouped = False
+        self._keys = None
+        self._entries = []
+        self._matches = {}
+        self._starts = [0]  # first item of the current page and of the pages before it
+        self._end = 0
+        self._matched = 0
+
+    def set_filter(self, query):
+        self.query = query.strip().lower()
+        self._starts = [0]
+
+    def command(self, choice):
+        """Apply a paging / filter command ('n', 'p', '/text', '/'). Returns False for anything else."""
+        if choice.startswith('/'):
+            self.set_filter(choice[1:])
+        elif choice == 'n':
+            if self._end < self._matched:
+                self._starts.append(self._end)
+        elif choice == 'p':
+            if len(self._starts) > 1:
+                self._starts.pop()
+        else:
+            return False
+        return True
+
+    def matches(self, bots, sites):
+        """Indices into bots + sites of the items matching the filter, in menu order."""
+        self._index(bots, sites)
+        query = self.query
+        if query in self._matches:
+            return self._matches[query]
+        prefix = query
+        while prefix not in self._matches:
+            prefix = prefix[:-1]
+        mask = _letter_mask(query)
+        entries = self._entries
+        found = [i for i in self._matches[prefix]
+                 if not mask & ~entries[i][1] and _is_subsequence(query, entries[i][0])]
+        if len(self._matches) > 64:
+            self._matches = {'': self._matches['']}
+        self._matches[query] = found
+        return found
+
+    def window(self, bots, sites, metrics=None, rows=None):
+        """Items on the current page as (bot indices, site indices, first shown, matched count)."""
+        matched = self.matches(bots, sites)
+        if rows is None:
+            rows = max(5, shutil.get_terminal_size().lines - MENU_CHROME_LINES)
+        if self._starts[-1] >= len(matched):
+            self._starts = [0]
+        start = end = self._starts[-1]
+        used, group = 0, None
+        while end < len(matched):
+            i = matched[end]
+            cost = 1
+            if i < len(bots):
+                if self.grouped and self.groups[i] != group:
+                    cost += 1
+                if metrics and bots[i].get('pid'):
+                    cost += 1
+                group = self.groups[i]
+            if used + cost > rows and end > start:
+                break
+            used += cost
+            end += 1
+        self._end, self._matched = end, len(matched)
+        shown = matched[start:end]
+        return ([i for i in shown if i < len(bots)], [i - len(bots) for i in shown if i >= len(bots)],
+                start, len(matched))
+
+    def _index(self, bots, sites):
+        keys = [b['dir'] for b in bots] + [(s.get('config'), s['name']) for s in sites]
+        if keys == self._keys:
+            return
+        self._keys = keys
+        self.groups = [bot_group(b) for b in bots]
+        self.grouped = len(set(self.groups)) > 1
+        names = [f"{g}/{b['name']}".lower() for g, b in zip(self.groups, bots)]
+        names += [s['name'].lower() for s in sites]
+        self._entries = [(name, _letter_mask(name)) for name in names]
+        self._matches = {'': list(range(len(names)))}
+
+MENU_PAGER = MenuPager()
+
+def render_menu(bots, sites, web_server, metrics=None, pending=(), health=None):
+    """Print main menu (with metric sparklines / site health when a MetricsSampler / HealthProber is given).
+
+    pending names the probes (web_server, bots, sites) still running; their parts
+    are drawn from the cached snapshot. Returns False if there is nothing to manage.
+    """
+    term_width = shutil.get_terminal_size().columns
+
+    title = "⚙️ CONTROL PANEL ⚙️".center(term_width)
+    title_colored = gradient_text(title, (190, 160, 255), (245, 215, 190))
+    print(C.BOLD + title_colored + C.RESET)
+    if pending:
+        print(f"{C.DIM}⏳ Refreshing {', '.join(sorted(pending))} (showing last known state)...{C.RESET}")
+    
+    if not bots and not sites:
+        if pending:
+            print(f"\n{C.CYAN}Scanning {BASE_DIR}...{C.RESET}")
+            return True
+        print(f"\nNo bots found in {C.CYAN}{BASE_DIR}{C.RESET} and no sites for the detected web server.")
+        return False
+
+    bot_rows, site_rows, first, matched = MENU_PAGER.window(bots, sites, metrics)
+    print(f"\n{C.BOLD}{C.CYAN}💎 Bot list:{C.RESET}")
+    if bot_rows:
+        group = None
+        for i in bot_rows:
+            bot = bots[i]
+            if MENU_PAGER.grouped and MENU_PAGER.groups[i] != group:
+                group = MENU_PAGER.groups[i]
+                print(f"  {C.BLUE}📁 {group or '.'}/{C.RESET}")
+            status_color = C.GREEN if '🟢' in bot['status'] else C.RED
+            time_color = C.WHITE if '🟢' in bot['status'] else C.YELLOW
+            # append (venv) label if bot uses virtual environment
+            venv_tag = f" {C.BLUE}(venv){C.RESET}" if bot.get('python_executable') else ""
+            if bot.get('supervised'):
+                venv_tag += f" {C.CYAN}(supervised){C.RESET}"
+            preflight = bot.get('preflight')
+            deps_tag = f" {C.YELLOW}⚠️ deps: {preflight_summary(preflight, limit=2)}{C.RESET}" \
+                if preflight and not preflight['ok'] else ""
+            print(
+                f"  {C.YELLOW}[{i+1}]{C.RESET} {bot['name']:<20}{venv_tag} - "
+                f"{status_color}{bot['status']}{C.RESET}"
+                f"{time_color}{bot['time_info']}{C.RESET}{deps_tag}"
+            )
+            ring = metrics.ring(bot['dir']) if metrics and bot.get('pid') else None
+            if ring and ring.count:
+                print(f"      {C.DIM}{bot_metrics_line(ring)}{C.RESET}")
+    elif bots:
+        print(f"  {C.DIM}(none on this page){C.RESET}")
+    else:
+        print("  No bots found.")
+    
     server_label = 'Nginx/Apache'
     if web_server and web_server.get('service') == 'nginx':
         server_label = 'Nginx'
     elif web_server and web_server.get('service') == 'apache2':
         server_label = 'Apache2'
 
-    print(f"\n{C.BOLD}{C.CYAN}🌐 Site list ({server_label}):{C.RESET}")
-    if sites:
-        for i, site in enumerate(sites):
-            status_color = C.GREEN if '🟢' in site.get('status', '') else C.RED
-            site_num = len(bots) + i + 1
-            print(
-                f"  {C.YELLOW}[{site_num}]{C.RESET} {site['name']:<20} - "
-                f"{status_color}{site.get('status', 'Status unknown')}{C.RESET}"
-            )
-    else:
-        if web_server and web_server.get('service') == 'nginx':
-            print("  No sites found in '/etc/nginx/sites-available/'.")
-        elif web_server and web_server.get('service') == 'apache2':
-            print("  No sites found in '/etc/apache2/sites-available/'.")
-        else:
-            print("  Web server not detected or not supported.")
+    print(f"\n{C.BOLD}{C.CYAN}🌐 Site list ({server_label}):{C.RESET}")
+    if site_rows:
+        for i in site_rows:
+            site = sites[i]
+            status_color = C.GREEN if '🟢' in site.get('status', '') else C.RED
+            site_num = len(bots) + i + 1
+            health_info = f" | {format_health(health.summary(site['name']))}" if health and '🟢' in site.get('status', '') else ""
+            print(
+                f"  {C.YELLOW}[{site_num}]{C.RESET} {site['name']:<20} - "
+                f"{status_color}{site.get('status', 'Status unknown')}{C.RESET}{health_info}"
+            )
+    elif sites:
+        print(f"  {C.DIM}(none on this page){C.RESET}")
+    else:
+        if web_server and web_server.get('service') == 'nginx':
+            print("  No sites found in '/etc/nginx/sites-available/'.")
+        elif web_server and web_server.get('service') == 'apache2':
+            print("  No sites found in '/etc/apache2/sites-available/'.")
+        else:
+            print("  Web server not detected or not supported.")
+
+    shown = len(bot_rows) + len(site_rows)
+    paged = shown < len(bots) + len(sites)
+    if paged:
+        query = f" matching '{MENU_PAGER.query}'" if MENU_PAGER.query else ""
+        span = f"{first + 1}-{first + shown}" if shown else "0"
+        print(f"\n  {C.DIM}Showing {span} of {matched}{query} ({len(bots) + len(sites)} total){C.RESET}")
+
+    if web_server and web_server['service']:
+        status_color = C.GREEN if '🟢' in web_server['status'] else C.RED
+        print(f"\n{C.BOLD}{C.CYAN}🖥️  Web server:{C.RESET}")
+        print(f"  {web_server['name']:<22} - {status_color}{web_server['status']}{C.RESET}")
+
+    print("\n" + C.BLUE + "─" * 40 + C.RESET)
+    print(f"{C.BOLD}--- Actions ---{C.RESET}")
+    print(f"  {C.YELLOW}[r]{C.RESET} Restart {C.BOLD}ALL{C.RESET} active bots {C.RED}(without logging){C.RESET}")
+    print(f"  {C.YELLOW}[x]{C.RESET} Stop {C.BOLD}ALL{C.RESET} active bots")
+    if bots:
+        print(f"  {C.YELLOW}[f]{C.RESET} Search bot logs")
+    if sites and web_server and web_server.get('service') in ('nginx', 'apache2'):
+        print(f"  {C.YELLOW}[e]{C.RESET} Enable / disable several sites at once")
+        print(f"  {C.YELLOW}[t]{C.RESET} Site traffic (access logs)")
+    if web_server and web_server['service']:
+        print(f"  {C.YELLOW}[s]{C.RESET} Soft reload web server ({web_server['name']})")
+    if paged:
+        print(f"  {C.YELLOW}[n]{C.RESET} / {C.YELLOW}[p]{C.RESET} Next / previous page")
+    if paged or len(bots) + len(sites) > 20:
+        print(f"  {C.YELLOW}[/text]{C.RESET} Filter by name ({C.YELLOW}/{C.RESET} alone clears)")
+    print(f"  {C.YELLOW}[q]{C.RESET} Quit")
+    print(soft_separator(40))
+    return True
+
+def draw_menu(bots, sites, web_server, metrics=None, pending=(), health=None, footer=None, typed=''):
+    """Render the main menu plus prompt as one SCREEN frame (only changed cells are rewritten).
+
+    footer is a dim status line above the prompt, typed is shown after the prompt.
+    Returns False if there is nothing to manage (the message is still shown).
+    """
+    frame = io.StringIO()
+    with contextlib.redirect_stdout(frame):
+        shown = render_menu(bots, sites, web_server, metrics, pending, health)
+        if shown and footer:
+            print(f"{C.DIM}{footer}{C.RESET}")
+    text = frame.getvalue()
+    text = text + f"{C.BOLD}{MENU_PROMPT}{C.RESET}{typed}" if shown else text.rstrip('\n')
+    SCREEN.draw(text)
+    if not shown:
+        print()
+    return shown
+
+def display_menu(bots, sites, web_server, metrics=None):
+    """Render main menu and return the user's choice (None if there is nothing to manage)."""
+    SCREEN.invalidate()
+    if not draw_menu(bots, sites, web_server, metrics):
+        return None
+    return input().lower().strip()
+
+def load_panel_cache():
+    """Last rendered (bots, sites, web server) snapshot, or None."""
+    try:
+        with open(PANEL_CACHE_FILE, 'r') as f:
+            view = json.load(f)
+        if view.get('root') == BASE_DIR:
+            return {'bots': view['bots'], 'sites': view['sites'], 'web_server': view['web_server']}
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    return None
+
+def save_panel_cache(view):
+    """Atomically persist the menu snapshot for the next start."""
+    try:
+        atomic_write(PANEL_CACHE_FILE, json.dumps(dict(view, root=BASE_DIR), ensure_ascii=False, separators=(',', ':')))
+    except (OSError, TypeError, ValueError):
+        pass  # only a cache: the next start just renders a bit later
+
+def _probe_web_and_sites(registry, events):
+    web_server = get_web_server_status()
+    events.put(('web_server', web_server))
+    if registry:
+        registry.set_web_server(web_server.get('service'))
+        sites = registry.snapshot()[1]
+    else:
+        sites = update_sites_status(discover_sites(web_server), web_server)
+    events.put(('sites', sites))
+
+def _probe_bots(registry, metrics, events):
+    all_bots = registry.snapshot()[0] if registry else discover_bots_recursive(BASE_DIR)
+    supervised = (supervisor_request({'cmd': 'status'}) or {}).get('bots')
+    bots = preflight_bots(update_bots_status(all_bots, load_state(), supervised))
+    if metrics:
+        metrics.track(bots)
+    events.put(('bots', bots))
+
+def _run_probe(probe, events, *args):
+    try:
+        probe(*args, events)
+    except Exception as e:
+        events.put(('error', e))
+
+def staged_menu(view, registry=None, metrics=None, health=None):
+    """Draw the menu from the cached view at once and redraw as each probe finishes.
+
+    Web server/site and bot probes run on threads. A choice typed before they
+    finish is applied to the fresh data (item numbers are mapped by folder/config).
+    Returns (choice or None, fresh view).
+    """
+    events = queue.Queue()
+    threading.Thread(target=_run_probe, args=(_probe_web_and_sites, events, registry), daemon=True).start()
+    threading.Thread(target=_run_probe, args=(_probe_bots, events, registry, metrics), daemon=True).start()
+    pending = {'web_server', 'bots', 'sites'}
+    fresh = dict(view)
+    interactive = sys.stdin.isatty()
+    choice = shown = None
+
+    def draw():
+        nonlocal shown
+        shown = dict(fresh)
+        draw_menu(fresh['bots'], fresh['sites'], fresh['web_server'], metrics, pending, health)
+
+    SCREEN.invalidate()
+    draw()
+    while pending:
+        try:
+            kind, value = events.get(timeout=0.05 if interactive and choice is None else None)
+        except queue.Empty:
+            if select.select([sys.stdin], [], [], 0)[0]:
+                choice = sys.stdin.readline()
+                if not choice:
+                    raise EOFError
+            continue
+        if kind == 'error':
+            raise value
+        fresh[kind] = value
+        pending.discard(kind)
+        if choice is None and pending:
+            draw()
+
+    if choice is None:
+        if not draw_menu(fresh['bots'], fresh['sites'], fresh['web_server'], metrics, health=health):
+            return None, fresh
+        choice = input()
+    else:
+        choice = _remap_choice(choice.lower().strip(), shown, fresh)
+    return choice.lower().strip(), fresh
+
+def _live_refresh(registry, metrics, events, stop, interval):
+    """Refresher thread of live_menu: re-probe everything every interval seconds."""
+    while True:
+        _run_probe(_probe_web_and_sites, events, registry)
+        _run_probe(_probe_bots, events, registry, metrics)
+        if stop.wait(interval):
+            return
+
+def _live_key(key, typed, count):
+    """Apply one keystroke to the typed item number. Returns (choice or None, typed)."""
+    if key.isdigit():
+        typed += key
+        # choose as soon as no longer number can be an item
+        return (typed, '') if int(typed) * 10 > count else (None, typed)
+    if key in '\r\n':
+        return typed or None, ''
+    if key in '\x7f\b':
+        return None, typed[:-1]
+    if key.isalpha() and not typed:
+        return key.lower(), ''
+    return None, typed
+
+def live_menu(view, registry=None, metrics=None, health=None, interval=LIVE_REFRESH_INTERVAL):
+    """Auto-refreshing menu: statuses and metrics are redrawn every interval seconds.
+
+    Probes run on a refresher thread; this thread only waits for keys on the raw
+    terminal and redraws, so a keystroke is handled at once. Commands are single
+    keys; item numbers are chosen as soon as no longer number fits (Enter picks
+    earlier, Backspace / Esc edit). '/' starts an incremental name filter (Enter
+    keeps it, Esc drops it), 'n' / 'p' page. Returns (choice or None, fresh view) like
+    staged_menu, which is used instead when stdin is not a terminal.
+    """
+    if termios is None or not sys.stdin.isatty():
+        return staged_menu(view, registry, metrics, health)
+    events = queue.Queue()
+    stop = threading.Event()
+    threading.Thread(target=_live_refresh, args=(registry, metrics, events, stop, interval), daemon=True).start()
+    pending = {'web_server', 'bots', 'sites'}
+    fresh = dict(view)
+    fd = sys.stdin.fileno()
+    typed = ''
+    filtering = False
+    updated = None
+    dirty = True
+    SCREEN.invalidate()
+    try:
+        with raw_input_mode():
+            while True:
+                if dirty:
+                    footer = f"● live, every {interval:g}s" + (f", updated {updated:%H:%M:%S}" if updated else "")
+                    shown_input = f"/{MENU_PAGER.query}" if filtering else typed
+                    if not draw_menu(fresh['bots'], fresh['sites'], fresh['web_server'], metrics,
+                                     pending, health, footer, shown_input) and not pending:
+                        return None, fresh
+                    dirty = False
+                if select.select([fd], [], [], 0.05)[0]:
+                    keys = os.read(fd, 64).decode(errors='ignore')
+                    if not keys:
+                        raise EOFError
+                    for key in keys:
+                        if key == '\x1b':  # Esc or the start of an arrow/function key sequence
+                            typed = ''
+                            if filtering:
+                                MENU_PAGER.set_filter('')
+                                filtering = False
+                            break
+                        if filtering:  # the filter is applied on every keystroke
+                            if key in '\r\n':
+                                filtering = False
+                            elif key in '\x7f\b':
+                                MENU_PAGER.set_filter(MENU_PAGER.query[:-1])
+                            elif key.isprintable():
+                                MENU_PAGER.set_filter(MENU_PAGER.query + key)
+                            continue
+                        if not typed and key == '/':
+                            filtering = True
+                            continue
+                        if not typed and MENU_PAGER.command(key):
+                            continue
+                        choice, typed = _live_key(key, typed, len(fresh['bots']) + len(fresh['sites']))
+                        if choice:
+                            print(key.strip())
+                            return choice, fresh
+                    dirty = True
+                while True:
+                    try:
+                        kind, value = events.get_nowait()
+                    except queue.Empty:
+                        break
+                    if kind == 'error':
+                        raise value
+                    fresh[kind] = value
+                    pending.discard(kind)
+                    updated = datetime.now()
+                    dirty = True
+    finally:
+        stop.set()
+
+def _remap_choice(choice, shown, fresh):
+    """Translate an item number picked on a stale frame to the same item in the fresh view."""
+    if not choice.isdigit():
+        return choice
+    num, shown_bots = int(choice), shown['bots']
+    if 1 <= num <= len(shown_bots):
+        key, items, old, offset = 'dir', fresh['bots'], shown_bots[num - 1], 0
+    elif len(shown_bots) < num <= len(shown_bots) + len(shown['sites']):
+        key, items, old = 'key', fresh['sites'], shown['sites'][num - len(shown_bots) - 1]
+        offset = len(fresh['bots'])
+    else:
+        return choice
+    def item_key(item):
+        return item.get('dir') if key == 'dir' else (item.get('config'), item.get('name'))
+    for i, item in enumerate(items):
+        if item_key(item) == item_key(old):
+            return str(offset + i + 1)
+    return '0'  # the item is gone
+
+def bot_log_path(bot):
+    """Path of the log file start_bot() writes for a bot."""
+    return os.path.join(bot['dir'], 'logs', f"{bot['name']}.log")
+
+def tail_lines(path, n=None):
+    """Return (last n lines, file size) using mmap and a backwards newline scan.
+
+    Only the tail of the file is touched, so the cost does not depend on the log size.
+    """
+    n = n or LOG_TAIL_LINES
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return [], 0
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            pos = size - 1 if mm[size - 1:size] == b'\n' else size
+            for _ in range(n):
+                pos = mm.rfind(b'\n', 0, pos)
+                if pos < 0:
+                    break
+            data = mm[pos + 1:size]
+    return data.decode('utf-8', 'replace').splitlines(), size
+
+def follow_log(path, offset):
+    """Stream bytes appended to path after offset until Ctrl+C.
+
+    Waits for inotify events on the log folder (polls every 0.5s without inotify)
+    and reads only the new bytes; follows the log across rotation or truncation.
+    When the inode changes, the rest of the old file is printed first and the new
+    file is read from offset 0; a file shorter than offset is read from 0 as well.
+    """
+    def emit(data):
+        sys.stdout.write(data.decode('utf-8', 'replace'))
+        sys.stdout.flush()
+
+    name = os.path.basename(path)
+    try:
+        notifier = Inotify()
+        notifier.add_watch(os.path.dirname(path), Inotify.IN_MODIFY | Inotify.IN_CREATE
+                           | Inotify.IN_MOVED_TO | Inotify.IN_CLOSE_WRITE)
+    except (OSError, AttributeError):
+        notifier = None
+    f, inode = None, None
+    try:
+        # open right away so a rotation before the first event is seen as one
+        f = open(path, 'rb')
+        inode = os.fstat(f.fileno()).st_ino
+    except OSError:
+        offset = 0  # whatever appears later is a new file
+    try:
+        while True:
+            if notifier:
+                events = notifier.read_events(timeout=1.0)
+                if events and not any(ev_name == name for _wd, _mask, ev_name in events):
+                    continue
+            else:
+                time.sleep(0.5)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if f is not None and st.st_ino != inode:
+                # rotated: finish the old file, then read the new one from the start
+                f.seek(offset)
+                emit(f.read())
+                f.close()
+                f, offset = None, 0
+            if f is None:
+                try:
+                    f = open(path, 'rb')
+                except OSError:
+                    continue
+                st = os.fstat(f.fileno())
+                inode = st.st_ino
+            if st.st_size < offset:
+                offset = 0  # truncated
+            if st.st_size > offset:
+                f.seek(offset)
+                data = f.read(st.st_size - offset)
+                offset += len(data)
+                emit(data)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if f:
+            f.close()
+        if notifier:
+            notifier.close()
+
+def view_bot_log(bot):
+    """Show the last lines of the bot log and optionally follow it."""
+    path = bot_log_path(bot)
+    if not os.path.isfile(path):
+        print(f"{C.YELLOW}⚠️ No log file for '{bot['name']}' ({path}).{C.RESET}")
+        return
+    clear_screen()
+    lines, size = tail_lines(path)
+    print(C.BOLD + C.YELLOW + f"--- Log: {path} (last {len(lines)} lines) ---" + C.RESET)
+    for line in lines:
+        print(line)
+    print(soft_separator(35))
+    if input(f"{C.BOLD}[f] follow, [Enter] back: {C.RESET}").strip().lower() == 'f':
+        print(f"{C.CYAN}Following {path}, press Ctrl+C to stop...{C.RESET}")
+        follow_log(path, size)
+
+class LogSearchIndex:
+    """Incremental on-disk inverted index (token -> line byte offsets) over bot logs.
+
+    Files are tracked by device/inode plus a fingerprint of their first bytes, so
+    a log renamed by rotation keeps its postings and update() only tokenizes bytes
+    appended since the previous run. Compressed segments are indexed once.
+    Postings are stored per (token, file, chunk) as packed arrays of offsets.
+    """
+    TOKEN_RE = re.compile(r'\w{2,64}')
+    CHUNK = 4 * 1024 * 1024
+    HEAD = 64
+
+    def __init__(self, path=None):
+        self.path = path or LOG_INDEX_FILE
+        self._conn = sqlite3.connect(self.path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "id INTEGER PRIMARY KEY, file_key TEXT UNIQUE NOT NULL, head BLOB NOT NULL, "
+            "path TEXT NOT NULL, bot TEXT NOT NULL, indexed_bytes INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings (token TEXT NOT NULL, file_id INTEGER NOT NULL, offsets BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS postings_token ON postings (token)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id)")
+
+    def close(self):
+        self._conn.close()
 
-    if web_server and web_server['service']:
-        status_color = C.GREEN if '🟢' in web_server['status'] else C.RED
-        print(f"\n{C.BOLD}{C.CYAN}🖥️  Web server:{C.RESET}")
-        print(f"  {web_server['name']:<22} - {status_color}{web_server['status']}{C.RESET}")
+    @staticmethod
+    def log_files(bots):
+        """(bot name, path) of every current and rotated log of the given bots."""
+        files = []
+        for bot in bots:
+            logs_dir = os.path.join(bot['dir'], 'logs')
+            try:
+                names = sorted(os.listdir(logs_dir))
+            except OSError:
+                continue
+            for name in names:
+                if name.endswith('.log') or name.endswith('.log.gz'):
+                    files.append((bot['name'], os.path.join(logs_dir, name)))
+        return files
 
-    print("\n" + C.BLUE + "─" * 40 + C.RESET)
-    print(f"{C.BOLD}--- Actions ---{C.RESET}")
-    print(f"  {C.YELLOW}[r]{C.RESET} Restart {C.BOLD}ALL{C.RESET} active bots {C.RED}(without logging){C.RESET}")
-    if web_server and web_server['service']:
-        print(f"  {C.YELLOW}[s]{C.RESET} Soft reload web server ({web_server['name']})")
-    print(f"  {C.YELLOW}[q]{C.RESET} Quit")
-    print(soft_separator(40))
-    
-    return input(f"{C.BOLD}Select item number or enter a command: {C.RESET}").lower().strip()
+    def _head(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return f.read(self.HEAD)
+        except OSError:
+            return b''
+
+    def update(self, bots):
+        """Index bytes appended since the last update; returns number of bytes indexed."""
+        current = {}
+        for bot_name, path in self.log_files(bots):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            current[f"{st.st_dev}:{st.st_ino}"] = (bot_name, path, st.st_size)
+
+        known = {row[1]: row for row in self._conn.execute(
+            "SELECT id, file_key, head, path, indexed_bytes FROM files")}
+        total = 0
+        with self._conn:
+            for file_key, row in known.items():
+                if file_key not in current:
+                    self._drop(row[0])
+            for file_key, (bot_name, path, size) in current.items():
+                row = known.get(file_key)
+                if row is not None:
+                    file_id, head, old_path, indexed = row[0], row[2], row[3], row[4]
+                    # inode reused by another file, or the log was truncated
+                    truncated = size < indexed and not path.endswith('.gz')
+                    if truncated or self._head(path)[:len(head)] != head:
+                        self._drop(file_id)
+                        row = None
+                    elif old_path != path:
+                        self._conn.execute("UPDATE files SET path = ?, bot = ? WHERE id = ?",
+                                           (path, bot_name, file_id))
+                if row is None:
+                    file_id, indexed = self._conn.execute(
+                        "INSERT INTO files (file_key, head, path, bot, indexed_bytes) VALUES (?, ?, ?, ?, 0)",
+                        (file_key, self._head(path), path, bot_name)).lastrowid, 0
+                if path.endswith('.gz'):
+                    if not indexed:
+                        total += self._index_gzip(file_id, path)
+                elif size > indexed:
+                    total += self._index_plain(file_id, path, indexed, size)
+                    if not row or len(row[2]) < self.HEAD:
+                        self._conn.execute("UPDATE files SET head = ? WHERE id = ?", (self._head(path), file_id))
+        return total
+
+    def _drop(self, file_id):
+        self._conn.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+        self._conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _index_lines(self, file_id, data, base_offset):
+        """Add postings for complete lines in data; return number of bytes consumed."""
+        end = data.rfind(b'\n') + 1
+        postings, offset, findall = {}, base_offset, self.TOKEN_RE.findall
+        for line in data[:end].split(b'\n')[:-1]:
+            for token in set(findall(line.decode('utf-8', 'replace').lower())):
+                offsets = postings.get(token)
+                if offsets is None:
+                    offsets = postings[token] = array('q')
+                offsets.append(offset)
+            offset += len(line) + 1
+        self._conn.executemany(
+            "INSERT INTO postings (token, file_id, offsets) VALUES (?, ?, ?)",
+            ((token, file_id, offsets.tobytes()) for token, offsets in postings.items())
+        )
+        return end
+
+    def _index_plain(self, file_id, path, start, size):
+        offset = start
+        with open(path, 'rb') as f:
+            f.seek(start)
+            while offset < size:
+                data = f.read(min(self.CHUNK, size - offset))
+                if not data:
+                    break
+                consumed = self._index_lines(file_id, data, offset)
+                if not consumed:
+                    if len(data) < self.CHUNK:
+                        break  # unfinished last line, wait for the rest
+                    consumed = len(data)  # a single huge line: skip it
+                offset += consumed
+                f.seek(offset)
+        self._conn.execute("UPDATE files SET indexed_bytes = ? WHERE id = ?", (offset, file_id))
+        return offset - start
+
+    def _index_gzip(self, file_id, path):
+        offset, pending = 0, b''
+        with gzip.open(path, 'rb') as f:
+            while True:
+                data = f.read(self.CHUNK)
+                if not data:
+                    break
+                data = pending + data
+                consumed = self._index_lines(file_id, data, offset)
+                offset += consumed
+                pending = data[consumed:]
+        # compressed segments are immutable: mark as fully indexed
+        self._conn.execute("UPDATE files SET indexed_bytes = ? WHERE id = ?", (max(offset, 1), file_id))
+        return offset
+
+    def _lookup(self, token):
+        """Set of (file_id, offset) pairs for one token."""
+        hits = set()
+        for file_id, blob in self._conn.execute("SELECT file_id, offsets FROM postings WHERE token = ?", (token,)):
+            offsets = array('q')
+            offsets.frombytes(blob)
+            hits.update((file_id, o) for o in offsets)
+        return hits
+
+    def search(self, query, limit=None):
+        """Return (bot, path, line) hits containing every word of query, newest files first."""
+        limit = limit or LOG_SEARCH_LIMIT
+        tokens = set(self.TOKEN_RE.findall(query.lower()))
+        if not tokens:
+            return []
+        # start from the rarest token so the intersections stay small
+        counts = {t: self._conn.execute("SELECT COUNT(*) FROM postings WHERE token = ?", (t,)).fetchone()[0]
+                  for t in tokens}
+        matches = None
+        for token in sorted(tokens, key=counts.get):
+            found = self._lookup(token)
+            matches = found if matches is None else matches & found
+            if not matches:
+                return []
+
+        files = {row[0]: row[1:] for row in self._conn.execute("SELECT id, bot, path FROM files")}
+        by_file = {}
+        for file_id, offset in matches:
+            if file_id in files:
+                by_file.setdefault(file_id, []).append(offset)
+
+        def mtime(file_id):
+            try:
+                return os.stat(files[file_id][1]).st_mtime_ns
+            except OSError:
+                return 0
+
+        hits = []
+        # newest first by mtime (compressed segments keep the mtime of the log they came from)
+        for file_id in sorted(by_file, key=mtime, reverse=True):
+            bot_name, path = files[file_id]
+            try:
+                opener = gzip.open if path.endswith('.gz') else open
+                with opener(path, 'rb') as f:
+                    for offset in sorted(by_file[file_id]):
+                        f.seek(offset)
+                        hits.append((bot_name, path, f.readline().decode('utf-8', 'replace').rstrip('\n')))
+                        if len(hits) >= limit:
+                            return hits
+            except OSError:
+                continue
+        return hits
+
+def search_logs_menu(bots):
+    """Ask for a query and search all bot logs through the inverted index."""
+    query = input(f"{C.BOLD}Search logs for (all words must match): {C.RESET}").strip()
+    if not query:
+        return
+    index = LogSearchIndex()
+    try:
+        t0 = time.monotonic()
+        indexed = index.update(bots)
+        t1 = time.monotonic()
+        hits = index.search(query)
+        t2 = time.monotonic()
+    finally:
+        index.close()
+    print(f"{C.CYAN}Indexed {indexed / 1024 / 1024:.1f} MB of new log data in {t1 - t0:.2f}s, "
+          f"search took {(t2 - t1) * 1000:.1f} ms.{C.RESET}\n")
+    if not hits:
+        print(f"{C.YELLOW}No matches for '{query}'.{C.RESET}")
+    last_file = None
+    for bot_name, path, line in hits:
+        if path != last_file:
+            print(f"{C.BOLD}{C.BLUE}{bot_name}{C.RESET} {C.WHITE}{path}{C.RESET}")
+            last_file = path
+        print(f"  {line}")
+    if len(hits) >= LOG_SEARCH_LIMIT:
+        print(f"\n{C.YELLOW}Showing the first {LOG_SEARCH_LIMIT} matches.{C.RESET}")
+    input(f"\n{C.BOLD}Press Enter to continue...{C.RESET}")
 
 def handle_single_bot_menu(bot):
     """Menu for managing a single bot."""
@@ -660,17 +4310,25 @@ def handle_single_bot_menu(bot):
         print(f"  {C.YELLOW}[2]{C.RESET} 🔄 Restart")
     else:
         print(f"  {C.YELLOW}[1]{C.RESET} 🟢 Start")
+    print(f"  {C.YELLOW}[l]{C.RESET} 📜 View log")
     print(f"  {C.YELLOW}[any other key]{C.RESET} ← Back")
     print(soft_separator(35))
     action = input(f"{C.BOLD}Choose action: {C.RESET}").strip()
 
     ask_logging = lambda: input("Enable logging to file? [Y/n]: ").lower().strip() != 'n'
 
+    if action.lower() == 'l':
+        view_bot_log(bot)
+        return
+
     if bot['pid']:
         if action == '1':
             kill_bot(bot['pid'], bot['name'], bot['dir'])
         elif action == '2':
-            if kill_bot(bot['pid'], bot['name'], bot['dir']):
+            if preflight_blocks_start(bot):
+                print(f"{C.RED}❌ Not restarting '{bot['name']}' ({bot['preflight']['manifest'] or 'dependencies'}): "
+                      f"{preflight_summary(bot['preflight'])}{C.RESET}")
+            elif kill_bot(bot['pid'], bot['name'], bot['dir']):
                 time.sleep(1)
                 start_bot(bot, logging_enabled=ask_logging())
     else:
@@ -681,7 +4339,7 @@ def handle_single_site_menu(site, web_server):
     """Menu for managing a single site."""
     if web_server['service'] not in ('nginx', 'apache2'):
         print(f"{C.YELLOW}Site management is available only for Nginx/Apache.{C.RESET}")
-        time.sleep(2)
+        pause_after_action()
         return
 
     status_color = C.GREEN if '🟢' in site['status'] else C.RED
@@ -742,18 +4400,1470 @@ def initial_setup():
         print(f"{C.CYAN}{alias_command.strip()}{C.RESET}")
         input(f"{C.BOLD}Press Enter to continue...{C.RESET}")
 
-def main():
+def supervisor_request(payload, timeout=2.0):
+    """Send one JSON request to the supervisor daemon; return its reply, or None if it isn't running."""
+    if not os.path.exists(SUPERVISOR_SOCKET):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(SUPERVISOR_SOCKET)
+            sock.sendall(json.dumps(payload).encode('utf-8') + b'\n')
+            data = b''
+            while not data.endswith(b'\n'):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        return json.loads(data)
+    except (OSError, ValueError):
+        return None
+
+def supervisor_available():
+    """Check whether a supervisor daemon answers on SUPERVISOR_SOCKET."""
+    return supervisor_request({'cmd': 'ping'}, timeout=0.5) is not None
+
+def supervisor_start_bot(bot, logging_enabled=True, verbose=True):
+    """Ask the supervisor daemon to start (and keep alive) a bot; return its PID or None."""
+    reply = supervisor_request({'cmd': 'start', 'dir': bot['dir'], 'logging': logging_enabled}, timeout=10)
+    if not reply or not reply.get('ok'):
+        error = reply.get('error') if reply else 'supervisor not responding'
+        print(f"{C.RED}❌ Failed to start '{bot['name']}' via supervisor: {error}{C.RESET}")
+        return None
+    if verbose:
+        print(f"{C.GREEN}✅ '{bot['name']}' started by supervisor (PID: {reply.get('pid')}).{C.RESET}")
+    return reply.get('pid')
+
+def supervisor_stop_bot(name, bot_dir, verbose=True):
+    """Ask the supervisor daemon to stop a bot and stop restarting it."""
+    reply = supervisor_request({'cmd': 'stop', 'dir': bot_dir}, timeout=SUPERVISOR_STOP_TIMEOUT * 3)
+    if not reply or not reply.get('ok'):
+        error = reply.get('error') if reply else 'supervisor not responding'
+        print(f"{C.RED}❌ Failed to stop '{name}' via supervisor: {error}{C.RESET}")
+        return False
+    if verbose:
+        print(f"{C.GREEN}✅ Session for '{name}' stopped by supervisor.{C.RESET}")
+    return True
+
+def _is_same_process(pid, create_time):
+    """True if pid is alive, not a zombie and was created at create_time."""
+    try:
+        proc = psutil.Process(pid)
+        return abs(proc.create_time() - (create_time or 0)) < 1 and proc.status() != psutil.STATUS_ZOMBIE
+    except psutil.Error:
+        return False
+
+class SupervisedBot:
+    """Runtime state of one bot owned by the supervisor daemon."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.wanted = False
+        self.logging = True
+        self.rotate_log = True
+        self.pid = None
+        self.create_time = None
+        self.process = None  # subprocess.Popen if the bot is our own child
+        self.started_at = None
+        self.restarts = 0
+        self.failures = 0
+        self.last_exit = None
+        self.next_start = None
+        self.task = None
+        self.wake = asyncio.Event()
+
+    def as_dict(self):
+        if self.pid:
+            state = 'running'
+        elif self.wanted:
+            state = 'backoff'
+        else:
+            state = 'stopped'
+        return {
+            'name': self.bot['name'],
+            'state': state,
+            'pid': self.pid,
+            'create_time': self.create_time,
+            'restarts': self.restarts,
+            'last_exit': self.last_exit,
+            'next_start_in': max(0.0, self.next_start - time.monotonic()) if self.next_start and not self.pid else None,
+        }
+
+class Supervisor:
+    """asyncio daemon that owns bot processes, restarts crashed ones with exponential
+    backoff and answers JSON requests on a local UNIX socket."""
+
+    def __init__(self, start_dir=BASE_DIR, socket_path=None):
+        self.start_dir = start_dir
+        self.socket_path = socket_path or SUPERVISOR_SOCKET
+        self.units = {}
+        self.loop = None
+
+    def log(self, message):
+        ts = datetime.now(MSK_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"[{ts}] {message}", flush=True)
+
+    # ---- lifecycle ----
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self._discover()
+        self._adopt()
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # stale socket, a live daemon was ruled out by the caller
+        server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self.log(f"Supervisor listening on {self.socket_path}, {len(self.units)} bots discovered, "
+                 f"{sum(u.wanted for u in self.units.values())} supervised.")
+
+        stop_event = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            self.loop.add_signal_handler(sig, stop_event.set)
+        rescan_task = asyncio.ensure_future(self._rescan_loop())
+        try:
+            await stop_event.wait()
+        finally:
+            rescan_task.cancel()
+            server.close()
+            await server.wait_closed()
+            for unit in self.units.values():
+                if unit.task:
+                    unit.task.cancel()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+            # bots live in their own sessions and keep running; the next daemon adopts them
+            self.log("Supervisor stopped (bots left running).")
+
+    def _discover(self):
+        for bot in discover_bots_recursive(self.start_dir):
+            if bot['dir'] not in self.units:
+                self.units[bot['dir']] = SupervisedBot(bot)
+
+    async def _rescan_loop(self):
+        while True:
+            await asyncio.sleep(30)
+            self._discover()
+
+    def _adopt(self):
+        """Supervise bots that are running now or were started and not stopped deliberately."""
+        state = load_state()
+        bots = update_bots_status([dict(u.bot) for u in self.units.values()], state)
+        for bot in bots:
+            unit = self.units[bot['dir']]
+            if bot['pid']:
+                unit.pid, unit.create_time = bot['pid'], bot['create_time']
+                unit.wanted = True
+                unit.rotate_log = False
+            elif state.get(bot['dir'], {}).get('pid'):
+                self.log(f"'{bot['name']}' died while unsupervised, starting it.")
+                unit.wanted = True
+            if unit.wanted:
+                self._ensure_task(unit)
+
+    def _ensure_task(self, unit):
+        if not unit.task or unit.task.done():
+            unit.task = asyncio.ensure_future(self._supervise(unit))
+
+    # ---- process handling ----
+
+    async def _supervise(self, unit):
+        name = unit.bot['name']
+        while unit.wanted:
+            if unit.pid is None:
+                if unit.next_start:
+                    delay = unit.next_start - time.monotonic()
+                    if delay > 0:
+                        try:
+                            await asyncio.wait_for(unit.wake.wait(), timeout=delay)
+                        except asyncio.TimeoutError:
+                            pass
+                        unit.wake.clear()
+                        if not unit.wanted:
+                            break
+                if not await self._spawn(unit):
+                    unit.failures += 1
+                    unit.next_start = time.monotonic() + self._backoff(unit)
+                    continue
+            unit.started_at = unit.started_at or time.monotonic()
+
+            exit_code = await self._wait_exit(unit)
+            uptime = time.monotonic() - unit.started_at
+            unit.pid = unit.process = unit.create_time = unit.started_at = None
+            unit.last_exit = exit_code
+            if not unit.wanted:
+                break
+            if uptime >= SUPERVISOR_STABLE_AFTER:
+                unit.failures = 0
+            delay = self._backoff(unit)
+            unit.failures += 1
+            unit.restarts += 1
+            unit.next_start = time.monotonic() + delay
+            self.log(f"'{name}' exited (code {exit_code}) after {uptime:.1f}s, restarting in {delay:.1f}s.")
+
+    @staticmethod
+    def _backoff(unit):
+        return min(SUPERVISOR_BACKOFF_MAX, SUPERVISOR_BACKOFF_MIN * (2 ** unit.failures))
+
+    async def _spawn(self, unit):
+        bot = unit.bot
+        command = bot_command(bot)
+        if not command:
+            self.log(f"Unknown bot type for '{bot['name']}': {bot['type']}")
+            unit.wanted = False
+            return False
+        cgroup = prepare_bot_cgroup(bot['dir'])
+        log_file = None
+        try:
+            if unit.logging:
+                log_file, _ = open_bot_log(bot, rotate=unit.rotate_log, verbose=False)
+                unit.rotate_log = False
+            output = log_file or subprocess.DEVNULL
+            # a plain Popen rather than an asyncio transport, which kills its process
+            # when closed: bots are session leaders and outlive the daemon
+            process = subprocess.Popen(
+                command,
+                cwd=bot['dir'],
+                stdin=subprocess.DEVNULL,
+                stdout=output,
+                stderr=output,
+                start_new_session=True,
+                preexec_fn=cgroup_preexec(cgroup)
+            )
+        except Exception as e:
+            self.log(f"Failed to start '{bot['name']}': {e}")
+            return False
+        finally:
+            if log_file:
+                log_file.close()
+        unit.process, unit.pid = process, process.pid
+        unit.started_at = time.monotonic()
+        unit.create_time = record_bot_started(bot['dir'], process.pid, cgroup)
+        self.log(f"Started '{bot['name']}' (PID: {process.pid}).")
+        return True
+
+    async def _wait_exit(self, unit):
+        """Wait for the bot process to exit; returns exit code (None for adopted processes)."""
+        process, pid, create_time = unit.process, unit.pid, unit.create_time
+        if process:
+            alive = lambda: process.poll() is None
+        else:
+            alive = lambda: _is_same_process(pid, create_time)
+        try:
+            pidfd = os.pidfd_open(pid)
+        except (AttributeError, OSError):
+            pidfd = None
+        if pidfd is not None:
+            try:
+                if alive():
+                    exited = self.loop.create_future()
+                    self.loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+                    try:
+                        await exited
+                    finally:
+                        self.loop.remove_reader(pidfd)
+            finally:
+                os.close(pidfd)
+        else:
+            while alive():
+                await asyncio.sleep(0.5)
+        return process.wait() if process else None
+
+    async def stop_unit(self, unit):
+        """Stop a bot for good: no restarts until it is started again."""
+        unit.wanted = False
+        unit.next_start = None
+        unit.wake.set()
+        pid = unit.pid
+        if pid:
+            self._signal_bot(pid, signal.SIGTERM)
+            if not await self._wait_task(unit, SUPERVISOR_STOP_TIMEOUT):
+                self._signal_bot(pid, signal.SIGKILL)
+                await self._wait_task(unit, SUPERVISOR_STOP_TIMEOUT)
+        with STATE.transaction() as state:
+            record_bot_stopped(state, unit.bot['dir'])
+        self.log(f"Stopped '{unit.bot['name']}'.")
+
+    @staticmethod
+    def _signal_bot(pid, sig):
+        try:
+            # bots are session leaders: signal the whole group so workers stop too
+            if os.getpgid(pid) == pid:
+                os.killpg(pid, sig)
+            else:
+                os.kill(pid, sig)
+        except OSError:
+            pass
+
+    @staticmethod
+    async def _wait_task(unit, timeout):
+        if not unit.task or unit.task.done():
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(unit.task), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def start_unit(self, unit, logging_enabled=True):
+        if unit.pid and unit.wanted:
+            return unit.pid
+        unit.wanted = True
+        unit.logging = logging_enabled
+        unit.rotate_log = True
+        unit.failures = 0
+        unit.next_start = None
+        unit.wake.set()  # cut short a pending backoff wait
+        self._ensure_task(unit)
+        for _ in range(50):
+            if unit.pid or unit.task.done():
+                break
+            await asyncio.sleep(0.02)
+        return unit.pid
+
+    # ---- control socket ----
+
+    def _unit_for(self, bot_dir):
+        unit = self.units.get(bot_dir)
+        if unit is None and bot_dir and os.path.isdir(bot_dir):
+            bot = _scan_directory(bot_dir, 0)['bot']
+            if bot:
+                unit = self.units[bot_dir] = SupervisedBot(bot)
+        return unit
+
+    async def _dispatch(self, request):
+        cmd = request.get('cmd')
+        if cmd == 'ping':
+            return {'ok': True, 'pid': os.getpid()}
+        if cmd == 'status':
+            return {'ok': True, 'bots': {d: u.as_dict() for d, u in self.units.items()}}
+        if cmd in ('start', 'stop', 'restart'):
+            unit = self._unit_for(request.get('dir'))
+            if unit is None:
+                return {'ok': False, 'error': f"no bot in {request.get('dir')!r}"}
+            if cmd in ('stop', 'restart'):
+                await self.stop_unit(unit)
+            if cmd in ('start', 'restart'):
+                pid = await self.start_unit(unit, logging_enabled=request.get('logging', True))
+                if not pid:
+                    return {'ok': False, 'error': 'failed to start, see daemon output'}
+                return {'ok': True, 'pid': pid}
+            return {'ok': True}
+        return {'ok': False, 'error': f"unknown command {cmd!r}"}
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    reply = await self._dispatch(json.loads(line))
+                except Exception as e:
+                    reply = {'ok': False, 'error': str(e)}
+                writer.write(json.dumps(reply).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+def run_daemon():
+    """Run the supervisor daemon in the foreground (use systemd/nohup to background it)."""
+    if supervisor_available():
+        print(f"{C.YELLOW}⚠️ Supervisor is already running ({SUPERVISOR_SOCKET}).{C.RESET}")
+        return 1
+    supervisor = Supervisor(BASE_DIR)
+    try:
+        asyncio.run(supervisor.run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def _metric_labels(**labels):
+    """Prometheus label set with escaped values."""
+    escaped = (
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+class MetricsExporter:
+    """Prometheus text exposition of bots, sites and the web server.
+
+    A background thread refreshes a snapshot of bot/site/web server status every
+    EXPORTER_REFRESH_INTERVAL seconds; scrapes only format that snapshot, so they
+    never trigger process table or filesystem scans themselves.
+    """
+
+    METRICS = (
+        # name, type, help
+        ('workmanager_bot_up', 'gauge', "Whether the bot is running (1) or stopped (0)."),
+        ('workmanager_bot_supervised', 'gauge', "Whether the bot is owned by the supervisor daemon."),
+        ('workmanager_bot_processes', 'gauge', "Number of tracked processes of the bot."),
+        ('workmanager_bot_start_time_seconds', 'gauge', "Start time of the bot root process, unix epoch."),
+        ('workmanager_bot_uptime_seconds', 'gauge', "Seconds since the bot root process started."),
+        ('workmanager_bot_starts_total', 'counter', "Starts recorded in the manager state file."),
+        ('workmanager_bot_restarts_total', 'counter', "Automatic restarts done by the supervisor daemon."),
+        ('workmanager_bot_cpu_percent', 'gauge', "CPU usage of the bot process tree, percent of one core."),
+        ('workmanager_bot_resident_memory_bytes', 'gauge', "Resident memory of the bot process tree."),
+        ('workmanager_bot_open_fds', 'gauge', "Open file descriptors of the bot process tree."),
+        ('workmanager_bot_threads', 'gauge', "Threads of the bot process tree."),
+        ('workmanager_bot_io_bytes_per_second', 'gauge', "Bytes read + written per second by the bot process tree."),
+        ('workmanager_site_enabled', 'gauge', "Whether the site config is enabled in the web server."),
+        ('workmanager_web_server_up', 'gauge', "Whether the detected web server is active."),
+        ('workmanager_snapshot_timestamp_seconds', 'gauge', "When the exported snapshot was taken, unix epoch."),
+        ('workmanager_snapshot_duration_seconds', 'gauge', "Time spent refreshing the exported snapshot."),
+    )
+
+    def __init__(self, registry=None, sampler=None, interval=None):
+        self.registry = registry
+        self.sampler = sampler
+        self.interval = interval or EXPORTER_REFRESH_INTERVAL
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._counters = {}  # (bot dir, field) -> highest value exported so far
+
+    def start(self):
+        self.refresh()
+        threading.Thread(target=self._run, name='metrics-exporter', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"{C.RED}❌ Metrics refresh failed: {e}{C.RESET}", file=sys.stderr)
+
+    def refresh(self):
+        """Take a new status snapshot of bots, sites and the web server."""
+        started = time.monotonic()
+        web_server = get_web_server_status()
+        if self.registry:
+            self.registry.set_web_server(web_server.get('service'))
+            bots, sites = self.registry.snapshot()
+        else:
+            bots, sites = discover_all_bots_and_sites(web_server)
+            sites = update_sites_status(sites, web_server)
+        state = load_state()
+        supervised = (supervisor_request({'cmd': 'status'}) or {}).get('bots') or {}
+        bots = update_bots_status(bots, state, supervised)
+        if self.sampler:
+            self.sampler.track(bots)
+        for bot in bots:
+            info = supervised.get(bot['dir']) or {}
+            # counters never go down: an unreadable state file or a supervisor that
+            # doesn't answer this time must not look like a reset
+            for field, value in (('starts', state.get(bot['dir'], {}).get('starts', 0)),
+                                 ('restarts', info.get('restarts', 0))):
+                key = (bot['dir'], field)
+                bot[field] = self._counters[key] = max(value, self._counters.get(key, 0))
+        snapshot = {
+            'bots': bots,
+            'sites': sites,
+            'web_server': web_server,
+            'taken_at': time.time(),
+            'duration': time.monotonic() - started,
+        }
+        with self._lock:
+            self._snapshot = snapshot
+
+    def render(self):
+        """Format the cached snapshot in the Prometheus text format (version 0.0.4)."""
+        with self._lock:
+            snapshot = self._snapshot
+        samples = {name: [] for name, _, _ in self.METRICS}
+        now = time.time()
+        for bot in snapshot['bots']:
+            labels = _metric_labels(bot=bot['name'], type=bot['type'], dir=bot['dir'])
+            running = bool(bot.get('pid'))
+            samples['workmanager_bot_up'].append((labels, int(running)))
+            samples['workmanager_bot_supervised'].append((labels, int(bool(bot.get('supervised')))))
+            samples['workmanager_bot_processes'].append((labels, len(bot.get('pids') or ())))
+            samples['workmanager_bot_starts_total'].append((labels, bot['starts']))
+            samples['workmanager_bot_restarts_total'].append((labels, bot['restarts']))
+            if running and bot.get('create_time'):
+                samples['workmanager_bot_start_time_seconds'].append((labels, bot['create_time']))
+                samples['workmanager_bot_uptime_seconds'].append((labels, max(0.0, now - bot['create_time'])))
+            ring = self.sampler.ring(bot['dir']) if self.sampler and running else None
+            if ring and ring.count:
+                samples['workmanager_bot_cpu_percent'].append((labels, ring.latest('cpu')))
+                samples['workmanager_bot_resident_memory_bytes'].append((labels, ring.latest('rss')))
+                samples['workmanager_bot_open_fds'].append((labels, ring.latest('fds')))
+                samples['workmanager_bot_threads'].append((labels, ring.latest('threads')))
+                samples['workmanager_bot_io_bytes_per_second'].append((labels, ring.latest('io')))
+        web_server = snapshot['web_server']
+        server = web_server.get('service') or 'none'
+        for site in snapshot['sites']:
+            labels = _metric_labels(site=site['name'], server=server)
+            samples['workmanager_site_enabled'].append((labels, int('🟢' in site.get('status', ''))))
+        samples['workmanager_web_server_up'].append(
+            (_metric_labels(server=server), int('🟢' in web_server.get('status', ''))))
+        samples['workmanager_snapshot_timestamp_seconds'].append(('', snapshot['taken_at']))
+        samples['workmanager_snapshot_duration_seconds'].append(('', snapshot['duration']))
+
+        lines = []
+        for name, metric_type, help_text in self.METRICS:
+            if not samples[name]:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(f"{name}{labels} {round(value, 3)!r}" for labels, value in samples[name])
+        return ('\n'.join(lines) + '\n').encode()
+
+def make_metrics_handler(exporter):
+    """HTTP handler class serving exporter.render() on /metrics."""
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404, "Try /metrics")
+                return
+            body = exporter.render()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes every few seconds would flood the terminal
+    return MetricsHandler
+
+def run_metrics_exporter(port, bind=None, watch=False):
+    """Serve /metrics on bind:port until interrupted."""
+    registry = DiscoveryRegistry(BASE_DIR).start() if watch else None
+    sampler = MetricsSampler().start() if METRICS_ENABLED else None
+    exporter = MetricsExporter(registry, sampler).start()
+    server = http.server.ThreadingHTTPServer((bind or METRICS_BIND, port), make_metrics_handler(exporter))
+    server.daemon_threads = True
+    print(f"{C.CYAN}📈 Serving metrics on http://{bind or METRICS_BIND}:{port}/metrics "
+          f"(snapshot every {exporter.interval:g}s). Ctrl+C to stop.{C.RESET}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        exporter.stop()
+        if sampler:
+            sampler.stop()
+        if registry:
+            registry.stop()
+    return 0
+
+def fleet_token(create=False):
+    """Shared fleet secret: FLEET_TOKEN, else FLEET_TOKEN_FILE (generated when create is set)."""
+    if FLEET_TOKEN:
+        return FLEET_TOKEN
+    try:
+        with open(FLEET_TOKEN_FILE) as f:
+            token = f.read().strip()
+        if token:
+            return token
+    except FileNotFoundError:
+        pass
+    if not create:
+        return None
+    token = secrets.token_urlsafe(32)
+    atomic_write(FLEET_TOKEN_FILE, token + '\n', mode=0o600)
+    return token
+
+def rpc_list(registry=None):
+    """Bots, sites and web server of this host (the `list` RPC)."""
+    web_server = get_web_server_status()
+    if registry:
+        registry.set_web_server(web_server.get('service'))
+        bots, sites = registry.snapshot()
+    else:
+        bots = discover_bots_recursive(BASE_DIR)
+        sites = update_sites_status(discover_sites(web_server), web_server)
+    return {
+        'host': socket.gethostname(),
+        'bots': [dict(bot_summary(b), info=b.get('time_info', '').lstrip(' |')) for b in _bots_with_status(bots)],
+        'sites': [site_summary(s) for s in sites],
+        'web_server': {'name': web_server['name'], 'service': web_server['service'],
+                       'active': '🟢' in web_server['status']},
+    }
+
+def rpc_find_bots(registry, names):
+    """Resolve RPC bot names / folders to discovered bots under BASE_DIR; returns (bots, missing).
+
+    Unlike find_bots, a folder is never probed directly: it has to be the folder of a
+    bot known to the registry (or the index-assisted discovery walk), so a client can
+    only act on this host's bots, not on any script it names.
+    """
+    known = registry.snapshot()[0] if registry else discover_bots_recursive(BASE_DIR)
+    known = [b for b in known if _inside_dir(b['dir'], BASE_DIR)]
+    found, missing = {}, []
+    for name in names:
+        matches = [b for b in known if name in (b['dir'], b['name'])]
+        if matches:
+            found.update((b['dir'], dict(b)) for b in matches)
+        else:
+            missing.append(name)
+    return list(found.values()), missing
+
+def rpc_start_bot(registry=None, names=()):
+    args = argparse.Namespace(json=True, names=list(names), no_log=False)
+    return cmd_start(args, rpc_find_bots(registry, args.names))[0]
+
+def rpc_kill_bot(registry=None, names=()):
+    args = argparse.Namespace(json=True, names=list(names), all=False, timeout=STOP_TIMEOUT)
+    return cmd_stop(args, rpc_find_bots(registry, args.names))[0]
+
+def rpc_restart_bot(registry=None, names=()):
+    args = argparse.Namespace(json=True, names=list(names), all=False, no_log=False)
+    return cmd_restart(args, rpc_find_bots(registry, args.names))[0]
+
+def rpc_toggle_site_status(registry=None, name=None, enable=None):
+    if enable is None:
+        sites, _ = find_sites([name], get_web_server_status())
+        enable = not any('🟢' in s.get('status', '') for s in sites)
+    args = argparse.Namespace(json=True, names=[name], action='enable' if enable else 'disable', no_reload=False)
+    return cmd_site(args)[0]
+
+def rpc_reload_web_server(registry=None):
+    return cmd_reload(argparse.Namespace(json=True))[0]
+
+RPC_METHODS = {
+    'list': rpc_list,
+    'start_bot': rpc_start_bot,
+    'kill_bot': rpc_kill_bot,
+    'restart_bot': rpc_restart_bot,
+    'toggle_site_status': rpc_toggle_site_status,
+    'reload_web_server': rpc_reload_web_server,
+}
+_RPC_ACTION_LOCK = threading.Lock()  # actions run one at a time, `list` calls in parallel
+
+def _rpc_error(request_id, code, message):
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+def handle_rpc(request, registry=None):
+    """Run one JSON-RPC 2.0 request object; return the response object."""
+    if not isinstance(request, dict):
+        return _rpc_error(None, -32600, "invalid request")
+    request_id = request.get('id')
+    method = RPC_METHODS.get(request.get('method'))
+    params = request.get('params') or {}
+    if method is None:
+        return _rpc_error(request_id, -32601, f"unknown method {request.get('method')!r}")
+    if not isinstance(params, dict):
+        return _rpc_error(request_id, -32602, "params must be an object")
+    try:
+        if method is rpc_list:
+            result = method(registry, **params)
+        else:
+            with _RPC_ACTION_LOCK:
+                result = method(registry, **params)
+    except TypeError as e:
+        return _rpc_error(request_id, -32602, str(e))
+    except Exception as e:
+        return _rpc_error(request_id, -32000, str(e))
+    return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+def make_rpc_handler(token, registry=None):
+    """HTTP handler class answering JSON-RPC on POST /rpc for clients presenting the token."""
+    expected = f"Bearer {token}".encode()
+
+    class RpcHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive: fleet clients reuse one connection per host
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > 1024 * 1024:
+                self.close_connection = True
+                self._reply(413, _rpc_error(None, -32600, "request too large"))
+                return
+            body = self.rfile.read(length)
+            if self.path != '/rpc':
+                self._reply(404, _rpc_error(None, -32601, "try POST /rpc"))
+            elif not hmac.compare_digest(self.headers.get('Authorization', '').encode(), expected):
+                self._reply(401, _rpc_error(None, -32001, "unauthorized"))
+            else:
+                try:
+                    request = json.loads(body)
+                except ValueError:
+                    self._reply(400, _rpc_error(None, -32700, "parse error"))
+                    return
+                self._reply(200, handle_rpc(request, registry))
+
+        def _reply(self, code, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # fleet views poll every few seconds
+    return RpcHandler
+
+def run_fleet_server(port=None, bind=None, watch=False):
+    """Serve the JSON-RPC API on bind:port until interrupted (port 0 picks a free port)."""
+    port, bind = FLEET_PORT if port is None else port, bind or FLEET_BIND
+    token = fleet_token(create=True)
+    registry = DiscoveryRegistry(BASE_DIR).start() if watch else None
+    server = http.server.ThreadingHTTPServer((bind, port), make_rpc_handler(token, registry))
+    server.daemon_threads = True
+    source = "FLEET_TOKEN" if FLEET_TOKEN else FLEET_TOKEN_FILE
+    port = server.server_address[1]
+    print(f"{C.CYAN}🛰️ Serving fleet RPC on http://{bind}:{port}/rpc (token: {source}). Ctrl+C to stop.{C.RESET}",
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if registry:
+            registry.stop()
+    return 0
+
+class FleetClient:
+    """JSON-RPC client for the `serve` instances of several hosts.
+
+    Each host has one persistent HTTP connection, re-opened once when the server
+    has dropped it (never after a timeout, so an action is not sent twice).
+    call_all() asks every host at the same time.
+    """
+
+    def __init__(self, hosts, token, timeout=FLEET_TIMEOUT):
+        self.hosts = [h if h.rsplit(':', 1)[-1].isdigit() and not h.endswith(']') else f"{h}:{FLEET_PORT}"
+                      for h in hosts]
+        self.timeout = timeout
+        self._headers = {'Content-Type': 'application/json', 'Authorization': f"Bearer {token}"}
+        self._conns = {}
+        self._locks = {host: threading.Lock() for host in self.hosts}
+        self._pool = ThreadPoolExecutor(max_workers=max(1, min(32, len(self.hosts))))
+        self._next_id = 0
+
+    def call(self, host, method, **params):
+        """Run method on host; returns (result, error message)."""
+        with self._locks[host]:
+            self._next_id += 1
+            body = json.dumps({'jsonrpc': '2.0', 'id': self._next_id, 'method': method, 'params': params})
+            for attempt in (1, 2):
+                conn = self._conns.get(host)
+                reused = conn is not None
+                if conn is None:
+                    conn = self._conns[host] = http.client.HTTPConnection(host, timeout=self.timeout)
+                try:
+                    conn.request('POST', '/rpc', body, self._headers)
+                    response = conn.getresponse()
+                    data = response.read()
+                    break
+                except (OSError, http.client.HTTPException) as e:
+                    conn.close()
+                    del self._conns[host]
+                    if not reused or attempt == 2 or isinstance(e, TimeoutError):
+                        return None, str(e) or type(e).__name__
+        if response.status == 401:
+            return None, "unauthorized (check the fleet token)"
+        try:
+            reply = json.loads(data)
+        except ValueError:
+            return None, f"bad reply (HTTP {response.status})"
+        if reply.get('error'):
+            return None, reply['error'].get('message') or 'error'
+        return reply.get('result'), None
+
+    def call_all(self, method, **params):
+        """Run method on every host concurrently; returns {host: (result, error)} in host order."""
+        futures = {host: self._pool.submit(self.call, host, method, **params) for host in self.hosts}
+        return {host: future.result() for host, future in futures.items()}
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        for conn in self._conns.values():
+            conn.close()
+        self._conns.clear()
+
+def fleet_rows(listing):
+    """Merge the `list` replies of all hosts into table rows (host order, bots before sites)."""
+    rows = []
+    for host, (result, error) in listing.items():
+        if error:
+            rows.append({'host': host, 'kind': 'host', 'name': '-', 'error': error})
+            continue
+        for bot in result.get('bots', []):
+            rows.append({'host': host, 'kind': 'bot', 'name': bot['name'], 'item': bot})
+        for site in result.get('sites', []):
+            rows.append({'host': host, 'kind': 'site', 'name': site['name'], 'item': site})
+    return rows
+
+def render_fleet(rows, elapsed=None, first=0, count=None):
+    """Print the merged fleet table (rows[first:first + count]) with a summary line."""
+    term_width = shutil.get_terminal_size().columns
+    title = "🛰️ FLEET 🛰️".center(term_width)
+    print(C.BOLD + gradient_text(title, (190, 160, 255), (245, 215, 190)) + C.RESET)
+    print(f"\n{C.BOLD}  {'#':>5} {'Host':<20} {'Name':<22} {'Kind':<5} Status{C.RESET}")
+    shown = rows[first:first + count] if count is not None else rows
+    for num, row in enumerate(shown, first + 1):
+        if row['kind'] == 'host':
+            status = f"{C.RED}❌ {row['error']}{C.RESET}"
+        elif row['kind'] == 'bot':
+            bot = row['item']
+            if bot['status'] == 'running':
+                status = f"{C.GREEN}🟢 Running{C.RESET}{C.WHITE} {bot.get('info', '')}{C.RESET}"
+            elif bot['status'] == 'restarting':
+                status = f"{C.YELLOW}🟡 Restarting{C.RESET}"
+            else:
+                status = f"{C.RED}🔴 Stopped{C.RESET}{C.YELLOW} {bot.get('info', '')}{C.RESET}"
+        else:
+            status = f"{C.GREEN}🟢 Enabled{C.RESET}" if row['item']['enabled'] else f"{C.RED}🔴 Disabled{C.RESET}"
+        print(f"  {C.YELLOW}{f'[{num}]':>5}{C.RESET} {row['host'][:20]:<20} {row['name'][:22]:<22} {row['kind']:<5} {status}")
+    hosts = {row['host'] for row in rows}
+    down = {row['host'] for row in rows if row['kind'] == 'host'}
+    bots = [row for row in rows if row['kind'] == 'bot']
+    running = sum(1 for row in bots if row['item']['status'] == 'running')
+    sites = sum(1 for row in rows if row['kind'] == 'site')
+    summary = (f"{len(hosts)} hosts ({len(hosts) - len(down)} up), "
+               f"{len(bots)} bots ({running} running), {sites} sites")
+    if count is not None and len(rows) > count:
+        summary += f" | rows {first + 1}-{first + len(shown)} of {len(rows)}"
+    if elapsed is not None:
+        summary += f" | queried in {elapsed * 1000:.0f} ms"
+    print(f"\n  {C.DIM}{summary}{C.RESET}")
+
+def fleet_action(client, row):
+    """Ask what to do with a fleet table row and run it on the row's host over RPC."""
+    print()
+    if row['kind'] == 'bot':
+        bot = row['item']
+        running = bot['status'] != 'stopped'
+        print(f"{C.BOLD}{bot['name']}{C.RESET} on {row['host']}:")
+        print(f"  {C.YELLOW}[1]{C.RESET} {'Stop' if running else 'Start'}")
+        if running:
+            print(f"  {C.YELLOW}[2]{C.RESET} Restart")
+        action = input(f"{C.BOLD}Action (Enter to cancel): {C.RESET}").strip()
+        calls = {'1': ['kill_bot' if running else 'start_bot']}
+        if running:
+            calls['2'] = ['restart_bot']  # one call: the host checks dependencies before stopping
+        for method in calls.get(action, []):
+            _print_rpc_result(row['host'], *client.call(row['host'], method, names=[bot['dir']]))
+    elif row['kind'] == 'site':
+        site = row['item']
+        print(f"{C.BOLD}{site['name']}{C.RESET} on {row['host']}:")
+        print(f"  {C.YELLOW}[1]{C.RESET} {'Disable' if site['enabled'] else 'Enable'}")
+        print(f"  {C.YELLOW}[2]{C.RESET} Reload web server")
+        action = input(f"{C.BOLD}Action (Enter to cancel): {C.RESET}").strip()
+        if action == '1':
+            _print_rpc_result(row['host'], *client.call(row['host'], 'toggle_site_status',
+                                                        name=site['name'], enable=not site['enabled']))
+        elif action == '2':
+            _print_rpc_result(row['host'], *client.call(row['host'], 'reload_web_server'))
+    else:
+        print(f"{C.RED}❌ {row['host']} is unreachable: {row['error']}{C.RESET}")
+
+def _print_rpc_result(host, result, error):
+    if error:
+        print(f"{C.RED}❌ {host}: {error}{C.RESET}")
+        return
+    for r in result.get('results', []):
+        if r['ok']:
+            print(f"{C.GREEN}✅ {host}: '{r['name']}' {r.get('note') or 'done'}.{C.RESET}")
+        else:
+            print(f"{C.RED}❌ {host}: '{r['name']}': {r.get('error')}{C.RESET}")
+    for name in result.get('missing', []):
+        print(f"{C.RED}❌ {host}: '{name}' not found.{C.RESET}")
+    if result.get('error'):
+        print(f"{C.RED}❌ {host}: {result['error']}{C.RESET}")
+
+def _fleet_refresh(client, events, stop, kick, interval):
+    """Refresher thread of fleet_view: query all hosts every interval seconds (or when kicked)."""
+    while not stop.is_set():
+        started = time.monotonic()
+        listing = client.call_all('list')
+        events.put((fleet_rows(listing), time.monotonic() - started))
+        kick.wait(interval)
+        kick.clear()
+
+def fleet_view(client, interval=FLEET_REFRESH_INTERVAL):
+    """Auto-refreshing merged table of all hosts; item number opens the row's actions."""
+    events = queue.Queue()
+    stop, kick = threading.Event(), threading.Event()
+    threading.Thread(target=_fleet_refresh, args=(client, events, stop, kick, interval), daemon=True).start()
+    rows, elapsed = None, None
+    first = 0
+    prompt = "Row number, [n]/[p] page, [r] refresh, [q] quit: "
+    fd = sys.stdin.fileno()
+    try:
+        while True:
+            choice, typed, dirty = None, '', True
+            SCREEN.invalidate()
+            with raw_input_mode():
+                while choice is None:
+                    if dirty:
+                        page = max(5, shutil.get_terminal_size().lines - 8)
+                        frame = io.StringIO()
+                        with contextlib.redirect_stdout(frame):
+                            if rows is None:
+                                print(f"{C.CYAN}Querying {len(client.hosts)} hosts...{C.RESET}")
+                            else:
+                                first = min(first, max(0, len(rows) - 1) // page * page)
+                                render_fleet(rows, elapsed, first, page)
+                        SCREEN.draw(frame.getvalue() + f"{C.BOLD}{prompt}{C.RESET}{typed}")
+                        dirty = False
+                    if select.select([fd], [], [], 0.05)[0]:
+                        keys = os.read(fd, 64).decode(errors='ignore')
+                        if not keys:
+                            raise EOFError
+                        for key in keys:
+                            if key == '\x1b':
+                                typed = ''
+                                break
+                            if not typed and key in 'npqr':
+                                if key == 'q':
+                                    return 0
+                                if key == 'r':
+                                    kick.set()
+                                elif rows:
+                                    first = max(0, first + (page if key == 'n' else -page))
+                                    first = min(first, max(0, len(rows) - 1) // page * page)
+                                continue
+                            choice, typed = _live_key(key, typed, len(rows or ()))
+                            if choice:
+                                print(key.strip())
+                                break
+                        dirty = True
+                    try:
+                        rows, elapsed = events.get_nowait()
+                        dirty = True
+                    except queue.Empty:
+                        pass
+            if choice.isdigit() and 1 <= int(choice) <= len(rows or ()):
+                fleet_action(client, rows[int(choice) - 1])
+                kick.set()
+            else:
+                print(f"{C.RED}❌ Invalid input.{C.RESET}")
+            pause_after_action()
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        stop.set()
+        kick.set()
+
+def _probe_bot_dir(dirpath):
+    """Detect a bot in a single folder (one directory listing), or None."""
+    try:
+        return _scan_directory(dirpath, os.stat(dirpath).st_mtime_ns)['bot']
+    except OSError:
+        return None
+
+def _inside_dir(path, root):
+    """True if the real path of path is root or lies below it."""
+    path, root = os.path.realpath(path), os.path.realpath(root)
+    return os.path.commonpath([path, root]) == root
+
+def find_bots(names, start_dir=None):
+    """Resolve bot names (or bot folder paths) without walking the whole tree.
+
+    Names are looked up in the discovery index and only the matching folders are
+    re-checked; the (index-assisted) walk runs only for names the index does not
+    know. Folder paths outside start_dir are never accepted. Returns (bots, missing names).
+    """
+    start_dir = start_dir or BASE_DIR
+    by_name = {}
+    for dirpath, entry in load_discovery_index(start_dir)['dirs'].items():
+        if entry.get('bot'):
+            by_name.setdefault(entry['bot']['name'], []).append(dirpath)
+
+    found, unresolved = {}, []
+    for name in names:
+        if os.sep in name:
+            path = os.path.abspath(name)
+            bot = _probe_bot_dir(path) if _inside_dir(path, start_dir) else None
+            bots = [bot] if bot else []
+        else:
+            bots = [b for b in map(_probe_bot_dir, by_name.get(name, ())) if b and b['name'] == name]
+        if bots:
+            found.update((b['dir'], b) for b in bots)
+        else:
+            unresolved.append(name)
+
+    missing = []
+    if unresolved:
+        all_bots = discover_bots_recursive(start_dir)
+        for name in unresolved:
+            bots = [b for b in all_bots if b['name'] == name]
+            if bots:
+                found.update((b['dir'], b) for b in bots)
+            else:
+                missing.append(name)
+    return list(found.values()), missing
+
+def find_sites(names, web_server):
+    """Resolve site names (domain or config file name) of the active web server."""
+    if not web_server.get('service'):
+        return [], list(names)
+    sites = discover_sites(web_server)
+    found, missing = [], []
+    for name in names:
+        matches = [s for s in sites if name in (s['name'], s.get('config'))]
+        found.extend(m for m in matches if m not in found)
+        if not matches:
+            missing.append(name)
+    return update_sites_status(found, web_server), missing
+
+def bot_summary(bot):
+    """JSON-friendly description of a bot with its status."""
+    if '🟡' in bot.get('status', ''):
+        status = 'restarting'
+    else:
+        status = 'running' if bot.get('pid') else 'stopped'
+    return {
+        'name': bot['name'],
+        'dir': bot['dir'],
+        'type': bot['type'],
+        'script': bot['script'],
+        'venv': bool(bot.get('python_executable')),
+        'status': status,
+        'pid': bot.get('pid'),
+        'pids': bot.get('pids') or [],
+        'create_time': bot.get('create_time'),
+        'supervised': bool(bot.get('supervised')),
+    }
+
+def site_summary(site):
+    """JSON-friendly description of a site."""
+    return {
+        'name': site['name'],
+        'config': site.get('config'),
+        'dir': site.get('dir'),
+        'type': site.get('type'),
+        'server': site.get('server'),
+        'enabled': '🟢' in site.get('status', ''),
+    }
+
+def _bots_with_status(bots):
+    supervised = (supervisor_request({'cmd': 'status'}) or {}).get('bots')
+    return update_bots_status(bots, load_state(), supervised)
+
+def _print_bots(bots):
+    for bot in bots:
+        status_color = C.GREEN if '🟢' in bot['status'] else C.RED
+        print(f"{bot['name']:<20} {bot['type']:<7} {status_color}{bot['status']}{C.RESET}{bot['time_info']}")
+
+def cmd_list(args):
+    result = {}
+    if not args.sites:
+        bots = discover_bots_recursive(BASE_DIR)
+        if args.pattern:
+            bots = [b for b in bots if fnmatch.fnmatch(b['name'], args.pattern)]
+        if args.type:
+            bots = [b for b in bots if b['type'] == args.type]
+        bots = _bots_with_status(bots)
+        if args.running or args.stopped:
+            bots = [b for b in bots if bool(b.get('pid')) == bool(args.running)]
+        result['bots'] = bots
+    if not args.bots:
+        web_server = get_web_server_status()
+        sites = discover_sites(web_server)
+        if args.pattern:
+            sites = [s for s in sites if fnmatch.fnmatch(s['name'], args.pattern)]
+        result['sites'] = update_sites_status(sites, web_server)
+        result['web_server'] = web_server
+
+    if args.json:
+        return {
+            key: [bot_summary(b) for b in value] if key == 'bots' else
+                 [site_summary(s) for s in value] if key == 'sites' else
+                 {'name': value['name'], 'service': value['service'], 'active': '🟢' in value['status']}
+            for key, value in result.items()
+        }, 0
+    if 'bots' in result:
+        _print_bots(result['bots'])
+    for site in result.get('sites', []):
+        status_color = C.GREEN if '🟢' in site.get('status', '') else C.RED
+        print(f"{site['name']:<20} {'site':<7} {status_color}{site.get('status', '')}{C.RESET}")
+    return None, 0
+
+def cmd_status(args):
+    if args.names:
+        bots, missing = find_bots(args.names)
+    else:
+        bots, missing = discover_bots_recursive(BASE_DIR), []
+    bots = _bots_with_status(bots)
+    if args.json:
+        return {'bots': [bot_summary(b) for b in bots], 'missing': missing}, 1 if missing else 0
+    _print_bots(bots)
+    for name in missing:
+        print(f"{C.RED}❌ Bot '{name}' not found.{C.RESET}")
+    return None, 1 if missing else 0
+
+def cmd_start(args, found=None):
+    bots, missing = found or find_bots(args.names)
+    bots = _bots_with_status(bots)
+    preflight_bots([bot for bot in bots if not bot.get('pid')])  # one check and cache write for the batch
+    results = []
+    for bot in bots:
+        if bot.get('pid'):
+            results.append({'name': bot['name'], 'ok': False, 'pid': bot['pid'], 'error': 'already running'})
+            continue
+        pid = start_bot(bot, logging_enabled=not args.no_log, verbose=not args.json)
+        results.append({'name': bot['name'], 'ok': pid is not None, 'pid': pid,
+                        'error': None if pid else 'start failed'})
+    return _action_result(args, results, missing)
+
+def cmd_stop(args, found=None):
+    if args.all:
+        bots, missing = discover_bots_recursive(BASE_DIR), []
+    else:
+        bots, missing = found or find_bots(args.names)
+    bots = _bots_with_status(bots)
+    results = stop_bots(bots, timeout=args.timeout)
+    if not args.all:
+        results += [{'name': b['name'], 'ok': True, 'pid': None, 'error': None, 'note': 'not running'}
+                    for b in bots if not b.get('pid')]
+    return _action_result(args, results, missing)
+
+def cmd_restart(args, found=None):
+    if args.all:
+        bots, missing = discover_bots_recursive(BASE_DIR), []
+    else:
+        bots, missing = found or find_bots(args.names)
+    bots = _bots_with_status(bots)
+    if args.all:
+        bots = [b for b in bots if b.get('pid')]
+    started_at = time.monotonic()
+    results = restart_bots(bots, logging_enabled=not args.no_log)
+    if not args.json and results:
+        print_restart_report(results, time.monotonic() - started_at)
+        results = []
+    return _action_result(args, results, missing)
+
+def cmd_site(args):
+    web_server = get_web_server_status()
+    if not web_server.get('service'):
+        return _action_result(args, [], [], error='web server not detected')
+    sites, missing = find_sites(args.names, web_server)
+    if missing or not sites:
+        return _action_result(args, [], missing)
+    enable = args.action == 'enable'
+    batch = apply_site_changes([(site, enable) for site in sites], web_server, reload=not args.no_reload)
+    results = [{'name': site['name'], 'config': site['config'], 'ok': batch['ok'] or not batch['error'],
+                'changed': site['config'] in batch['changed'],
+                'error': batch['error']} for site in sites]
+    if batch['changed'] and not args.no_reload:
+        results.append({'name': web_server['service'], 'ok': batch['reloaded'], 'note': 'reload'})
+    error = None
+    if batch['error']:
+        error = batch['error'] + (' (rolled back)' if batch['rolled_back'] else '')
+    return _action_result(args, results, missing, error=error)
+
+def cmd_reload(args):
+    web_server = get_web_server_status()
+    if not web_server.get('service'):
+        return _action_result(args, [], [], error='web server not detected')
+    ok = reload_web_server(web_server)
+    return _action_result(args, [{'name': web_server['service'], 'ok': bool(ok), 'note': 'reload'}], [])
+
+def _action_result(args, results, missing, error=None):
+    """Common (payload, exit code) of action commands; prints a summary in text mode."""
+    ok = not error and not missing and all(r['ok'] for r in results)
+    if args.json:
+        payload = {'ok': ok, 'results': results, 'missing': missing}
+        if error:
+            payload['error'] = error
+        return payload, 0 if ok else 1
+    for r in results:
+        if not r['ok']:
+            print(f"{C.RED}❌ '{r['name']}': {r.get('error')}{C.RESET}")
+        elif r.get('note') and r['note'] != 'reload':
+            print(f"{C.YELLOW}⚠️ '{r['name']}': {r['note']}{C.RESET}")
+    for name in missing:
+        print(f"{C.RED}❌ '{name}' not found.{C.RESET}")
+    if error:
+        print(f"{C.RED}❌ {error}{C.RESET}")
+    return None, 0 if ok else 1
+
+def cmd_health(args):
+    web_server = get_web_server_status()
+    if not web_server.get('service'):
+        # probing does not need a running server we manage, only its site configs
+        for service in ('nginx', 'apache2'):
+            if os.path.isdir(f'/etc/{service}/sites-available'):
+                web_server = {'name': service, 'service': service, 'status': ''}
+                break
+    if args.names:
+        sites, missing = find_sites(args.names, web_server)
+    else:
+        sites, missing = [s for s in update_sites_status(discover_sites(web_server), web_server)
+                          if '🟢' in s.get('status', '')], []
+    prober = HealthProber(address=args.address, port=args.port, path=args.path,
+                          method=args.method, timeout=args.timeout, history=max(1, args.rounds))
+
+    async def run_rounds():
+        for _ in range(max(1, args.rounds)):
+            await prober.probe_round(sites)
+        for target in list(prober._pool):
+            prober._discard(target)
+    if sites:
+        asyncio.run(run_rounds())
+
+    results = []
+    for site in sites:
+        scheme, address, port, host = site_probe_target(site, args.address, args.port)
+        summary = prober.summary(site['name']) or {}
+        results.append(dict(summary, name=site['name'], url=f"{scheme}://{host}:{port}{args.path}", address=address))
+    ok = not missing and all(r.get('code') and r['code'] < 500 for r in results)
+    if args.json:
+        return {'ok': ok, 'results': results, 'missing': missing}, 0 if ok else 1
+    print(f"{C.BOLD}{'Site':<30} {'Code':>5} {'p50':>8} {'p95':>8} {'OK':>5}  URL{C.RESET}")
+    for r in results:
+        latency = (f"{r['p50_ms']:>6.1f}ms {r['p95_ms']:>6.1f}ms" if r.get('p50_ms') is not None
+                   else f"{'-':>8} {'-':>8}")
+        color = C.GREEN if r.get('code') and r['code'] < 400 else C.YELLOW if r.get('code') and r['code'] < 500 else C.RED
+        code = r.get('code') or '✗'
+        print(f"{r['name']:<30} {color}{code:>5}{C.RESET} {latency} {r.get('ok_ratio', 0) * 100:>4.0f}%  {r['url']}"
+              + (f"  {C.RED}{r['error']}{C.RESET}" if r.get('error') else ""))
+    for name in missing:
+        print(f"{C.RED}❌ '{name}' not found.{C.RESET}")
+    return None, 0 if ok else 1
+
+def cmd_traffic(args):
+    web_server = get_web_server_status()
+    if args.names:
+        sites, missing = find_sites(args.names, web_server)
+    else:
+        sites, missing = discover_sites(web_server), []
+    report, read, elapsed = traffic_report(sites, top=args.top)
+    if args.json:
+        return {'sites': report, 'bytes_read': read, 'missing': missing}, 1 if missing else 0
+    print_traffic_report(report, read, elapsed)
+    for name in missing:
+        print(f"{C.RED}❌ '{name}' not found.{C.RESET}")
+    return None, 1 if missing else 0
+
+def _legacy_web_server_status():
+    """Pre-cache probe for comparison: which + systemctl is-active for every server."""
+    for service, name in WebServerProbe.SERVERS:
+        shutil.which(service)
+        if systemctl_is_active(service):
+            return {'name': name, 'service': service, 'status': '🟢 Active'}
+    return {'name': 'Nginx/Apache', 'service': None, 'status': '🔴 Not found'}
+
+def cmd_bench(args):
+    """Time one panel refresh step by step (mean / best over several rounds)."""
+    bots = discover_bots_recursive(BASE_DIR)
+    state = load_state()
+    steps = [
+        ('web server: which + systemctl (old)', _legacy_web_server_status),
+        ('web server: PID file probe', lambda: WEB_SERVER_PROBE.status(force=True)),
+        ('web server: cached probe', WEB_SERVER_PROBE.status),
+        ('bot discovery (index)', lambda: discover_bots_recursive(BASE_DIR)),
+        ('bot status', lambda: update_bots_status([dict(b) for b in bots], state)),
+    ]
+    results = []
+    for label, step in steps:
+        timings = []
+        for _ in range(args.rounds):
+            t0 = time.perf_counter()
+            step()
+            timings.append((time.perf_counter() - t0) * 1000)
+        results.append({'step': label, 'mean_ms': sum(timings) / len(timings), 'best_ms': min(timings)})
+    if args.json:
+        return {'rounds': args.rounds, 'systemctl': bool(shutil.which('systemctl')), 'results': results}, 0
+    print(f"{C.BOLD}{'Step':<38} {'mean':>9} {'best':>9}{C.RESET}")
+    for r in results:
+        print(f"{r['step']:<38} {r['mean_ms']:>7.2f}ms {r['best_ms']:>7.2f}ms")
+    if not shutil.which('systemctl'):
+        print(f"{C.YELLOW}⚠️ systemctl not found: the old probe could not fork it here.{C.RESET}")
+    return None, 0
+
+def cmd_preflight(args):
+    if args.names:
+        bots, missing = find_bots(args.names)
+    else:
+        bots, missing = discover_bots_recursive(BASE_DIR), []
+    started = time.monotonic()
+    preflight_bots(bots, force=True)
+    elapsed = time.monotonic() - started
+    ok = not missing and all(b['preflight']['ok'] for b in bots)
+    if args.json:
+        return {'ok': ok, 'bots': [dict(b['preflight'], name=b['name'], dir=b['dir']) for b in bots],
+                'missing': missing}, 0 if ok else 1
+    for bot in bots:
+        report = bot['preflight']
+        if not report['ok']:
+            verdict = f"{C.RED}❌ {preflight_summary(report, limit=10)}{C.RESET}"
+        elif report['manifest']:
+            verdict = f"{C.GREEN}✅ {report['checked']} dependencies OK{C.RESET}"
+        else:
+            verdict = f"{C.DIM}- no requirements.txt / package.json{C.RESET}"
+        print(f"{bot['name']:<20} {bot['type']:<7} {report['manifest'] or '-':<17} {verdict}")
+    for name in missing:
+        print(f"{C.RED}❌ Bot '{name}' not found.{C.RESET}")
+    print(f"{C.DIM}Checked {len(bots)} bots in {elapsed * 1000:.0f} ms.{C.RESET}")
+    return None, 0 if ok else 1
+
+def cmd_fleet(args):
+    token = args.token or fleet_token()
+    if not token:
+        return _action_result(args, [], [], error=f"no fleet token: set FLEET_TOKEN or copy {FLEET_TOKEN_FILE}")
+    client = FleetClient(args.hosts or FLEET_HOSTS, token, timeout=args.timeout)
+    if not client.hosts:
+        client.close()
+        return _action_result(args, [], [], error="no hosts: pass --hosts or set FLEET_HOSTS")
+    started = time.monotonic()
+    try:
+        if not args.json and sys.stdin.isatty() and sys.stdout.isatty():
+            return None, fleet_view(client, args.refresh)
+        listing = client.call_all('list')
+    finally:
+        client.close()
+    ok = all(error is None for _, error in listing.values())
+    if args.json:
+        return {'ok': ok, 'hosts': {host: dict(result or {}, error=error) for host, (result, error) in listing.items()}}, \
+            0 if ok else 1
+    render_fleet(fleet_rows(listing), time.monotonic() - started)
+    return None, 0 if ok else 1
+
+CLI_COMMANDS = {
+    'list': cmd_list,
+    'status': cmd_status,
+    'start': cmd_start,
+    'stop': cmd_stop,
+    'restart': cmd_restart,
+    'site': cmd_site,
+    'reload': cmd_reload,
+    'bench': cmd_bench,
+    'health': cmd_health,
+    'traffic': cmd_traffic,
+    'fleet': cmd_fleet,
+    'preflight': cmd_preflight,
+}
+
+def run_cli(args):
+    """Run a non-interactive command; returns the process exit code."""
+    if args.json:
+        # keep stdout clean for the JSON document, progress/errors go to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            payload, code = CLI_COMMANDS[args.command](args)
+        print(json.dumps(payload, indent=2, ensure_ascii=False))
+        return code
+    _, code = CLI_COMMANDS[args.command](args)
+    return code
+
+def build_arg_parser():
+    """Command line options."""
+    parser = argparse.ArgumentParser(description="Universal bot & site manager panel.")
+    parser.add_argument('--watch', action='store_true', default=WATCH_MODE,
+                        help="keep bots/sites in a live registry updated by inotify (polling fallback)")
+    parser.add_argument('--health', action='store_true', default=HEALTH_CHECKS,
+                        help="probe enabled sites over HTTP in the background and show p50/p95 latency")
+    parser.add_argument('--live', action='store_true', default=LIVE_MODE,
+                        help="auto-refreshing dashboard with single-keystroke commands")
+    parser.add_argument('--refresh', type=float, default=LIVE_REFRESH_INTERVAL, metavar='SECONDS',
+                        help="refresh interval of --live (default: %(default)s)")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT, metavar='PORT',
+                        help="serve Prometheus metrics on PORT instead of the interactive panel")
+    parser.add_argument('--metrics-bind', default=METRICS_BIND, metavar='ADDR',
+                        help="address for --metrics-port (default: %(default)s)")
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('daemon', help="run the supervisor that owns bot processes and restarts crashed bots")
+    ship = commands.add_parser('ship-logs', help="(internal) copy stdin into a rotating, compressed bot log")
+    ship.add_argument('log_file')
+    ship.add_argument('--no-rotate', action='store_true', help="append to the current log instead of rotating it")
+    ship.add_argument('--detach', action='store_true', help="fork into the background and exit at once")
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--json', action='store_true', help="print machine-readable JSON")
+    listing = commands.add_parser('list', parents=[common], help="list bots and sites")
+    listing.add_argument('pattern', nargs='?', help="only names matching this shell pattern")
+    only = listing.add_mutually_exclusive_group()
+    only.add_argument('--bots', action='store_true', help="only bots (no web server lookups)")
+    only.add_argument('--sites', action='store_true', help="only sites (no bot discovery)")
+    listing.add_argument('--type', choices=['python', 'nodejs'], help="only bots of this type")
+    running = listing.add_mutually_exclusive_group()
+    running.add_argument('--running', action='store_true', help="only running bots")
+    running.add_argument('--stopped', action='store_true', help="only stopped bots")
+    status = commands.add_parser('status', parents=[common], help="status of the given bots (all if none)")
+    status.add_argument('names', nargs='*', metavar='bot', help="bot name or folder path")
+    start = commands.add_parser('start', parents=[common], help="start bots")
+    start.add_argument('names', nargs='+', metavar='bot')
+    start.add_argument('--no-log', action='store_true', help="discard bot output instead of logging it")
+    stop = commands.add_parser('stop', parents=[common], help="stop bots")
+    stop.add_argument('names', nargs='*', metavar='bot')
+    stop.add_argument('--all', action='store_true', help="stop every running bot")
+    stop.add_argument('--timeout', type=float, default=STOP_TIMEOUT, help="seconds before SIGKILL")
+    restart = commands.add_parser('restart', parents=[common], help="restart bots")
+    restart.add_argument('names', nargs='*', metavar='bot')
+    restart.add_argument('--all', action='store_true', help="restart every running bot")
+    restart.add_argument('--no-log', action='store_true', help="discard bot output instead of logging it")
+    site = commands.add_parser('site', parents=[common], help="enable or disable sites")
+    site.add_argument('action', choices=['enable', 'disable'])
+    site.add_argument('names', nargs='+', metavar='site', help="domain or config file name")
+    site.add_argument('--no-reload', action='store_true', help="do not reload the web server afterwards")
+    commands.add_parser('reload', parents=[common], help="soft reload the web server")
+    health = commands.add_parser('health', parents=[common], help="probe sites over HTTP(S) and report latency")
+    health.add_argument('names', nargs='*', metavar='site', help="domain or config file name (default: enabled sites)")
+    health.add_argument('--rounds', type=int, default=3)
+    health.add_argument('--address', default=HEALTH_ADDRESS, help="address to connect to (default: %(default)s)")
+    health.add_argument('--port', type=int, help="override the port taken from the site config")
+    health.add_argument('--path', default=HEALTH_PATH)
+    health.add_argument('--method', default=HEALTH_METHOD, choices=['HEAD', 'GET'])
+    health.add_argument('--timeout', type=float, default=HEALTH_TIMEOUT)
+    traffic = commands.add_parser('traffic', parents=[common], help="requests, status codes and top paths per site")
+    traffic.add_argument('names', nargs='*', metavar='site', help="domain or config file name (default: all sites)")
+    traffic.add_argument('--top', type=int, default=5, help="number of top paths to show")
+    bench = commands.add_parser('bench', parents=[common], help="time the steps of a status refresh")
+    bench.add_argument('--rounds', type=int, default=20)
+    preflight = commands.add_parser('preflight', parents=[common],
+                                    help="check requirements.txt / package.json against the installed packages")
+    preflight.add_argument('names', nargs='*', metavar='bot', help="bot name or folder path (default: all bots)")
+    serve = commands.add_parser('serve', help="expose bots / sites / actions to `fleet` over JSON-RPC")
+    serve.add_argument('--port', type=int, default=FLEET_PORT, help="listen port, 0 = any free port (default: %(default)s)")
+    serve.add_argument('--bind', default=FLEET_BIND, metavar='ADDR', help="listen address (default: %(default)s)")
+    fleet = commands.add_parser('fleet', parents=[common], help="bots and sites of all FLEET_HOSTS in one table")
+    fleet.add_argument('--hosts', type=lambda v: [h for h in v.split(',') if h], metavar='HOST[:PORT],...',
+                       help="hosts running `serve` (default: FLEET_HOSTS)")
+    fleet.add_argument('--token', help="fleet token (default: FLEET_TOKEN / FLEET_TOKEN_FILE)")
+    fleet.add_argument('--timeout', type=float, default=FLEET_TIMEOUT)
+    fleet.add_argument('--refresh', type=float, default=FLEET_REFRESH_INTERVAL, metavar='SECONDS')
+    return parser
+
+def main(argv=None):
     """Main program loop."""
+    args = build_arg_parser().parse_args(argv)
+    if args.command == 'daemon':
+        sys.exit(run_daemon())
+    if args.command == 'serve':
+        sys.exit(run_fleet_server(args.port, args.bind, watch=args.watch))
+    if args.command == 'ship-logs':
+        sys.exit(run_log_shipper(args.log_file, rotate=not args.no_rotate, detach=args.detach))
+    if args.command in CLI_COMMANDS:
+        if args.command in ('stop', 'restart') and not args.all and not args.names:
+            build_arg_parser().error(f"{args.command}: give bot names or --all")
+        sys.exit(run_cli(args))
+    if args.metrics_port:
+        sys.exit(run_metrics_exporter(args.metrics_port, args.metrics_bind, watch=args.watch))
     initial_setup()
+
+    registry = DiscoveryRegistry(BASE_DIR).start() if args.watch else None
+    metrics = MetricsSampler().start() if METRICS_ENABLED else None
+    health = HealthProber().start() if args.health else None
+    menu = functools.partial(live_menu, interval=args.refresh) if args.live else staged_menu
+    
+    view = load_panel_cache() or {
+        'bots': [], 'sites': [], 'web_server': {'name': 'Nginx/Apache', 'service': None, 'status': '⏳ Checking...'},
+    }
     
     while True:
         try:
-            state_data = load_state()
-            web_server_info = get_web_server_status()
-            all_bots, all_sites = discover_all_bots_and_sites(web_server_info)
-            bots_with_status = update_bots_status(all_bots, state_data)
-            sites_with_status = update_sites_status(all_sites, web_server_info)
-            choice = display_menu(bots_with_status, sites_with_status, web_server_info)
+            choice, view = menu(view, registry, metrics, health)
+            save_panel_cache(view)
+            bots_with_status, sites_with_status, web_server_info = view['bots'], view['sites'], view['web_server']
+            if health:
+                health.set_sites([s for s in sites_with_status if '🟢' in s.get('status', '')])
             if choice is None:
                 break
 
@@ -763,16 +5873,39 @@ def main():
                 sys.exit(0)
             elif choice == 'r':
                 print(f"\n{C.YELLOW}🔄 Restarting all active bots...{C.RESET}\n")
-                restarted_any = any(
-                    kill_bot(b['pid'], b['name'], b['dir'])
-                    and (time.sleep(1) or True)
-                    and start_bot(b, logging_enabled=False) is None
-                    for b in bots_with_status if b['pid']
-                )
-                if not restarted_any:
+                active_bots = [b for b in bots_with_status if b['pid']]
+                if active_bots:
+                    started_at = time.monotonic()
+                    results = restart_bots(active_bots, logging_enabled=False)
+                    print_restart_report(results, time.monotonic() - started_at)
+                else:
                     print("There were no active bots to restart.")
+            elif choice == 'x':
+                active_bots = [b for b in bots_with_status if b['pid']]
+                if active_bots:
+                    print(f"\n{C.YELLOW}🔴 Stopping all active bots...{C.RESET}\n")
+                    for r in stop_bots(active_bots):
+                        if r['ok']:
+                            forced = " (killed after timeout)" if r['killed'] else ""
+                            print(f"{C.GREEN}✅ '{r['name']}' stopped in {r['stop_sec']:.2f}s{forced}.{C.RESET}")
+                        else:
+                            print(f"{C.RED}❌ '{r['name']}': {r['error']}{C.RESET}")
+                else:
+                    print("There were no active bots to stop.")
+            elif choice == 'f':
+                search_logs_menu(bots_with_status)
+                continue
+            elif choice == 'e' and sites_with_status and web_server_info.get('service') in ('nginx', 'apache2'):
+                bulk_sites_menu(sites_with_status, web_server_info)
+            elif choice == 't' and sites_with_status and web_server_info.get('service') in ('nginx', 'apache2'):
+                clear_screen()
+                print_traffic_report(*traffic_report(sites_with_status))
+                input(f"\n{C.BOLD}Press Enter to return...{C.RESET}")
+                continue
             elif choice == 's' and web_server_info and web_server_info['service']:
                 reload_web_server(web_server_info)
+            elif MENU_PAGER.command(choice):
+                continue
             elif choice.isdigit():
                 choice_num = int(choice)
                 total_bots = len(bots_with_status)
@@ -786,7 +5919,7 @@ def main():
                     print(f"{C.RED}❌ Invalid number.{C.RESET}")
             else:
                 print(f"{C.RED}❌ Invalid input.{C.RESET}")
-            time.sleep(2)
+            pause_after_action()
         except KeyboardInterrupt:
             clear_screen()
             print(f"\n{C.CYAN}Exiting...{C.RESET}")
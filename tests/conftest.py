@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# the module keeps its state/cache files in ~: point HOME at a scratch dir before importing it
+os.environ['HOME'] = tempfile.mkdtemp(prefix='manager-tests-')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
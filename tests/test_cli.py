@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import manager_eu
+
+BOT = "import time\nwhile True:\n    time.sleep(1)\n"
+
+# every subcommand with --json, and the exit codes it may return in a scratch tree
+# (no web server, no fleet hosts)
+COMMANDS = [
+    (['list'], {0}),
+    (['list', '--bots', '--stopped'], {0}),
+    (['status'], {0}),
+    (['status', 'alpha', 'nosuchbot'], {1}),
+    (['preflight'], {0, 1}),
+    (['bench', '--rounds', '1'], {0}),
+    (['health'], {0}),
+    (['traffic'], {0}),
+    (['site', 'enable', 'example.com'], {1}),
+    (['reload'], {1}),
+    (['fleet', '--hosts', '127.0.0.1:1'], {1}),
+]
+
+
+@pytest.fixture(scope='module')
+def tree(tmp_path_factory):
+    root = tmp_path_factory.mktemp('cli')
+    (root / 'home').mkdir()
+    (root / 'alpha').mkdir()
+    (root / 'alpha' / 'main.py').write_text(BOT)
+    (root / 'alpha' / 'requirements.txt').write_text('requests>=2\n')
+    shutil.copy(manager_eu.__file__, root / 'manager.py')
+    yield root
+    run(root, 'stop', '--all')
+
+
+def run(root, *argv):
+    """Run the manager copied into root with --json; returns (exit code, parsed output)."""
+    result = subprocess.run([sys.executable, str(root / 'manager.py'), *argv, '--json'],
+                            cwd=root, capture_output=True, text=True, timeout=60,
+                            env=dict(os.environ, HOME=str(root / 'home')))
+    assert 'Traceback' not in result.stderr, result.stderr
+    return result.returncode, json.loads(result.stdout)
+
+
+def test_every_json_command_is_covered():
+    subparsers = manager_eu.build_arg_parser()._subparsers._group_actions[0].choices
+    with_json = {name for name, parser in subparsers.items()
+                 if any('--json' in action.option_strings for action in parser._actions)}
+    assert with_json == {argv[0] for argv, _ in COMMANDS} | {'start', 'stop', 'restart'}
+
+
+@pytest.mark.parametrize('argv, codes', COMMANDS, ids=[' '.join(argv) for argv, _ in COMMANDS])
+def test_json_command(tree, argv, codes):
+    code, payload = run(tree, *argv)
+    assert code in codes
+    assert isinstance(payload, dict)
+
+
+def test_bot_lifecycle(tree):
+    code, payload = run(tree, 'start', 'alpha')
+    assert code == 0 and payload['results'][0]['pid']
+    code, payload = run(tree, 'status', 'alpha')
+    assert payload['bots'][0]['status'] == 'running'
+    code, payload = run(tree, 'restart', 'alpha')
+    assert code == 0 and payload['ok']
+    code, payload = run(tree, 'stop', 'alpha')
+    assert code == 0 and payload['results'][0]['ok']
+    code, payload = run(tree, 'status', 'alpha')
+    assert payload['bots'][0]['status'] == 'stopped'
+    code, payload = run(tree, 'stop', '--all')
+    assert code == 0 and payload['ok']
+
+
+def test_bot_started_outside_the_panel_is_found(tree):
+    run(tree, 'start', 'alpha')
+    run(tree, 'stop', 'alpha')
+    manual = subprocess.Popen([sys.executable, 'main.py'], cwd=tree / 'alpha', start_new_session=True)
+    try:
+        code, payload = run(tree, 'status', 'alpha')
+        assert payload['bots'][0]['status'] == 'running'
+        assert payload['bots'][0]['pid'] == manual.pid
+        code, payload = run(tree, 'start', 'alpha')
+        assert payload['results'][0]['error'] == 'already running'
+    finally:
+        manual.kill()
+        manual.wait()
+
+
+def test_restart_keeps_bot_whose_dependencies_block_start(tmp_path):
+    (tmp_path / 'home').mkdir()
+    (tmp_path / 'gamma').mkdir()
+    (tmp_path / 'gamma' / 'main.py').write_text(BOT)
+    (tmp_path / 'gamma' / 'requirements.txt').write_text('no-such-dist-for-tests>=1\n')
+    source = open(manager_eu.__file__).read()
+    assert 'PREFLIGHT_BLOCK_START = False' in source
+    (tmp_path / 'manager.py').write_text(source.replace('PREFLIGHT_BLOCK_START = False', 'PREFLIGHT_BLOCK_START = True'))
+    manual = subprocess.Popen([sys.executable, 'main.py'], cwd=tmp_path / 'gamma', start_new_session=True)
+    try:
+        code, payload = run(tmp_path, 'restart', 'gamma')
+        assert code == 1 and payload['results'][0]['error'] == 'dependencies'
+        assert manual.poll() is None
+        code, payload = run(tmp_path, 'status', 'gamma')
+        assert payload['bots'][0]['pid'] == manual.pid
+    finally:
+        manual.kill()
+        manual.wait()
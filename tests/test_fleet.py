@@ -0,0 +1,153 @@
+import argparse
+import http.client
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+
+import psutil
+import pytest
+
+import manager_eu
+
+MODULE = manager_eu.__file__
+TOKEN = 'test-fleet-token'
+BOT = "import time\nwhile True:\n    time.sleep(1)\n"
+
+
+def bot_cwds():
+    cwds = set()
+    for proc in psutil.process_iter():
+        try:
+            cwds.add(proc.cwd())
+        except psutil.Error:
+            continue
+    return cwds
+
+
+def start_server(root, bots):
+    """A copy of the manager in root (its BASE_DIR) with the given bot folders, serving on a free port."""
+    home = root / 'home'
+    home.mkdir(parents=True)
+    (home / '.manager_fleet_token').write_text(TOKEN + '\n')
+    for name in bots:
+        (root / name).mkdir()
+        (root / name / 'main.py').write_text(BOT)
+    script = root / 'manager.py'
+    shutil.copy(MODULE, script)
+    proc = subprocess.Popen([sys.executable, '-u', str(script), 'serve', '--port', '0'],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                            env=dict(os.environ, HOME=str(home)))
+    line = proc.stdout.readline()
+    match = re.search(r':(\d+)/rpc', line)
+    if not match:
+        proc.kill()
+        pytest.fail(f"serve did not start: {line}{proc.stdout.read()}")
+    return proc, f"127.0.0.1:{match.group(1)}"
+
+
+@pytest.fixture(scope='module')
+def fleet(tmp_path_factory):
+    root = tmp_path_factory.mktemp('fleet')
+    servers = [start_server(root / 'host1', ['alpha', 'shared']),
+               start_server(root / 'host2', ['beta', 'shared'])]
+    # a bot folder next to the hosts' BASE_DIRs, which no RPC call may reach
+    (root / 'outside').mkdir()
+    (root / 'outside' / 'main.py').write_text(BOT)
+    (root / 'host1' / 'escape').symlink_to(root / 'outside')
+    yield root, [host for _, host in servers]
+    for proc, host in servers:
+        client = manager_eu.FleetClient([host], TOKEN)
+        client.call(host, 'kill_bot', names=['alpha', 'beta', 'shared'])
+        client.close()
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def fleet_args(hosts, token=TOKEN):
+    return argparse.Namespace(json=True, hosts=hosts, token=token, timeout=5.0, refresh=5.0)
+
+
+def raw_call(host, token, method, **params):
+    conn = http.client.HTTPConnection(host, timeout=5)
+    try:
+        body = json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params})
+        conn.request('POST', '/rpc', body, {'Authorization': f'Bearer {token}'})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def test_merged_view(fleet):
+    _, hosts = fleet
+    payload, code = manager_eu.cmd_fleet(fleet_args(hosts))
+    assert code == 0 and payload['ok']
+    assert list(payload['hosts']) == hosts
+    names = {host: sorted(b['name'] for b in payload['hosts'][host]['bots']) for host in hosts}
+    assert names == {hosts[0]: ['alpha', 'shared'], hosts[1]: ['beta', 'shared']}
+
+    client = manager_eu.FleetClient(hosts, TOKEN)
+    try:
+        rows = manager_eu.fleet_rows(client.call_all('list'))
+    finally:
+        client.close()
+    assert [(row['host'], row['name']) for row in rows] == [
+        (hosts[0], 'alpha'), (hosts[0], 'shared'), (hosts[1], 'beta'), (hosts[1], 'shared')]
+
+
+def test_unreachable_host_is_a_row(fleet):
+    _, hosts = fleet
+    with manager_eu.socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        dead = f"127.0.0.1:{sock.getsockname()[1]}"
+    payload, code = manager_eu.cmd_fleet(fleet_args([hosts[0], dead]))
+    assert code == 1 and not payload['ok']
+    assert payload['hosts'][hosts[0]]['error'] is None
+    assert payload['hosts'][dead]['error']
+
+
+def test_token_rejected(fleet):
+    _, hosts = fleet
+    status, reply = raw_call(hosts[0], 'wrong', 'list')
+    assert status == 401 and reply['error']['code'] == -32001
+    status, _ = raw_call(hosts[0], '', 'start_bot', names=['alpha'])
+    assert status == 401
+    payload, code = manager_eu.cmd_fleet(fleet_args(hosts, token='wrong'))
+    assert code == 1
+    assert all('unauthorized' in payload['hosts'][host]['error'] for host in hosts)
+
+
+def test_start_and_stop_by_name(fleet):
+    root, hosts = fleet
+    status, reply = raw_call(hosts[0], TOKEN, 'start_bot', names=['alpha'])
+    assert status == 200 and reply['result']['ok'], reply
+    assert str(root / 'host1' / 'alpha') in bot_cwds()
+    status, reply = raw_call(hosts[0], TOKEN, 'kill_bot', names=[str(root / 'host1' / 'alpha')])
+    assert status == 200 and reply['result']['ok'], reply
+    deadline = time.monotonic() + 5
+    while str(root / 'host1' / 'alpha') in bot_cwds() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert str(root / 'host1' / 'alpha') not in bot_cwds()
+
+
+@pytest.mark.parametrize('target', [
+    'outside',
+    '{root}/outside',
+    '{root}/host1/../outside',
+    '{root}/host1/escape',  # symlink inside BASE_DIR pointing out of it
+    '{root}/host2/beta',  # another host's BASE_DIR
+    '/bin',
+])
+def test_path_restriction(fleet, target):
+    root, hosts = fleet
+    target = target.format(root=root)
+    for method in ('start_bot', 'kill_bot'):
+        status, reply = raw_call(hosts[0], TOKEN, method, names=[target])
+        assert status == 200
+        assert reply['result']['missing'] == [target] and not reply['result']['results']
+    assert str(root / 'outside') not in bot_cwds()
+    assert str(root / 'host2' / 'beta') not in bot_cwds()
@@ -0,0 +1,101 @@
+import asyncio
+import http.server
+import socket
+import threading
+import time
+
+import pytest
+
+import manager_eu
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    hosts = []
+
+    def _reply(self, body):
+        self.hosts.append(self.headers.get('Host'))
+        if self.path == '/slow':
+            time.sleep(1.0)
+        elif self.path == '/delay':
+            time.sleep(0.1)
+        code = 503 if self.path == '/broken' else 200
+        self.send_response(code)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        if body:
+            self.wfile.write(b'ok')
+
+    def do_GET(self):
+        self._reply(True)
+
+    def do_HEAD(self):
+        self._reply(False)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    Handler.hosts = []
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def probe(port, path='/', timeout=2.0, rounds=1, name='example.test'):
+    prober = manager_eu.HealthProber(address='127.0.0.1', path=path, timeout=timeout)
+    site = {'name': name, 'ports': [port]}
+
+    async def run():
+        return [(await prober.probe_round([site]))[name] for _ in range(rounds)]
+    return prober, asyncio.run(run())
+
+
+def test_up(server):
+    prober, results = probe(server, rounds=3)
+    for latency_ms, code, error in results:
+        assert (code, error) == (200, None)
+        assert latency_ms > 0
+    assert Handler.hosts == [f'example.test:{server}'] * 3
+    summary = prober.summary('example.test')
+    assert summary['code'] == 200 and summary['ok_ratio'] == 1.0 and summary['probes'] == 3
+
+
+def test_server_error_counts_as_failure(server):
+    prober, [(_, code, error)] = probe(server, path='/broken')
+    assert (code, error) == (503, None)
+    assert prober.summary('example.test')['ok_ratio'] == 0.0
+
+
+def test_down():
+    prober, [(_, code, error)] = probe(free_port())
+    assert code == 0 and error
+    summary = prober.summary('example.test')
+    assert summary['ok_ratio'] == 0.0 and summary['p50_ms'] is None
+
+
+def test_timeout(server):
+    started = time.monotonic()
+    _, [(latency_ms, code, error)] = probe(server, path='/slow', timeout=0.2)
+    assert (code, error) == (0, 'timeout')
+    assert 150 <= latency_ms < 900
+    assert time.monotonic() - started < 0.9
+
+
+def test_latency(server):
+    prober, results = probe(server, path='/delay', rounds=2)
+    for latency_ms, code, _ in results:
+        assert code == 200
+        assert 90 <= latency_ms < 1000
+    assert prober.summary('example.test')['p50_ms'] >= 90
@@ -0,0 +1,27 @@
+import gzip
+import os
+
+import manager_eu
+
+
+def test_search_lists_newest_file_first(tmp_path):
+    logs = tmp_path / 'alpha' / 'logs'
+    logs.mkdir(parents=True)
+    segments = [
+        (logs / 'alpha_2026-01-01_00-00-00.log.gz', b'old compressed needle\n', 1_000),
+        (logs / 'alpha_2026-02-01_00-00-00.log', b'rotated needle\n', 2_000),
+        (logs / 'alpha.log', b'current needle\n', 3_000),
+    ]
+    for path, data, mtime in segments:
+        with (gzip.open if path.suffix == '.gz' else open)(path, 'wb') as f:
+            f.write(data)
+        os.utime(path, (mtime, mtime))
+
+    index = manager_eu.LogSearchIndex(str(tmp_path / 'index.sqlite3'))
+    try:
+        index.update([{'name': 'alpha', 'dir': str(tmp_path / 'alpha')}])
+        assert [line for _, _, line in index.search('needle')] == [
+            'current needle', 'rotated needle', 'old compressed needle']
+        assert index.search('needle', limit=1) == [('alpha', str(logs / 'alpha.log'), 'current needle')]
+    finally:
+        index.close()